@@ -0,0 +1,60 @@
+# Benchmark for pricing a whole option chain with the Black-Scholes Model
+# Compares the per-strike loop used by gui.py against the vectorized BSModel.price_chain
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules import BSModel
+
+
+def loop_prices(spot_price, strike_prices, time_to_expiry, risk_free_rate, volatility):
+    # One BSModel per strike, as gui.py::run_models used to do
+    calls = np.empty(len(strike_prices))
+    puts = np.empty(len(strike_prices))
+    for i, sp in enumerate(strike_prices):
+        BSM = BSModel(spot_price, sp, time_to_expiry, risk_free_rate, volatility)
+        calls[i] = BSM.calculate_option_price('Call')
+        puts[i] = BSM.calculate_option_price('Put')
+    return calls, puts
+
+
+def best_time(func, *args, repeats=5):
+    # Best wall time out of several runs, to reduce scheduler noise
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    spot_price = 100.0
+    time_to_expiry = 30
+    risk_free_rate = 0.05
+    volatility = 0.25
+
+    print(f"{'strikes':>8} {'loop us/opt':>12} {'chain us/opt':>13} {'speedup':>8} {'max diff':>10}")
+    for num_strikes in (10, 100, 1000, 10000):
+        strike_prices = np.linspace(50, 150, num_strikes)
+        args = (spot_price, strike_prices, time_to_expiry, risk_free_rate, volatility)
+
+        loop_calls, loop_puts = loop_prices(*args)
+        chain_calls, chain_puts = BSModel.price_chain(*args)
+        max_diff = max(np.max(np.abs(loop_calls - chain_calls)), np.max(np.abs(loop_puts - chain_puts)))
+
+        # Each strike is priced as a call and a put
+        num_options = 2 * num_strikes
+        loop_time = best_time(loop_prices, *args, repeats=1 if num_strikes >= 1000 else 3)
+        chain_time = best_time(BSModel.price_chain, *args)
+
+        print(f"{num_strikes:>8} {1e6 * loop_time / num_options:>12.2f} {1e6 * chain_time / num_options:>13.3f} "
+              f"{loop_time / chain_time:>7.0f}x {max_diff:>10.1e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# Convergence benchmark for the Binomial Tree Model
+# Prints steps versus error against the closed-form Black-Scholes prices for every lattice scheme
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules import BSModel, BTModel
+
+# (label, keyword arguments for BTModel)
+VARIANTS = [
+    ('CRR', {}),
+    ('Tian', {'scheme': 'tian'}),
+    ('Leisen-Reimer', {'scheme': 'lr'}),
+    ('BBS', {'smoothing': True}),
+    ('BBS + Richardson', {'smoothing': True, 'richardson': True}),
+    ('CRR + Richardson', {'richardson': True}),
+    ('Tian + Richardson', {'scheme': 'tian', 'richardson': True}),
+    ('Leisen-Reimer + Richardson', {'scheme': 'lr', 'richardson': True}),
+]
+STEPS = (25, 50, 100, 200, 400, 800, 1600)
+TOLERANCE = 1e-4
+
+
+def main():
+    spot_price = 100.0
+    time_to_expiry = 180
+    risk_free_rate = 0.05
+    volatility = 0.25
+    strike_prices = np.linspace(70, 130, 61)
+
+    ref_calls, ref_puts = BSModel.price_chain(spot_price, strike_prices, time_to_expiry, risk_free_rate, volatility)
+
+    print(f"Max abs error over {len(strike_prices)} strikes (calls and puts), tolerance {TOLERANCE:g}")
+    print(f"{'scheme':<28}" + "".join(f"{n:>10}" for n in STEPS) + f"{'steps@tol':>11}{'ms@tol':>9}")
+    for label, kwargs in VARIANTS:
+        errors = []
+        steps_at_tol = time_at_tol = None
+        for n in STEPS:
+            start = time.perf_counter()
+            model = BTModel(spot_price, spot_price, time_to_expiry, risk_free_rate, volatility, n, **kwargs)
+            calls, puts = model.price_chain(strike_prices)
+            elapsed = time.perf_counter() - start
+
+            error = max(np.max(np.abs(calls - ref_calls)), np.max(np.abs(puts - ref_puts)))
+            errors.append(error)
+            if steps_at_tol is None and error <= TOLERANCE:
+                steps_at_tol, time_at_tol = model.n, elapsed
+
+        print(f"{label:<28}" + "".join(f"{e:>10.1e}" for e in errors)
+              + (f"{steps_at_tol:>11}{1e3 * time_at_tol:>9.2f}" if steps_at_tol else f"{'-':>11}{'-':>9}"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# Benchmark for concurrent bulk fetching and pricing
+# Refreshes the POPULAR_TICKERS universe from a FakeProvider with simulated network latency,
+# serially and concurrently, and reports the wall time of each
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules import helper
+from modules.bulk import price_option_data, price_universe
+from modules.market_data import FakeProvider
+from modules.pop_ticks import POPULAR_TICKERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk fetch and pricing benchmark")
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated seconds per request")
+    parser.add_argument('--tickers', type=int, default=len(POPULAR_TICKERS))
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--serial', type=int, default=20, help="Tickers to time serially, extrapolated to the universe")
+    args = parser.parse_args()
+
+    tickers = list(dict.fromkeys(POPULAR_TICKERS))[:args.tickers]
+    risk_free_rate = 0.04
+
+    provider = FakeProvider(latency=args.latency)
+    start = time.perf_counter()
+    for ticker in tickers[:args.serial]:
+        price_option_data(helper.get_option_data(ticker, 30, provider, verbose=False), risk_free_rate)
+    serial = (time.perf_counter() - start) / args.serial * len(tickers)
+
+    provider = FakeProvider(latency=args.latency)
+    start = time.perf_counter()
+    first = None
+    failures = 0
+    for ticker, option_data, prices, error in price_universe(tickers, risk_free_rate, 30, provider=provider,
+                                                             max_workers=args.workers):
+        if first is None:
+            first = time.perf_counter() - start
+        failures += error is not None
+    concurrent = time.perf_counter() - start
+
+    print(f"{len(tickers)} tickers, {args.latency * 1e3:.0f} ms per request, {args.workers} workers")
+    print(f"{'serial (extrapolated)':<24}{serial:>8.2f} s")
+    print(f"{'concurrent':<24}{concurrent:>8.2f} s  ({serial / concurrent:.1f}x, first result after "
+          f"{first * 1e3:.0f} ms, {failures} failures)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# Scenario grid benchmark for the Finite Difference Model
+# Prices an American put at every spot of a scenario grid with one FDModel solve, and with one
+# BTModel tree per spot, and reports the wall time of each and their largest difference, for a typical
+# option and for a long-dated, high-volatility one whose grid of moneyness is capped
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules import BTModel, FDModel
+
+
+# (days to expiry, volatility) of every case
+CASES = ((180, 0.25), (730, 0.8))
+
+
+def run_case(time_to_expiry, volatility):
+    strike_price = 100.0
+    risk_free_rate = 0.05
+    spot_prices = np.linspace(60, 140, 161)
+
+    print(f"\nAmerican put on {len(spot_prices)} spots, {time_to_expiry} days, volatility {volatility}")
+    print(f"{'method':<34}{'ms':>10}{'max diff':>12}")
+    start = time.perf_counter()
+    reference = np.array([BTModel(s, strike_price, time_to_expiry, risk_free_rate, volatility, 1000,
+                                  exercise='american').calculate_option_price('Put') for s in spot_prices])
+    print(f"{'BTModel, 1000 steps, per spot':<34}{(time.perf_counter() - start) * 1e3:>10.1f}{'-':>12}")
+
+    for method in ('penalty', 'psor'):
+        for time_steps, spot_steps in ((100, 200), (200, 400), (400, 800)):
+            start = time.perf_counter()
+            model = FDModel(100, strike_price, time_to_expiry, risk_free_rate, volatility, time_steps, spot_steps,
+                            exercise='american', american_method=method)
+            puts = model.price_spots(spot_prices)[1]
+            elapsed = time.perf_counter() - start
+            label = f"FDModel {method}, {time_steps}x{spot_steps}"
+            print(f"{label:<34}{elapsed * 1e3:>10.1f}{np.max(np.abs(puts - reference)):>12.2e}")
+
+
+def main():
+    # Warm up, so lazily imported dependencies are not timed
+    FDModel(100, 100, 180, 0.05, 0.25).price_spots(np.array([90.0, 110.0]))
+    for time_to_expiry, volatility in CASES:
+        run_case(time_to_expiry, volatility)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# Strike grid benchmark for the FFT Model
+# Prices a dense chain of strikes of one expiry with one FFTModel transform, and strike by strike with
+# BSModel and BTModel objects, and reports the wall time of each and the largest difference to Black-Scholes.
+# Heston chains are timed the same way, against a numerically integrated reference at a few strikes.
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules import BSModel, BTModel, FFTModel
+
+
+def heston_reference(model, strike_price):
+    """
+    Heston call price from the two probabilities of Heston's formula, integrated with scipy's quad.
+    """
+    from scipy.integrate import quad
+
+    k = np.log(strike_price / model.S)
+
+    def phi(u):
+        return model._characteristic_function(u, model.sigma, model.r, model.T)
+
+    def probability(integrand):
+        return 0.5 + quad(lambda u: integrand(u).real, 1e-8, 500, limit=500)[0] / np.pi
+
+    P1 = probability(lambda u: np.exp(-1j * u * k) * phi(u - 1j) / (1j * u * phi(-1j)))
+    P2 = probability(lambda u: np.exp(-1j * u * k) * phi(u) / (1j * u))
+    return model.S * P1 - strike_price * np.exp(-model.r * model.T) * P2
+
+
+def main():
+    spot_price = 100.0
+    time_to_expiry = 90
+    risk_free_rate = 0.05
+    volatility = 0.25
+    strike_prices = np.linspace(50, 150, 2001)
+
+    # Warm up, so lazily imported dependencies are not timed
+    FFTModel(spot_price, spot_price, time_to_expiry, risk_free_rate, volatility).price_chain(strike_prices[:2])
+    reference = BSModel.price_chain(spot_price, strike_prices, time_to_expiry, risk_free_rate, volatility)[0]
+
+    print(f"Calls on {len(strike_prices)} strikes")
+    print(f"{'method':<34}{'ms':>10}{'max diff':>12}")
+    start = time.perf_counter()
+    calls = np.array([BSModel(spot_price, K, time_to_expiry, risk_free_rate, volatility).calculate_option_price('Call')
+                      for K in strike_prices])
+    print(f"{'BSModel, per strike':<34}{(time.perf_counter() - start) * 1e3:>10.1f}"
+          f"{np.max(np.abs(calls - reference)):>12.2e}")
+
+    start = time.perf_counter()
+    calls = np.array([BTModel(spot_price, K, time_to_expiry, risk_free_rate, volatility, 200)
+                      .calculate_option_price('Call') for K in strike_prices[::20]])
+    elapsed = (time.perf_counter() - start) * 20
+    print(f"{'BTModel, 200 steps, per strike':<34}{elapsed * 1e3:>10.1f}"
+          f"{np.max(np.abs(calls - reference[::20])):>12.2e}")
+
+    for grid_size in (1024, 4096, 16384):
+        start = time.perf_counter()
+        model = FFTModel(spot_price, spot_price, time_to_expiry, risk_free_rate, volatility, grid_size=grid_size)
+        calls = model.price_chain(strike_prices)[0]
+        elapsed = time.perf_counter() - start
+        label = f"FFTModel, {grid_size} points"
+        print(f"{label:<34}{elapsed * 1e3:>10.1f}{np.max(np.abs(calls - reference)):>12.2e}")
+
+    print("\nHeston calls, kappa 1.5, theta 0.04, xi 0.5, rho -0.7")
+    start = time.perf_counter()
+    model = FFTModel(spot_price, spot_price, time_to_expiry, risk_free_rate, volatility, 'heston', 1.5, 0.04, 0.5, -0.7)
+    calls = model.price_chain(strike_prices)[0]
+    elapsed = time.perf_counter() - start
+    sample = np.arange(0, len(strike_prices), 250)
+    start = time.perf_counter()
+    reference = np.array([heston_reference(model, K) for K in strike_prices[sample]])
+    reference_elapsed = (time.perf_counter() - start) * len(strike_prices) / len(sample)
+    print(f"{'quad, per strike':<34}{reference_elapsed * 1e3:>10.1f}{'-':>12}")
+    print(f"{'FFTModel, 4096 points':<34}{elapsed * 1e3:>10.1f}{np.max(np.abs(calls[sample] - reference)):>12.2e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# Benchmark for the vectorized implied volatility solver
+# Prices a synthetic book with BSModel.price_chain, inverts it and reports throughput and accuracy
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules import BSModel
+from modules.implied_vol import implied_volatility
+
+
+def main():
+    rng = np.random.default_rng(0)
+    spot_price = 100.0
+    risk_free_rate = 0.04
+
+    print(f"{'contracts':>10} {'seconds':>8} {'contracts/s':>12} {'avg iters':>10} {'converged':>10} {'max vol err':>12}")
+    for num_contracts in (1_000, 100_000, 1_000_000, 4_000_000):
+        strike_prices = rng.uniform(60, 150, num_contracts)
+        times_to_expiry = rng.uniform(7, 730, num_contracts)
+        volatilities = rng.uniform(0.1, 0.8, num_contracts)
+        is_call = rng.random(num_contracts) < 0.5
+
+        calls, puts = BSModel.price_chain(spot_price, strike_prices, times_to_expiry, risk_free_rate, volatilities)
+        option_prices = np.where(is_call, calls, puts)
+
+        start = time.perf_counter()
+        result = implied_volatility(option_prices, spot_price, strike_prices, times_to_expiry, risk_free_rate, is_call)
+        elapsed = time.perf_counter() - start
+
+        # Accuracy is only meaningful where the price actually depends on volatility
+        T = times_to_expiry / 365
+        d_1 = (np.log(spot_price / strike_prices) + (risk_free_rate + 0.5 * volatilities ** 2) * T) / (volatilities * np.sqrt(T))
+        vega = spot_price * np.sqrt(T) * np.exp(-0.5 * d_1 ** 2) / np.sqrt(2 * np.pi)
+        sensitive = vega > 1e-4
+        max_error = np.max(np.abs(result.volatility - volatilities)[sensitive])
+
+        print(f"{num_contracts:>10} {elapsed:>8.3f} {num_contracts / elapsed:>12,.0f} {result.iterations.mean():>10.2f} "
+              f"{result.converged.mean():>10.2%} {max_error:>12.1e}")
+
+
+if __name__ == '__main__':
+    main()
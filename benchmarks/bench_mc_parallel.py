@@ -0,0 +1,45 @@
+# Benchmark for parallel Monte Carlo pricing
+# Measures throughput and scaling of MCModel across worker counts, and checks reproducibility
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules import MCModel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel Monte Carlo scaling benchmark")
+    parser.add_argument('--paths', type=int, default=20_000_000, help="Total number of simulations")
+    parser.add_argument('--strikes', type=int, default=50, help="Number of strikes priced from the same paths")
+    parser.add_argument('--executor', choices=('process', 'thread'), default='process')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    strike_prices = np.linspace(80, 120, args.strikes)
+    worker_counts = sorted({1, *[w for w in (2, 4, 8, 16, 32) if w <= args.max_workers], args.max_workers})
+
+    print(f"{'workers':>8} {'seconds':>9} {'Mpaths/s':>9} {'speedup':>8} {'efficiency':>11} {'reproducible':>13}")
+    base_time = None
+    for workers in worker_counts:
+        model = MCModel(100.0, 100.0, 365, 0.05, 0.2, args.paths, workers=workers, executor=args.executor)
+        model.price_chain(strike_prices)
+        first = model.chain_estimate
+
+        # A second run with the same seed and worker count must give bit-identical prices
+        model.price_chain(strike_prices)
+        reproducible = np.array_equal(first.price, model.chain_estimate.price)
+
+        elapsed = min(first.elapsed, model.chain_estimate.elapsed)
+        if base_time is None:
+            base_time = elapsed
+        speedup = base_time / elapsed
+        print(f"{workers:>8} {elapsed:>9.3f} {args.paths / elapsed / 1e6:>9.1f} {speedup:>7.2f}x "
+              f"{speedup / workers:>10.0%} {str(reproducible):>13}")
+
+
+if __name__ == '__main__':
+    main()
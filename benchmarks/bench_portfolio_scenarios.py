@@ -0,0 +1,48 @@
+# Scenario risk benchmark for Portfolio
+# Revalues a seeded synthetic book over a spot shock x volatility shock x days forward grid and reports
+# the wall time and the number of option valuations per second
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules.portfolio import Portfolio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Portfolio scenario grid benchmark")
+    parser.add_argument('--positions', type=int, default=5000)
+    parser.add_argument('--underlyings', type=int, default=50)
+    parser.add_argument('--model', choices=('BS', 'FD'), default='BS')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    symbols = [f"U{i}" for i in range(args.underlyings)]
+    spot_prices = {symbol: rng.uniform(20, 500) for symbol in symbols}
+    underlying = rng.choice(symbols, args.positions)
+    spots = np.array([spot_prices[symbol] for symbol in underlying])
+    portfolio = Portfolio()
+    portfolio.add_positions(underlying, np.round(spots * rng.uniform(0.8, 1.2, args.positions), 2),
+                            rng.choice([7, 30, 60, 90, 180], args.positions), rng.choice(['call', 'put'], args.positions),
+                            rng.integers(-10, 11, args.positions), rng.uniform(0.15, 0.5, args.positions))
+
+    spot_shocks = np.linspace(-0.2, 0.2, 41)
+    vol_shocks = np.linspace(-0.1, 0.1, 5)
+    days_forward = (0, 1, 5, 10)
+    start = time.perf_counter()
+    result = portfolio.scenario_pnl(spot_prices, 0.04, spot_shocks, vol_shocks, days_forward, model=args.model)
+    elapsed = time.perf_counter() - start
+
+    scenarios = result.pnl.size
+    worst, (spot_shock, vol_shock, days) = result.worst()
+    print(f"{args.positions} positions x {scenarios} scenarios with {args.model} in {elapsed:.2f} s "
+          f"({args.positions * (scenarios + 1) / elapsed:,.0f} valuations/s)")
+    print(f"Book value {result.base_value:,.2f}, worst P&L {worst:,.2f} at spot {spot_shock:+.0%}, "
+          f"vol {vol_shock:+.2f}, {days:.0f} days forward")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Import-time budget check for the pricing core
+# Imports the package in fresh interpreters and fails if it loads a heavy dependency
+# or takes longer than the budget on top of NumPy itself
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# Modules that must only be loaded on first use
+LAZY_MODULES = ('scipy', 'pandas', 'matplotlib', 'yfinance')
+CORE_IMPORT = "import modules; from modules import framework, BSModel, BTModel, MCModel"
+
+
+def time_import(statement, repeats):
+    """
+    Returns the fastest wall time of statement over repeats fresh interpreters, and the
+    lazy modules it loaded.
+    """
+    code = ("import sys, time; start = time.perf_counter(); " + statement + "; "
+            "elapsed = time.perf_counter() - start; "
+            f"print(elapsed, *[m for m in {LAZY_MODULES!r} if m in sys.modules])")
+    best, loaded = float('inf'), []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+        elapsed, *loaded = output.stdout.split()
+        best = min(best, float(elapsed))
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time budget check for the pricing core")
+    parser.add_argument('--budget', type=float, default=0.05, help="Seconds allowed on top of importing NumPy")
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    numpy_time, _ = time_import("import numpy", args.repeats)
+    core_time, loaded = time_import(CORE_IMPORT, args.repeats)
+    overhead = core_time - numpy_time
+
+    print(f"{'numpy':<12}{numpy_time * 1e3:>8.1f} ms")
+    print(f"{'modules':<12}{core_time * 1e3:>8.1f} ms  ({overhead * 1e3:.1f} ms on top of numpy, "
+          f"budget {args.budget * 1e3:.0f} ms)")
+
+    failures = []
+    if loaded:
+        failures.append(f"importing the core loaded {', '.join(loaded)}")
+    if overhead > args.budget:
+        failures.append(f"import overhead {overhead * 1e3:.1f} ms is over the budget")
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
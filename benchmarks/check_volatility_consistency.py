@@ -0,0 +1,63 @@
+# Consistency check for the realized volatility estimators
+# Builds seeded (tickers x days) bars with missing days and fails unless realized_volatility,
+# VolatilityEngine.cold_start and bar-by-bar VolatilityEngine.update give the same estimates
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules.volatility import ESTIMATORS, VolatilityEngine, realized_volatility
+
+# Largest relative difference between the three that counts as agreement
+TOLERANCE = 1e-9
+
+
+def synthetic_bars(tickers, days, missing, seed=0):
+    """
+    Returns seeded close, high, low and open (tickers x days) matrices, with a fraction missing of
+    the bars set to NaN.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, (tickers, days)), axis=1))
+    open = close * np.exp(rng.normal(0, 0.005, close.shape))
+    high = np.maximum(open, close) * np.exp(np.abs(rng.normal(0, 0.008, close.shape)))
+    low = np.minimum(open, close) * np.exp(-np.abs(rng.normal(0, 0.008, close.shape)))
+    gaps = rng.random(close.shape) < missing
+    for prices in (close, high, low, open):
+        prices[gaps] = np.nan
+    return close, high, low, open
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consistency check for the realized volatility estimators")
+    parser.add_argument('--tickers', type=int, default=20)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--missing', type=float, default=0.1, help="Fraction of bars that are missing")
+    parser.add_argument('--window', type=int, default=21)
+    args = parser.parse_args()
+
+    bars = synthetic_bars(args.tickers, args.days, args.missing)
+    tickers = [f"T{i}" for i in range(args.tickers)]
+    failures = []
+    for estimator in ESTIMATORS:
+        history = realized_volatility(*bars, estimator=estimator, window=args.window)[:, -1]
+        cold = VolatilityEngine(tickers, estimator, args.window)
+        cold.cold_start(*bars)
+        streamed = VolatilityEngine(tickers, estimator, args.window)
+        for day in range(args.days):
+            streamed.update(*(prices[:, day] for prices in bars))
+        estimates = {'cold_start': cold.volatility(), 'update': streamed.volatility()}
+        worst = max(np.max(np.abs(value / history - 1)) for value in estimates.values())
+        print(f"{estimator:<14}worst relative difference {worst:.1e}")
+        if not worst <= TOLERANCE:
+            failures.append(f"{estimator} estimates disagree by {worst:.1e}")
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# Load-test client for the pricing service
+# Opens many keep-alive connections that each send single-option requests back to back, and reports
+# throughput and latency percentiles along with the batch sizes the server formed.
+# Without --port an in-process server is started, so the test runs fully locally.
+#
+#   python benchmarks/load_test.py --connections 64 --requests 20000
+#   python benchmarks/load_test.py --port 8000 --model BT
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules.server import PricingServer
+
+
+async def http_request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, count, model, seed, latencies, failures):
+    rng = np.random.default_rng(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            spot_price = float(rng.choice((50.0, 100.0, 200.0)))
+            request = {
+                'model': model, 'underlying_price': spot_price, 'strike_price': round(spot_price * rng.uniform(0.8, 1.2), 2),
+                'time_to_maturity': int(rng.choice((30, 90))), 'risk_free_rate': 0.04, 'volatility': 0.25,
+                'option_type': 'call' if rng.random() < 0.5 else 'put',
+            }
+            if model != 'BS':
+                request['options'] = {'time_steps': 101} if model == 'BT' else {'number_of_simulations': 2000}
+            start = time.perf_counter()
+            status, _ = await http_request(reader, writer, 'POST', '/price', request)
+            latencies.append(time.perf_counter() - start)
+            failures[0] += status != 200
+    finally:
+        writer.close()
+
+
+async def run(args, max_batch_size):
+    server = None
+    host, port = args.host, args.port
+    if port is None:
+        server = PricingServer(host, 0, max_batch_size, args.max_wait / 1e3)
+        await server.start()
+        port = server.port
+    try:
+        latencies, failures = [], [0]
+        per_client = args.requests // args.connections
+        start = time.perf_counter()
+        await asyncio.gather(*(client(host, port, per_client, args.model, seed, latencies, failures)
+                               for seed in range(args.connections)))
+        seconds = time.perf_counter() - start
+        reader, writer = await asyncio.open_connection(host, port)
+        _, stats = await http_request(reader, writer, 'GET', '/stats')
+        writer.close()
+    finally:
+        if server is not None:
+            await server.close()
+
+    p50, p90, p99 = np.percentile(latencies, (50, 90, 99)) * 1e3
+    print(f"max batch {max_batch_size if server else 'server'}: {len(latencies)} requests in {seconds:.2f} s, "
+          f"{len(latencies) / seconds:,.0f} requests/s, latency p50 {p50:.2f} ms, p90 {p90:.2f} ms, p99 {p99:.2f} ms, "
+          f"mean batch size {stats['mean_batch_size']:.1f}, {failures[0]} failures")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the pricing service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help="Port of a running server; starts one in-process if not given")
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--model', choices=('BS', 'BT', 'MC'), default='BS')
+    parser.add_argument('--max-wait', type=float, default=2.0, help="Batch window in milliseconds of the in-process server")
+    parser.add_argument('--compare', action='store_true',
+                        help="Also run the in-process server without micro-batching, for comparison")
+    args = parser.parse_args()
+
+    if args.compare and args.port is None:
+        asyncio.run(run(args, 1))
+    asyncio.run(run(args, 256))
+
+if __name__ == '__main__':
+    main()
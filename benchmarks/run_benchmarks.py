@@ -0,0 +1,299 @@
+# Benchmark suite with speed-versus-accuracy curves for every model
+# Prices seeded synthetic option chains offline with BSModel, BTModel and MCModel, measures wall time
+# and error against the closed-form Black-Scholes prices, and writes the results as JSON.
+# With --baseline, entries that got slower or less accurate than a previous run are flagged.
+#
+#   python benchmarks/run_benchmarks.py --output results.json
+#   python benchmarks/run_benchmarks.py --baseline results.json --output new.json
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from modules import BSModel, BTModel, MCModel
+
+# (variant label, keyword arguments) of every model configuration on the curves
+BT_VARIANTS = [
+    ('crr', {}),
+    ('tian', {'scheme': 'tian'}),
+    ('lr', {'scheme': 'lr'}),
+    ('bbs_richardson', {'smoothing': True, 'richardson': True}),
+]
+MC_VARIANTS = [
+    ('plain', {}),
+    ('antithetic', {'variance_reduction': 'antithetic'}),
+    ('control_variate', {'variance_reduction': 'control_variate'}),
+    ('sobol', {'variance_reduction': 'sobol'}),
+]
+FULL_SIZES = {
+    'bs_strikes': (10, 100, 1_000, 10_000, 100_000),
+    'bt_steps': (25, 50, 100, 200, 400, 800),
+    'mc_paths': (10_000, 40_000, 160_000, 640_000),
+}
+QUICK_SIZES = {
+    'bs_strikes': (10, 1_000, 100_000),
+    'bt_steps': (25, 100, 400),
+    'mc_paths': (10_000, 80_000),
+}
+# A regression needs to be worse by more than these fractions of the baseline
+TIME_TOLERANCE = 0.25
+ERROR_TOLERANCE = 0.10
+# Differences below these are treated as equal, so timer and round-off noise is never flagged
+TIME_FLOOR = 1e-3
+ERROR_FLOOR = 1e-10
+
+
+def synthetic_chains(num_chains, num_strikes, seed=0):
+    """
+    Returns seeded synthetic chains as a list of (spot, strikes, days, rate, volatility).
+    """
+    rng = np.random.default_rng(seed)
+    chains = []
+    for _ in range(num_chains):
+        spot_price = rng.uniform(20, 500)
+        strike_prices = spot_price * np.linspace(0.7, 1.3, num_strikes)
+        chains.append((spot_price, strike_prices, int(rng.integers(7, 365)), rng.uniform(0.0, 0.08), rng.uniform(0.1, 0.6)))
+    return chains
+
+
+def best_time(func, repeats):
+    # Best wall time out of several runs, to reduce scheduler noise; also returns the last result
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def chain_errors(chains, prices):
+    """
+    Returns the max and root-mean-square error of prices, a list of (calls, puts), against Black-Scholes,
+    relative to the spot price so chains on different underlyings are comparable.
+    """
+    errors = []
+    for (spot_price, strike_prices, days, rate, volatility), (calls, puts) in zip(chains, prices):
+        ref_calls, ref_puts = BSModel.price_chain(spot_price, strike_prices, days, rate, volatility)
+        errors.append(np.concatenate((calls - ref_calls, puts - ref_puts)) / spot_price)
+    errors = np.concatenate(errors)
+    return float(np.max(np.abs(errors))), float(np.sqrt(np.mean(errors ** 2)))
+
+
+def bench_bs(sizes, repeats):
+    results = []
+    for num_strikes in sizes['bs_strikes']:
+        chains = synthetic_chains(1, num_strikes)
+        spot_price, strike_prices, days, rate, volatility = chains[0]
+        seconds, (calls, puts) = best_time(lambda: BSModel.price_chain(spot_price, strike_prices, days, rate, volatility),
+                                           repeats)
+        # The closed form is the reference, so check it against the scalar model on a few strikes instead
+        sample = np.linspace(0, num_strikes - 1, min(num_strikes, 10)).astype(int)
+        scalar = [BSModel(spot_price, strike_prices[i], days, rate, volatility).calculate_option_price('Call')
+                  for i in sample]
+        max_error = float(np.max(np.abs(calls[sample] - scalar)) / spot_price)
+        results.append(entry('BS', 'closed_form', 'strikes', num_strikes, 2 * num_strikes, seconds, max_error, max_error))
+    return results
+
+
+def bench_bt(sizes, repeats, num_chains):
+    results = []
+    chains = synthetic_chains(num_chains, 41)
+    for variant, kwargs in BT_VARIANTS:
+        for steps in sizes['bt_steps']:
+            def run():
+                return [BTModel(s, s, days, rate, vol, steps, **kwargs).price_chain(strikes)
+                        for s, strikes, days, rate, vol in chains]
+            seconds, prices = best_time(run, repeats)
+            results.append(entry('BT', variant, 'steps', steps, 2 * 41 * num_chains, seconds, *chain_errors(chains, prices)))
+    return results
+
+
+def bench_mc(sizes, num_chains):
+    results = []
+    chains = synthetic_chains(num_chains, 41)
+    for variant, kwargs in MC_VARIANTS:
+        # Warm up first, so lazily imported dependencies are not counted in the first entry
+        s, strikes, days, rate, vol = chains[0]
+        MCModel(s, s, days, rate, vol, 1000, **kwargs).price_chain(strikes)
+        for paths in sizes['mc_paths']:
+            # Monte Carlo error is random, so it is measured over several seeds rather than timed repeatedly
+            def run():
+                return [MCModel(s, s, days, rate, vol, paths, seed=seed, **kwargs).price_chain(strikes)
+                        for seed, (s, strikes, days, rate, vol) in enumerate(chains)]
+            seconds, prices = best_time(run, 1)
+            results.append(entry('MC', variant, 'paths', paths, 2 * 41 * num_chains, seconds, *chain_errors(chains, prices)))
+    return results
+
+
+def mc_equal_error(sizes, num_chains, pilot_paths=20_000):
+    """
+    Times every Monte Carlo variant at the number of paths that reaches the mean standard error plain
+    Monte Carlo reaches with the largest path count, so variants are compared at equal error.
+    The path counts are sized from a pilot run, since the error falls with the square root of the paths
+    (faster for Sobol, whose count is then an upper bound).
+    Returns one entry per variant with its paths, seconds, standard error relative to the spot price
+    and time relative to plain Monte Carlo.
+    """
+    chains = synthetic_chains(num_chains, 41)
+
+    def run(paths, kwargs):
+        return [MCModel(s, s, days, rate, vol, paths, seed=seed, **kwargs).run_simulation(strikes)
+                for seed, (s, strikes, days, rate, vol) in enumerate(chains)]
+
+    def mean_error(estimates):
+        return float(np.mean([np.mean(e.std_error) / chain[0] for e, chain in zip(estimates, chains)]))
+
+    target = None
+    comparison = []
+    for variant, kwargs in MC_VARIANTS:
+        error = mean_error(run(pilot_paths, kwargs))
+        if target is None:
+            # The first variant is plain Monte Carlo
+            target = error * np.sqrt(pilot_paths / sizes['mc_paths'][-1])
+        paths = max(int(np.ceil(pilot_paths * (error / target) ** 2)), 1000)
+        seconds, estimates = best_time(lambda: run(paths, kwargs), 1)
+        comparison.append({'variant': variant, 'paths': paths, 'seconds': seconds, 'std_error': mean_error(estimates)})
+    for c in comparison:
+        c['relative_time'] = c['seconds'] / comparison[0]['seconds']
+    return comparison
+
+
+def entry(model, variant, parameter, value, num_options, seconds, max_error, rms_error):
+    return {
+        'model': model, 'variant': variant, 'parameter': parameter, 'value': value, 'options': num_options,
+        'seconds': seconds, 'us_per_option': 1e6 * seconds / num_options,
+        'max_error': max_error, 'rms_error': rms_error,
+    }
+
+
+def frontiers(results):
+    """
+    Returns, for every model, the entries on the error-versus-time frontier: the ones no other
+    entry beats on both time per option and RMS error.
+    """
+    curves = {}
+    for model in dict.fromkeys(r['model'] for r in results):
+        points = sorted((r for r in results if r['model'] == model), key=lambda r: (r['us_per_option'], r['rms_error']))
+        frontier, best_error = [], np.inf
+        for r in points:
+            if r['rms_error'] < best_error:
+                frontier.append({k: r[k] for k in ('variant', 'parameter', 'value', 'us_per_option', 'rms_error')})
+                best_error = r['rms_error']
+        curves[model] = frontier
+    return curves
+
+
+def find_regressions(results, baseline, time_tolerance=TIME_TOLERANCE, error_tolerance=ERROR_TOLERANCE):
+    """
+    Compares results with a baseline run and returns a list of messages for every entry that got slower
+    by more than time_tolerance or less accurate by more than error_tolerance, as fractions of the baseline.
+    """
+    key = lambda r: (r['model'], r['variant'], r['parameter'], r['value'])
+    previous = {key(r): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        old = previous.get(key(r))
+        if old is None:
+            continue
+        label = f"{r['model']} {r['variant']} {r['parameter']}={r['value']}"
+        if r['seconds'] > max(old['seconds'] * (1 + time_tolerance), old['seconds'] + TIME_FLOOR):
+            regressions.append(f"{label}: {r['seconds'] * 1e3:.2f} ms, was {old['seconds'] * 1e3:.2f} ms")
+        if r['rms_error'] > max(old['rms_error'] * (1 + error_tolerance), ERROR_FLOOR):
+            regressions.append(f"{label}: rms error {r['rms_error']:.2e}, was {old['rms_error']:.2e}")
+    return regressions
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def plot_frontiers(results, path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+    for axis, model in zip(axes, ('BT', 'MC')):
+        for variant in dict.fromkeys(r['variant'] for r in results if r['model'] == model):
+            points = [r for r in results if r['model'] == model and r['variant'] == variant]
+            axis.loglog([r['us_per_option'] for r in points], [r['rms_error'] for r in points], 'o-', label=variant)
+        axis.set_title(f'{model}: error versus time')
+        axis.set_xlabel('Microseconds per option')
+        axis.set_ylabel('RMS error / spot')
+        axis.legend(loc='best')
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speed-versus-accuracy benchmark suite")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to check for regressions")
+    parser.add_argument('--time-tolerance', type=float, default=TIME_TOLERANCE,
+                        help="Fraction by which an entry may get slower before it is flagged")
+    parser.add_argument('--error-tolerance', type=float, default=ERROR_TOLERANCE,
+                        help="Fraction by which an entry's error may grow before it is flagged")
+    parser.add_argument('--quick', action='store_true', help="Fewer sizes, for a fast check")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--chains', type=int, default=4, help="Synthetic chains per Binomial Tree and Monte Carlo entry")
+    parser.add_argument('--plot', help="Save the error-versus-time curves to this image file")
+    args = parser.parse_args()
+
+    sizes = QUICK_SIZES if args.quick else FULL_SIZES
+    results = bench_bs(sizes, args.repeats) + bench_bt(sizes, args.repeats, args.chains) + bench_mc(sizes, args.chains)
+    report = {'metadata': metadata(), 'results': results, 'frontiers': frontiers(results),
+              'mc_equal_error': mc_equal_error(sizes, args.chains)}
+
+    print(f"{'model':<6}{'variant':<17}{'parameter':>10}{'value':>9}{'us/option':>11}{'max error':>11}{'rms error':>11}")
+    for r in results:
+        print(f"{r['model']:<6}{r['variant']:<17}{r['parameter']:>10}{r['value']:>9}{r['us_per_option']:>11.3f}"
+              f"{r['max_error']:>11.1e}{r['rms_error']:>11.1e}")
+    print("\nError-versus-time frontiers")
+    for model, frontier in report['frontiers'].items():
+        print(f"  {model}: " + ", ".join(f"{p['variant']} {p['parameter']}={p['value']} "
+                                         f"({p['us_per_option']:.2f} us, {p['rms_error']:.1e})" for p in frontier))
+    print("\nMonte Carlo at equal standard error")
+    print(f"{'variant':<17}{'paths':>10}{'ms':>10}{'std error':>11}{'vs plain':>10}")
+    for c in report['mc_equal_error']:
+        print(f"{c['variant']:<17}{c['paths']:>10}{c['seconds'] * 1e3:>10.1f}{c['std_error']:>11.1e}"
+              f"{c['relative_time']:>9.2f}x")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.time_tolerance, args.error_tolerance)
+        report['regressions'] = regressions
+        print(f"\n{len(regressions)} regressions against {args.baseline}")
+        for message in regressions:
+            print("  REGRESSION:", message)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.plot:
+        plot_frontiers(results, args.plot)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
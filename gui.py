@@ -1,6 +1,64 @@
+import queue
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
-from modules import helper, BSModel, BTModel, MCModel, Ticker, pop_ticks
+from modules import helper, BSModel, BTModel, MCModel, FDModel, Ticker, pop_ticks
+
+# Milliseconds between checks for results from the pricing worker
+POLL_INTERVAL = 50
+MODEL_COLUMNS = {
+    'BS': ("Call Black-Scholes", "Put Black-Scholes"),
+    'BT': ("Call Binomial Tree", "Put Binomial Tree"),
+    'MC': ("Call Monte Carlo", "Put Monte Carlo"),
+    'FD': ("Call Finite Difference", "Put Finite Difference"),
+}
+
+# Messages from the pricing worker to the Tk main thread, tagged with the id of their run
+results_queue = queue.Queue()
+current_run = {'id': 0, 'cancel': None, 'poll': None, 'timings': {}, 'rows': [], 'summary': ''}
+
+
+def price_strikes(model, spot_price, strike_prices, time_to_expiry, risk_free_rate, volatility):
+    # Every model prices the whole chain from a single tree, solve or simulation, so it is built once per run
+    if model == 'BS':
+        return BSModel.price_chain(spot_price, strike_prices, time_to_expiry, risk_free_rate, volatility)
+    if model == 'BT':
+        # Binomial Tree with early exercise like the listed options
+        BTM = BTModel(spot_price, spot_price, time_to_expiry, risk_free_rate, volatility, 101, scheme='lr', exercise='american')
+        return BTM.price_chain(strike_prices)
+    if model == 'FD':
+        # One Crank-Nicolson solve with early exercise prices the whole chain
+        FDM = FDModel(spot_price, spot_price, time_to_expiry, risk_free_rate, volatility, exercise='american')
+        return FDM.price_chain(strike_prices)
+    # Monte Carlo exercised with Longstaff-Schwartz, with one exercise rule fitted for all strikes
+    MCM = MCModel(spot_price, spot_price, time_to_expiry, risk_free_rate, volatility, 1000, exercise='american')
+    return MCM.price_chain(strike_prices)
+
+
+def pricing_worker(run_id, ticker, time_to_expiry, risk_free_rate, cancel):
+    """
+    Fetches the option data and prices it with every model on a background thread.
+    Results are sent to the main thread through results_queue, since only it may touch Tk widgets.
+    """
+    try:
+        start = time.perf_counter()
+        option_data = helper.get_option_data(ticker, time_to_expiry, verbose=False)
+        results_queue.put((run_id, 'data', option_data, risk_free_rate, time.perf_counter() - start))
+
+        # Columns fill in model by model, and a run can be cancelled between models
+        for model in MODEL_COLUMNS:
+            if cancel.is_set():
+                results_queue.put((run_id, 'cancelled'))
+                return
+            start = time.perf_counter()
+            calls, puts = price_strikes(model, option_data["spot_price"], option_data["strike_prices"],
+                                        option_data["time_to_expiry"], risk_free_rate/100.0, option_data["volatility"])
+            results_queue.put((run_id, 'prices', model, calls, puts, time.perf_counter() - start))
+        results_queue.put((run_id, 'done'))
+    except Exception as e:
+        results_queue.put((run_id, 'error', str(e)))
+
 
 def run_models():
     ticker = ticker_var.get()
@@ -12,12 +70,43 @@ def run_models():
         time_to_expiry = 5.0
         risk_free_rate = 5.0
 
-    try:
-        option_data = helper.get_option_data(ticker, time_to_expiry)
-    except Exception as e:
-        messagebox.showerror("Data Error", str(e))
-        return
+    # A new run replaces the one in progress
+    cancel_run()
+    current_run['id'] += 1
+    current_run['cancel'] = threading.Event()
+    current_run['timings'] = {}
+    current_run['rows'] = []
+    current_run['summary'] = ''
+
+    # Clear previous table
+    for row in tree.get_children():
+        tree.delete(row)
+    result_text.set(f"Fetching option data for {ticker}...")
+    cancel_button.configure(state=tk.NORMAL)
+
+    worker = threading.Thread(target=pricing_worker, daemon=True,
+                              args=(current_run['id'], ticker, time_to_expiry, risk_free_rate, current_run['cancel']))
+    worker.start()
+    current_run['poll'] = root.after(POLL_INTERVAL, poll_results)
 
+
+def cancel_button_pressed():
+    if current_run['cancel'] is not None:
+        cancel_run()
+        show_summary('cancelled')
+
+
+def cancel_run():
+    if current_run['cancel'] is not None:
+        current_run['cancel'].set()
+        current_run['cancel'] = None
+    if current_run['poll'] is not None:
+        root.after_cancel(current_run['poll'])
+        current_run['poll'] = None
+    cancel_button.configure(state=tk.DISABLED)
+
+
+def show_data(option_data, risk_free_rate, elapsed):
     time_to_expiry = option_data["time_to_expiry"]
     spot_price = option_data["spot_price"]
     volatility = option_data["volatility"]
@@ -31,38 +120,67 @@ def run_models():
     call_price_dict = dict(zip(strike_prices_c, call_prices_real))
     put_price_dict = dict(zip(strike_prices_p, put_prices_real))
 
-    # Clear previous table
-    for row in tree.get_children():
-        tree.delete(row)
-
-    # Insert rows with alternating colours
+    # Insert rows with alternating colours; model prices are filled in as they arrive
     for ind, sp in enumerate(strike_prices):
-        BSM = BSModel(spot_price, sp, time_to_expiry, risk_free_rate/100.0, volatility)
-        BTM = BTModel(spot_price, sp, time_to_expiry, risk_free_rate/100.0, volatility, 30)
-        MCM = MCModel(spot_price, sp, time_to_expiry, risk_free_rate/100.0, volatility, 1000)
-
         call_real = call_price_dict.get(sp, '-')
-        call_BSM = BSM.calculate_option_price('Call')
-        call_BTM = BTM.calculate_option_price('Call')
-        call_MCM = MCM.calculate_option_price('Call')
-
         put_real = put_price_dict.get(sp, '-')
-        put_BSM = BSM.calculate_option_price('Put')
-        put_BTM = BTM.calculate_option_price('Put')
-        put_MCM = MCM.calculate_option_price('Put')
 
-        tree.insert('', 'end', values=(
+        current_run['rows'].append(tree.insert('', 'end', values=(
             f"{sp:.2f}",
-            f"{call_real if call_real == '-' else f'{call_real:.2f}'}", f"{call_BSM:.2f}", f"{call_BTM:.2f}", f"{call_MCM:.2f}",
-            f"{put_real if put_real == '-' else f'{put_real:.2f}'}", f"{put_BSM:.2f}", f"{put_BTM:.2f}", f"{put_MCM:.2f}"
-        ), tags=('oddrow' if ind % 2 else 'evenrow'))
+            f"{call_real if call_real == '-' else f'{call_real:.2f}'}", *["..."] * len(MODEL_COLUMNS),
+            f"{put_real if put_real == '-' else f'{put_real:.2f}'}", *["..."] * len(MODEL_COLUMNS)
+        ), tags=('oddrow' if ind % 2 else 'evenrow')))
 
-    result_text.set(
+    current_run['summary'] = (
         f"Volatility: {volatility:.4f}\n"
         f"Spot Price: {spot_price:.2f}\n"
         f"Time to Expiry: {time_to_expiry} days\n"
-        f"Risk-Free Rate: {risk_free_rate}"
+        f"Risk-Free Rate: {risk_free_rate:g}%"
     )
+    current_run['timings']['Fetch'] = elapsed
+    show_summary()
+
+
+def show_summary(status=''):
+    timings = " | ".join(f"{name} {seconds:.2f} s" for name, seconds in current_run['timings'].items())
+    result_text.set(f"{current_run['summary']}\nTiming: {timings}" + (f" ({status})" if status else ''))
+
+
+def poll_results():
+    # Apply every message that arrived since the last poll, ignoring those of replaced runs
+    current_run['poll'] = None
+    finished = False
+    while True:
+        try:
+            message = results_queue.get_nowait()
+        except queue.Empty:
+            break
+        run_id, kind, *payload = message
+        if run_id != current_run['id']:
+            continue
+
+        if kind == 'data':
+            show_data(*payload)
+        elif kind == 'prices':
+            model, calls, puts, elapsed = payload
+            call_column, put_column = MODEL_COLUMNS[model]
+            for item, call, put in zip(current_run['rows'], calls, puts):
+                tree.set(item, call_column, f"{call:.2f}")
+                tree.set(item, put_column, f"{put:.2f}")
+            current_run['timings'][model] = elapsed
+            show_summary('running')
+        elif kind == 'error':
+            messagebox.showerror("Data Error", payload[0])
+            result_text.set('')
+            finished = True
+        else:
+            show_summary('cancelled' if kind == 'cancelled' else '')
+            finished = True
+
+    if finished:
+        cancel_run()
+    else:
+        current_run['poll'] = root.after(POLL_INTERVAL, poll_results)
 
 root = tk.Tk()
 root.title("Option Pricing Model Comparison")
@@ -107,20 +225,25 @@ rate_var = tk.StringVar()
 rate_entry = ttk.Entry(frame, textvariable=rate_var, font=("Arial", 12))
 rate_entry.grid(row=3, column=1, pady=5, sticky="ew")
 
-# Button
-run_button = tk.Button(frame, text="Run Models", command=run_models, font=("Arial", 12, "bold"),
+# Buttons
+button_frame = tk.Frame(frame, bg=BG_COLOR)
+button_frame.grid(row=4, column=0, columnspan=2, pady=15)
+run_button = tk.Button(button_frame, text="Run Models", command=run_models, font=("Arial", 12, "bold"),
                        bg=BUTTON_BG, fg=BUTTON_FG, activebackground=LABEL_COLOR, activeforeground=BUTTON_FG)
-run_button.grid(row=4, column=0, columnspan=2, pady=15, ipadx=10, ipady=2)
+run_button.pack(side=tk.LEFT, padx=5, ipadx=10, ipady=2)
+cancel_button = tk.Button(button_frame, text="Cancel", command=cancel_button_pressed, font=("Arial", 12, "bold"), state=tk.DISABLED,
+                          bg=BUTTON_BG, fg=BUTTON_FG, activebackground=LABEL_COLOR, activeforeground=BUTTON_FG)
+cancel_button.pack(side=tk.LEFT, padx=5, ipadx=10, ipady=2)
 
 # Result box 
 result_text = tk.StringVar()
 result_label = tk.Label(frame, textvariable=result_text, font=("Arial", 9), background="#f5f5f5",
-                        anchor="nw", justify="left", height=3, width=40, relief="groove", bd=2)
+                        anchor="nw", justify="left", height=5, width=60, relief="groove", bd=2)
 result_label.grid(row=5, column=0, columnspan=2, sticky="nw", pady=5)
 
 columns = (
-    "Strike", "Call Real", "Call Black-Scholes", "Call Binomial Tree", "Call Monte Carlo",
-    "Put Real", "Put Black-Scholes", "Put Binomial Tree", "Put Monte Carlo"
+    "Strike", "Call Real", "Call Black-Scholes", "Call Binomial Tree", "Call Monte Carlo", "Call Finite Difference",
+    "Put Real", "Put Black-Scholes", "Put Binomial Tree", "Put Monte Carlo", "Put Finite Difference"
 )
 style = ttk.Style(root)
 style.theme_use('clam')
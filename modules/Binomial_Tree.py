@@ -1,13 +1,28 @@
 # Binomial Tree Model for option pricing
 
+import copy
 import numpy as np
 from .framework import OptionModel
-from scipy.stats import norm
+from .Black_Scholes_Model import BSModel
+from .special import gammaln
+
+# Lattice schemes that define the up/down factors and probabilities of the tree
+LATTICE_SCHEMES = ('crr', 'tian', 'lr')
+EXERCISE_STYLES = ('european', 'american')
 
 class BTModel(OptionModel):
-    def __init__(self, underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility, time_steps):
+    # Methods timed by the instrumentation module, by phase
+    INSTRUMENTED_PHASES = {
+        'setup': ('__init__', '_tree_parameters'),
+        'payoff': ('_level_values',),
+        'induction': ('_backward_induction', '_node_weights'),
+        'greeks': ('greeks_chain',),
+    }
+
+    def __init__(self, underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility, time_steps,
+                 scheme='crr', smoothing=False, richardson=False, exercise='european'):
         """
-        Initializes the necessary variables for the Black-Scholes Model.
+        Initializes the necessary variables for the Binomial Tree Model.
 
         underlying_price => Current price of the underlying asset
         strike_price => Strike price of the option
@@ -15,54 +30,288 @@ class BTModel(OptionModel):
         risk_free_rate => Risk-free interest rate (annualized)
         volatility => Volatility of the underlying asset (annualized)
         time_steps => Number of time steps in the binomial tree
+        scheme => 'crr' (Cox-Ross-Rubinstein), 'tian' or 'lr' (Leisen-Reimer, which needs an odd
+                  number of steps, so an even time_steps is increased by one)
+        smoothing => Replace the last step of the tree with Black-Scholes prices (the BBS tree),
+                     which removes the odd/even oscillation caused by the kinked payoff
+        richardson => Extrapolate from trees with n and n/2 steps to cancel the leading error term. The error
+                      of CRR and Tian trees oscillates with n unless smoothed, so for them this turns on smoothing
+        exercise => 'european' or 'american'
         """
+        if scheme not in LATTICE_SCHEMES:
+            raise ValueError(f"Unknown lattice scheme '{scheme}'. Choose from {LATTICE_SCHEMES}")
+        if exercise not in EXERCISE_STYLES:
+            raise ValueError(f"Unknown exercise style '{exercise}'. Choose from {EXERCISE_STYLES}")
 
         # Renaming them to familiar symbols 
-        S = underlying_price
+        self.S = underlying_price
         self.K = strike_price
-        T = time_to_maturity / 365 # Converting days to years
+        self.T = time_to_maturity / 365 # Converting days to years
         self.r = risk_free_rate
-        sigma = volatility
-        self.n = time_steps
-        self.delT = T / self.n  # Time step size
+        self.sigma = volatility
+        self.scheme = scheme
+        # Extrapolating an oscillating error makes it worse, see richardson above
+        self.smoothing = smoothing or (richardson and scheme != 'lr')
+        self.richardson = richardson
+        self.exercise = exercise
+        self.n = time_steps + 1 if (scheme == 'lr' and time_steps % 2 == 0) else time_steps
+        self.delT = self.T / self.n  # Time step size
 
-        # Defining up and down factors
-        u = np.exp(sigma * np.sqrt(self.delT))
-        d = 1.0 / u  
+    def _tree_parameters(self, n, K):
+        """
+        Returns the up factor, down factor and up probability of an n step tree.
+        The Leisen-Reimer tree is centred on the strike, so for that scheme the
+        parameters are arrays with one entry per strike in K.
+        """
+        delT = self.T / n
+        a = np.exp(self.r * delT) # Growth factor over a single step
 
-        # Vector to hold option prices at each node
-        self.prices = np.zeros(self.n + 1)  # Array to hold prices at each node
-        # Vector to hold underlying asset prices at maturity for all combinations of u and d
-        self.S_vec = np.array([(S * u**j * d**(self.n - j)) for j in range(self.n + 1)])  
+        if self.scheme == 'crr':
+            u = np.exp(self.sigma * np.sqrt(delT))
+            d = 1.0 / u
+            p = (a - d) / (u - d)
+        elif self.scheme == 'tian':
+            # Matches the first three moments of the lognormal step
+            v = np.exp(self.sigma ** 2 * delT)
+            root = np.sqrt(v ** 2 + 2 * v - 3)
+            u = 0.5 * a * v * (v + 1 + root)
+            d = 0.5 * a * v * (v + 1 - root)
+            p = (a - d) / (u - d)
+        else:
+            # Leisen-Reimer: Peizer-Pratt inversion of the Black-Scholes d1 and d2
+            sigma_sqrt_T = self.sigma * np.sqrt(self.T)
+            d_1 = (np.log(self.S / K) + (self.r + 0.5 * self.sigma ** 2) * self.T) / sigma_sqrt_T
+            d_2 = d_1 - sigma_sqrt_T
+            p = self._peizer_pratt(d_2, n)
+            p_bar = self._peizer_pratt(d_1, n)
+            u = a * p_bar / p
+            d = (a - p * u) / (1 - p)
 
-        # Risk-neutral probabilities
-        a = np.exp(self.r * self.delT) 
-        self.p = (a - d) / (u - d)
-        self.q = 1.0 - self.p
+        return np.asarray(u, dtype=float), np.asarray(d, dtype=float), np.asarray(p, dtype=float)
 
-    def _find_call_option_price(self):
+    @staticmethod
+    def _peizer_pratt(z, n):
         """
-        Calculates price for call option according to the Binomial formula.
+        Peizer-Pratt method 2 inversion, mapping a normal quantile z to a binomial probability.
         """
-        # Initializing call option prices at maturity
-        self.prices[:] = np.maximum(self.S_vec - self.K, 0.0)
+        x = z / (n + 1 / 3 + 0.1 / (n + 1))
+        return 0.5 + np.sign(z) * 0.5 * np.sqrt(1 - np.exp(-x ** 2 * (n + 1 / 6)))
 
-        # Backward induction to calculate option price at each node
-        for i in range(self.n - 1, -1, -1):
-            self.prices[:-1] = np.exp(-self.r * self.delT) * (self.p * self.prices[1:] + self.q * self.prices[:-1])
+    @staticmethod
+    def _level_prices(S, u, d, level):
+        """
+        Underlying asset prices at the nodes of a level of the tree, S * u^j * d^(level - j).
+        u and d are column vectors with one row per strike, or scalars.
+        """
+        j = np.arange(level + 1)
+        return S * np.exp(j * np.log(u) + (level - j) * np.log(d))
+
+    @staticmethod
+    def _node_weights(p, discount, level):
+        """
+        Returns the discounted risk-neutral probability of reaching each node of a level,
+        discount^level * C(level, j) * p^j * (1 - p)^(level - j), computed in log space with
+        log-gamma binomial coefficients so large step counts do not overflow.
+        """
+        j = np.arange(level + 1)
+        log_binomial = gammaln(level + 1) - gammaln(j + 1) - gammaln(level - j + 1)
+        with np.errstate(divide='ignore'):
+            log_weights = log_binomial + j * np.log(p) + (level - j) * np.log(1 - p) + level * np.log(discount)
+        return np.exp(log_weights)
+
+    @staticmethod
+    def _backward_induction(option_values, p, discount, early_exercise=None, stop_level=0):
+        """
+        Rolls option values back through the tree. option_values holds the nodes of the
+        starting level on the first axis and can hold several payoffs on the remaining axes,
+        which are all inducted at once. p broadcasts against the remaining axes.
+
+        early_exercise => None for European options, or a tuple (S_level, d, K) with the underlying
+                          prices of the starting level as (nodes, strikes), the down factors and the
+                          strikes. option_values must then be a (nodes, 2, strikes) array of calls and
+                          puts, and every node is floored at its exercise value.
+        stop_level => Level of the tree to stop at, 0 being the root
+        Returns the option values at the nodes of stop_level, on the first axis.
+        """
+        values = np.array(option_values, dtype=float)
+        scratch = np.empty_like(values)
+        p_disc, q_disc = discount * p, discount * (1 - p)
+        if early_exercise is not None:
+            S_nodes, d, K = early_exercise
+            S_nodes = np.array(S_nodes, dtype=float)
+
+        # Updating in place over a shrinking window avoids allocating new arrays at every step
+        for i in range(len(values) - 1, stop_level, -1):
+            np.multiply(values[1:i + 1], p_disc, out=scratch[:i])
+            values[:i] *= q_disc
+            values[:i] += scratch[:i]
+
+            if early_exercise is not None:
+                # Underlying prices one level down are S * u^j * d^(i - 1 - j) = (S * u^j * d^(i - j)) / d
+                S_nodes[:i] /= d
+                np.maximum(values[:i, 0], S_nodes[:i] - K, out=values[:i, 0])
+                np.maximum(values[:i, 1], K - S_nodes[:i], out=values[:i, 1])
+        return values[:stop_level + 1]
+
+    def _level_values(self, K, n):
+        """
+        Builds an n step tree for the 1D array of strikes K and returns the call and put values
+        at the level the induction starts from, as (strikes, nodes) arrays, together with the
+        underlying prices at that level, the tree parameters as column vectors, the one step
+        discount factor and the level itself.
+        """
+        u, d, p = (np.broadcast_to(x, K.shape).reshape(-1, 1) for x in self._tree_parameters(n, K))
+        discount = np.exp(-self.r * self.T / n)
+        strikes = K.reshape(-1, 1)
+
+        # The smoothed tree starts from Black-Scholes values one step before maturity
+        level = n - 1 if self.smoothing else n
+        S_level = self._level_prices(self.S, u, d, level)
+        call_values = np.maximum(S_level - strikes, 0.0)
+        put_values = np.maximum(strikes - S_level, 0.0)
+        if self.smoothing:
+            call_bs, put_bs = BSModel.price_chain(S_level, strikes, 365 * self.T / n, self.r, self.sigma)
+            if self.exercise == 'american':
+                call_values, put_values = np.maximum(call_bs, call_values), np.maximum(put_bs, put_values)
+            else:
+                call_values, put_values = call_bs, put_bs
+
+        return call_values, put_values, S_level, u, d, p, discount, level
+
+    def _price_strikes(self, K, n, method):
+        """
+        Prices calls and puts for the 1D array of strikes K on an n step tree.
+        """
+        call_values, put_values, S_level, u, d, p, discount, level = self._level_values(K, n)
 
-        return self.prices[0]
+        if self.exercise == 'american':
+            # Early exercise needs the value at every node, so American options always use induction
+            values = np.stack((call_values.T, put_values.T), axis=1)
+            call_option_prices, put_option_prices = self._backward_induction(
+                values, p[:, 0], discount, early_exercise=(S_level.T, d[:, 0], K))[0]
+            return call_option_prices, put_option_prices
+        if method == 'closed_form':
+            # A European payoff only depends on one level, so the price is the probability-weighted
+            # sum of the values at that level, which takes O(n) instead of O(n^2)
+            weights = self._node_weights(p, discount, level)
+            return np.sum(call_values * weights, axis=1), np.sum(put_values * weights, axis=1)
+        if method == 'induction':
+            # One backward induction over a (nodes, 2, strikes) array
+            values = np.stack((call_values.T, put_values.T), axis=1)
+            call_option_prices, put_option_prices = self._backward_induction(values, p[:, 0], discount)[0]
+            return call_option_prices, put_option_prices
+        raise ValueError(f"Unknown method '{method}'. Choose 'closed_form' or 'induction'")
+
+    def price_chain(self, strike_prices, method='closed_form'):
+        """
+        Prices calls and puts for every strike in strike_prices.
+
+        method => 'closed_form' sums weighted terminal payoffs in O(n) per strike,
+                  'induction' runs one backward induction on a 2D array of all strikes.
+                  American options are always priced by induction.
+        Returns a tuple (call_prices, put_prices) of arrays with the shape of strike_prices.
+        """
+        K = np.asarray(strike_prices, dtype=float)
+        call_option_prices, put_option_prices = self._price_strikes(K.ravel(), self.n, method)
+
+        if self.richardson:
+            # Leisen-Reimer converges with order 2 in n, the other trees with order 1
+            order = 2 if self.scheme == 'lr' else 1
+            n_half = max(self.n // 2, 1)
+            if self.scheme == 'lr':
+                n_half |= 1
+            ratio = (self.n / n_half) ** order
+            call_half, put_half = self._price_strikes(K.ravel(), n_half, method)
+            call_option_prices = (ratio * call_option_prices - call_half) / (ratio - 1)
+            put_option_prices = (ratio * put_option_prices - put_half) / (ratio - 1)
+
+        return call_option_prices.reshape(K.shape), put_option_prices.reshape(K.shape)
+
+    def _find_call_option_price(self):
+        """
+        Calculates price for call option according to the Binomial formula.
+        """
+        return self.price_chain(self.K)[0].item()
         
     def _find_put_option_price(self):
         """
         Calculates price for put option according to the Binomial formula.
         """
-        # Initializing call option prices at maturity
-        self.prices[:] = np.maximum(self.K - self.S_vec, 0.0)
+        return self.price_chain(self.K)[1].item()
 
-        # Backward induction to calculate option price at each node
-        for i in range(self.n - 1, -1, -1):
-            self.prices[:-1] = np.exp(-self.r * self.delT) * (self.p * self.prices[1:] + self.q * self.prices[:-1])
+    def _find_option_prices(self):
+        # Calls and puts come out of the same tree
+        call_option_prices, put_option_prices = self.price_chain(self.K)
+        return call_option_prices.item(), put_option_prices.item()
 
-        return self.prices[0]
-        
+    def greeks_chain(self, strike_prices):
+        """
+        Calculates Greeks for every strike in strike_prices.
+
+        Delta, gamma and theta are read off the first two levels of the tree, which come out of
+        the same pass that prices the option, so they need no re-pricing. Vega and rho
+        cannot be read off a single tree and are central differences of bumped trees.
+        Richardson extrapolation is not applied to the Greeks.
+        Returns a tuple (call_greeks, put_greeks) of dictionaries of arrays with the shape of
+        strike_prices. Vega and rho are per unit change, and theta is per calendar day.
+        """
+        K = np.asarray(strike_prices, dtype=float)
+        strikes = K.ravel()
+        call_values, put_values, S_level, u, d, p, discount, level = self._level_values(strikes, self.n)
+        if level < 2:
+            raise ValueError("Greeks need a tree with at least 3 time steps")
+        u, d, p = u[:, 0], d[:, 0], p[:, 0]
+
+        # Option values at the three nodes of level 2, as a (3, 2, strikes) array
+        values = np.stack((call_values.T, put_values.T), axis=1)
+        if self.exercise == 'american':
+            level_2 = self._backward_induction(values, p, discount, early_exercise=(S_level.T, d, strikes),
+                                               stop_level=2)
+        else:
+            weights = self._node_weights(p[:, None], discount, level - 2)
+            level_2 = np.stack([np.sum(values[j:j + level - 1].transpose(1, 2, 0) * weights, axis=2)
+                                for j in range(3)])
+
+        # Roll back the last two steps by hand to keep the values at level 1 and the root
+        S_2 = self.S * np.stack((d * d, u * d, u * u))
+        S_1 = self.S * np.stack((d, u))
+        level_1 = discount * (p * level_2[1:] + (1 - p) * level_2[:-1])
+        root = discount * (p * level_1[1] + (1 - p) * level_1[0])
+        if self.exercise == 'american':
+            level_1 = np.maximum(level_1, np.stack((S_1 - strikes, strikes - S_1), axis=1))
+            root = np.maximum(root, np.stack((self.S - strikes, strikes - self.S)))
+
+        delta = (level_1[1] - level_1[0]) / (S_1[1] - S_1[0])
+        gamma = ((level_2[2] - level_2[1]) / (S_2[2] - S_2[1]) - (level_2[1] - level_2[0]) / (S_2[1] - S_2[0])) \
+            / (0.5 * (S_2[2] - S_2[0]))
+        # The middle node two steps ahead is only at the current spot for the CRR tree, so its value is
+        # moved back to the spot with delta and gamma before differencing in time
+        shift = S_2[1] - self.S
+        theta = (level_2[1] - delta * shift - 0.5 * gamma * shift ** 2 - root) / (2 * self.delT * 365)
+
+        # Central differences for the inputs that move the whole tree
+        vega = self._bumped_difference(strikes, 'sigma', 1e-3)
+        rho = self._bumped_difference(strikes, 'r', 1e-4)
+
+        greeks = []
+        for row in range(2):
+            greeks.append({name: value[row].reshape(K.shape) for name, value in
+                           (('delta', delta), ('gamma', gamma), ('vega', vega), ('theta', theta), ('rho', rho))})
+        return greeks[0], greeks[1]
+
+    def _bumped_difference(self, strikes, attribute, bump):
+        """
+        Central difference of call and put prices with respect to one of the model inputs.
+        Returns a (2, strikes) array.
+        """
+        prices = []
+        for sign in (1, -1):
+            bumped = copy.copy(self)
+            setattr(bumped, attribute, getattr(self, attribute) + sign * bump)
+            prices.append(np.stack(bumped.price_chain(strikes)))
+        return (prices[0] - prices[1]) / (2 * bump)
+
+    def _find_greeks(self, option_type):
+        call_greeks, put_greeks = self.greeks_chain(self.K)
+        greeks = call_greeks if option_type == 'call' else put_greeks
+        return {name: value.item() for name, value in greeks.items()}
@@ -2,10 +2,19 @@
 # This model uses the Black-Scholes formula to calculate the price of a European call or put option
 
 import numpy as np
-from scipy.stats import norm
 from .framework import OptionModel
+from .special import ndtr
+
+INV_SQRT_2PI = 1.0 / np.sqrt(2 * np.pi)
 
 class BSModel(OptionModel):
+    # Methods timed by the instrumentation module, by phase
+    INSTRUMENTED_PHASES = {
+        'setup': ('__init__',),
+        'payoff': ('_find_call_option_price', '_find_put_option_price', 'price_chain'),
+        'greeks': ('greeks_chain',),
+    }
+
     def __init__(self, underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility):
         """
         Initializes the necessary variables for the Black-Scholes Model.
@@ -30,13 +39,17 @@ class BSModel(OptionModel):
     
         self.K_p = K * np.exp(-r * T) # Finding the present value of the strike price
         self.S = S
+        self.K = K
+        self.time_to_maturity = time_to_maturity
+        self.r = r
+        self.sigma = sigma
     
     def _find_call_option_price(self):
         """
         Calculates price of call option as 
         S * N(d1) - K_p * N(d2)
         """
-        call_option_price = (self.S * norm.cdf(self.d_1, 0.0, 1.0) - self.K_p * norm.cdf(self.d_2, 0.0, 1.0))
+        call_option_price = (self.S * ndtr(self.d_1) - self.K_p * ndtr(self.d_2))
         return call_option_price
 
     def _find_put_option_price(self):
@@ -44,5 +57,76 @@ class BSModel(OptionModel):
         Calculates price of put option as 
         K_p * N(-d2) - S * N(-d1)
         """
-        put_option_price = (self.K_p * norm.cdf(-self.d_2, 0.0, 1.0) - self.S * norm.cdf(-self.d_1, 0.0, 1.0))
-        return put_option_price
\ No newline at end of file
+        put_option_price = (self.K_p * ndtr(-self.d_2) - self.S * ndtr(-self.d_1))
+        return put_option_price
+
+    @staticmethod
+    def price_chain(underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility):
+        """
+        Calculates call and put prices for a whole option chain in one vectorized pass.
+
+        Every input accepts a scalar or a NumPy array, as long as the shapes broadcast
+        together. Units are the same as for the constructor (time_to_maturity in days).
+        Returns a tuple (call_prices, put_prices) of arrays with the broadcast shape.
+        """
+        S, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (
+            underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility)))
+        T = T / 365 # Converting days to years
+
+        # d1 and d2 share the same log-moneyness and volatility terms
+        sigma_sqrt_T = sigma * np.sqrt(T)
+        d_1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / sigma_sqrt_T
+        d_2 = d_1 - sigma_sqrt_T
+        K_p = K * np.exp(-r * T) # Present value of the strike prices
+
+        # ndtr is the standard normal CDF without the loc/scale overhead of norm.cdf.
+        # N(-d) is evaluated directly rather than as 1 - N(d) to keep deep OTM puts accurate.
+        call_option_prices = S * ndtr(d_1) - K_p * ndtr(d_2)
+        put_option_prices = K_p * ndtr(-d_2) - S * ndtr(-d_1)
+        return call_option_prices, put_option_prices
+
+    @staticmethod
+    def greeks_chain(underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility):
+        """
+        Calculates closed-form Greeks for a whole option chain in one vectorized pass.
+
+        Inputs broadcast like price_chain. Returns a tuple (call_greeks, put_greeks) of dictionaries
+        with 'delta', 'gamma', 'vega', 'theta' and 'rho' arrays. Vega and rho are per unit change
+        of volatility and rate, and theta is per calendar day.
+        """
+        S, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (
+            underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility)))
+        T = T / 365 # Converting days to years
+
+        sqrt_T = np.sqrt(T)
+        d_1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * sqrt_T)
+        d_2 = d_1 - sigma * sqrt_T
+        K_p = K * np.exp(-r * T)
+        pdf_d1 = INV_SQRT_2PI * np.exp(-0.5 * d_1 ** 2)
+        N_d1, N_d2 = ndtr(d_1), ndtr(d_2)
+
+        # Gamma and vega are the same for calls and puts
+        gamma = pdf_d1 / (S * sigma * sqrt_T)
+        vega = S * pdf_d1 * sqrt_T
+        time_decay = -S * pdf_d1 * sigma / (2 * sqrt_T)
+
+        call_greeks = {
+            'delta': N_d1,
+            'gamma': gamma,
+            'vega': vega,
+            'theta': (time_decay - r * K_p * N_d2) / 365,
+            'rho': T * K_p * N_d2,
+        }
+        put_greeks = {
+            'delta': N_d1 - 1.0,
+            'gamma': gamma,
+            'vega': vega,
+            'theta': (time_decay + r * K_p * ndtr(-d_2)) / 365,
+            'rho': -T * K_p * ndtr(-d_2),
+        }
+        return call_greeks, put_greeks
+
+    def _find_greeks(self, option_type):
+        call_greeks, put_greeks = self.greeks_chain(self.S, self.K, self.time_to_maturity, self.r, self.sigma)
+        greeks = call_greeks if option_type == 'call' else put_greeks
+        return {name: value.item() if np.ndim(value) == 0 else value for name, value in greeks.items()}
@@ -0,0 +1,292 @@
+# FFT Model for option pricing
+# Prices European calls with the Carr-Madan method: the damped call price is the Fourier transform of an
+# expression in the characteristic function of the log price, so one FFT gives the prices on a whole grid
+# of log-moneyness. Any dynamics with a known characteristic function can be priced; Black-Scholes and the
+# Heston stochastic volatility model are provided. Strikes between the grid nodes are interpolated.
+
+import numpy as np
+from .framework import OptionModel
+
+DYNAMICS = ('black_scholes', 'heston')
+# Relative bumps of the inputs for the Greeks that are not read off the transform
+VOLATILITY_BUMP = 1e-3
+RATE_BUMP = 1e-4
+TIME_BUMP = 1e-4 # Years
+# Default damping, frequency step and grid size, giving a grid of log-moneyness from -12.6 to 12.6 with
+# 4096 points. They are adapted to the total variance, see _transform_parameters.
+DAMPING = 1.5
+FREQUENCY_STEP = 0.25
+GRID_SIZE = 4096
+# Largest loss of precision to round-off allowed by the damping, as a power of e
+PRECISION_DECAY = 10.0
+# The FFT sums the damped calls over copies of the grid shifted by its width; the grid is widened until the
+# copies overlap by less than exp(-ALIAS_DECAY)
+ALIAS_DECAY = 30.0
+# Unit calls may break the no-arbitrage bounds by this much before the prices are rejected
+ARBITRAGE_TOLERANCE = 1e-6
+
+class FFTModel(OptionModel):
+    # Methods timed by the instrumentation module, by phase
+    INSTRUMENTED_PHASES = {
+        'setup': ('__init__',),
+        'transform': ('_unit_calls',),
+        'payoff': ('_interpolate',),
+        'greeks': ('greeks_chain',),
+    }
+
+    def __init__(self, underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility,
+                 dynamics='black_scholes', mean_reversion=2.0, long_run_variance=None, vol_of_vol=0.5,
+                 correlation=-0.7, grid_size=None, frequency_step=None, damping=None):
+        """
+        Initializes the necessary variables for the FFT Model.
+
+        underlying_price => Current price of the underlying asset
+        strike_price => Strike price of the option
+        time_to_maturity => Time to maturity in days
+        risk_free_rate => Risk-free interest rate (annualized)
+        volatility => Volatility of the underlying asset (annualized); for Heston the current
+                      instantaneous volatility, so the initial variance is volatility^2
+        dynamics => 'black_scholes' or 'heston'
+        mean_reversion => Heston speed of mean reversion of the variance (kappa)
+        long_run_variance => Heston long-run variance (theta), by default volatility^2
+        vol_of_vol => Heston volatility of the variance (xi)
+        correlation => Heston correlation of the underlying and its variance (rho)
+        grid_size => Number of points of the FFT, best a power of two. By default 4096, made larger
+                     when the total variance is so low that more frequencies are needed
+        frequency_step => Spacing of the integration grid; the grid of log-moneyness then has a spacing
+                          of 2 pi / (grid_size * frequency_step) and is centred on the money. By default
+                          0.25, made smaller when the total variance needs a wider grid
+        damping => Exponent alpha of the exp(alpha * k) damping that makes the call price integrable,
+                   by default 1.5, made smaller when the total variance is high
+        """
+        if dynamics not in DYNAMICS:
+            raise ValueError(f"Unknown dynamics '{dynamics}'. Choose from {DYNAMICS}")
+        if damping is not None and damping <= 0:
+            raise ValueError("damping must be positive")
+        if volatility <= 0 or time_to_maturity <= 0:
+            raise ValueError("volatility and time_to_maturity must be positive")
+
+        # Renaming them to familiar symbols
+        self.S = underlying_price
+        self.K = strike_price
+        self.T = time_to_maturity / 365 # Converting days to years
+        self.r = risk_free_rate
+        self.sigma = volatility
+        self.dynamics = dynamics
+        self.kappa = mean_reversion
+        self.theta = long_run_variance
+        self.xi = vol_of_vol
+        self.rho = correlation
+        self.alpha, self.eta, self.N = self._transform_parameters(damping, frequency_step, grid_size)
+        self.grid_values = None # Unit calls on the log-moneyness grid, filled on first pricing
+
+    def _characteristic_function(self, u, sigma, r, T):
+        """
+        Characteristic function E[exp(i u log(S_T / S))] of the log return at complex arguments u.
+        """
+        if self.dynamics == 'black_scholes':
+            return np.exp(1j * u * (r - 0.5 * sigma ** 2) * T - 0.5 * sigma ** 2 * u ** 2 * T)
+
+        # Heston, in the formulation of Albrecher et al. that stays on the principal branch of the logarithm
+        v0 = sigma ** 2
+        theta = v0 if self.theta is None else self.theta
+        beta = self.kappa - self.rho * self.xi * 1j * u
+        d = np.sqrt(beta ** 2 + self.xi ** 2 * (1j * u + u ** 2))
+        g = (beta - d) / (beta + d)
+        decay = np.exp(-d * T)
+        C = (1j * u * r * T + self.kappa * theta / self.xi ** 2
+             * ((beta - d) * T - 2 * np.log((1 - g * decay) / (1 - g))))
+        D = (beta - d) / self.xi ** 2 * (1 - decay) / (1 - g * decay)
+        return np.exp(C + D * v0)
+
+    def _transform_parameters(self, damping, frequency_step, grid_size):
+        """
+        Returns the damping alpha, the frequency step and the grid size, choosing those not given from the
+        total variance v.
+        For Heston the larger of the initial and long-run variance is used.
+
+        The damped calls exp(alpha k) c(k) peak near exp(alpha (alpha + 1) v / 2), and the prices lose that
+        factor of precision to round-off, so alpha is lowered from DAMPING until alpha (alpha + 1) v / 2 is
+        at most PRECISION_DECAY.
+
+        The transform returns the damped calls summed over copies of the grid shifted by its width 2b. The
+        right tail of c(k) falls like exp(-(k - v/2)^2 / (2v)) and the left tail of the damped calls like
+        exp(alpha k), so the copies stay below exp(-ALIAS_DECAY) everywhere on the grid when
+        (b - v/2)^2 >= 2v (2 alpha b + ALIAS_DECAY) and 2 alpha b >= ALIAS_DECAY. High total variance
+        therefore needs a wider grid, which costs resolution in log-moneyness but not accuracy, since the
+        prices are smooth there.
+
+        The characteristic function falls like exp(-v u^2 / 2), so low total variance needs frequencies
+        up to sqrt(2 ALIAS_DECAY / v), and the grid size is doubled until they are covered.
+        """
+        variance = self.sigma ** 2 if self.theta is None else max(self.sigma ** 2, self.theta)
+        v = variance * self.T
+        if damping is None:
+            # Positive root of alpha^2 + alpha = 2 PRECISION_DECAY / v
+            damping = min(DAMPING, 0.5 * (np.sqrt(1 + 8 * PRECISION_DECAY / v) - 1))
+        if frequency_step is None:
+            # Smallest half-width b solving the quadratic in b above
+            linear = v * (1 + 4 * damping)
+            half_width = max(0.5 * (linear + np.sqrt(linear ** 2 - v ** 2 + 8 * v * ALIAS_DECAY)),
+                             ALIAS_DECAY / (2 * damping))
+            frequency_step = min(FREQUENCY_STEP, np.pi / half_width)
+        if grid_size is None:
+            grid_size = GRID_SIZE
+            while grid_size * frequency_step < np.sqrt(2 * ALIAS_DECAY / v):
+                grid_size *= 2
+        return damping, frequency_step, grid_size
+
+    def _log_moneyness_grid(self):
+        # Spacing of the grid of log-moneyness, and its first node
+        spacing = 2 * np.pi / (self.N * self.eta)
+        return spacing, -0.5 * self.N * spacing
+
+    def _unit_calls(self, sigma=None, r=None, T=None):
+        """
+        Calls on a unit underlying price at every node of the grid of log-moneyness k = log(K / S),
+        with their first and second derivatives in k, as a (3, grid_size) array from a single FFT.
+
+        c(k) = exp(-alpha k) / pi * integral over v of Re(exp(-i v k) psi(v)), with
+        psi(v) = exp(-r T) phi(v - (alpha + 1) i) / (alpha^2 + alpha - v^2 + i (2 alpha + 1) v),
+        integrated with the trapezoidal rule; differentiating under the integral gives the derivatives.
+        The trapezoidal rule keeps the period of the transform at the full width of the grid, where
+        Simpson's weights would add a copy of the grid shifted by only half of it.
+        """
+        sigma = self.sigma if sigma is None else sigma
+        r = self.r if r is None else r
+        T = self.T if T is None else T
+        alpha = self.alpha
+        spacing, k_start = self._log_moneyness_grid()
+
+        v = self.eta * np.arange(self.N)
+        psi = (np.exp(-r * T) * self._characteristic_function(v - (alpha + 1) * 1j, sigma, r, T)
+               / (alpha ** 2 + alpha - v ** 2 + 1j * (2 * alpha + 1) * v))
+        trapezoid = np.ones(self.N)
+        trapezoid[0] = 0.5
+        terms = np.exp(-1j * k_start * v) * psi * self.eta * trapezoid
+        # The integrals of psi, -i v psi and -v^2 psi against exp(-i v k), at every node at once
+        integral, first, second = np.fft.fft(np.stack((terms, -1j * v * terms, -v ** 2 * terms)), axis=1).real / np.pi
+
+        damping = np.exp(-alpha * (k_start + spacing * np.arange(self.N)))
+        return damping * np.stack((integral,
+                                   first - alpha * integral,
+                                   second - 2 * alpha * first + alpha ** 2 * integral))
+
+    def _interpolate(self, values, k):
+        """
+        Interpolates unit calls from _unit_calls at the log-moneyness points k. The value and the first
+        derivative are cubic Hermite interpolants, which use the derivative one order up at the nodes,
+        and the second derivative is linear. Returns a (3, points) array.
+        """
+        spacing, k_start = self._log_moneyness_grid()
+        position = (k - k_start) / spacing
+        if np.any(position < 0) or np.any(position > self.N - 1):
+            raise ValueError("Strikes lie outside the grid of the FFT; use a smaller frequency_step")
+        j = np.minimum(position.astype(int), self.N - 2)
+        t = position - j
+        h00, h10 = 2 * t ** 3 - 3 * t ** 2 + 1, (t ** 3 - 2 * t ** 2 + t) * spacing
+        h01, h11 = 3 * t ** 2 - 2 * t ** 3, (t ** 3 - t ** 2) * spacing
+
+        def hermite(f, df):
+            return h00 * f[j] + h10 * df[j] + h01 * f[j + 1] + h11 * df[j + 1]
+
+        return np.stack((hermite(values[0], values[1]),
+                         hermite(values[1], values[2]),
+                         values[2][j] * (1 - t) + values[2][j + 1] * t))
+
+    def _prices(self, strike_prices, **bumped):
+        """
+        Calls and puts at broadcast arrays of strikes, with their first and second derivatives in
+        log-moneyness, as two (3, strikes) arrays per unit underlying price.
+        Puts follow from put-call parity, p(k) = c(k) - 1 + exp(k - r T).
+        """
+        if bumped:
+            values = self._unit_calls(**bumped)
+        else:
+            if self.grid_values is None:
+                self.grid_values = self._unit_calls()
+            values = self.grid_values
+        r = bumped.get('r', self.r)
+        T = bumped.get('T', self.T)
+        K = np.asarray(strike_prices, dtype=float)
+        if np.any(K <= 0):
+            raise ValueError("Strike prices must be positive")
+        k = np.log(K.ravel() / self.S)
+        calls = self._interpolate(values, k)
+        forward_strike = np.exp(k - r * T)
+        # Calls lie between their intrinsic value and the underlying, and fall with the strike at most
+        # as fast as the discounted strike rises. Prices outside these bounds mean the transform broke down.
+        tolerance = ARBITRAGE_TOLERANCE
+        if (np.any(calls[0] < np.maximum(1 - forward_strike, 0.0) - tolerance) or np.any(calls[0] > 1 + tolerance)
+                or np.any(calls[1] > tolerance) or np.any(calls[1] < -forward_strike - tolerance)):
+            raise ValueError("The FFT prices break the no-arbitrage bounds; "
+                             "use a larger grid_size or a smaller frequency_step or damping")
+        puts = calls + forward_strike
+        puts[0] -= 1
+        return calls, puts
+
+    def price_chain(self, strike_prices):
+        """
+        Prices calls and puts for every strike in strike_prices, e.g. the strike_prices of
+        helper.get_option_prices, from a single FFT whose grid prices are interpolated to the strikes.
+        Returns a tuple (call_prices, put_prices) of arrays with the shape of strike_prices.
+        """
+        shape = np.shape(strike_prices)
+        calls, puts = self._prices(strike_prices)
+        return self.S * calls[0].reshape(shape), self.S * puts[0].reshape(shape)
+
+    def greeks_chain(self, strike_prices):
+        """
+        Calculates Greeks for every strike in strike_prices.
+
+        With V(S, K) = S * v(log(K / S)), delta is v - v' and gamma is (v'' - v') / S, with the
+        derivatives from the same FFT as the prices. Vega, rho and theta are central differences of
+        FFTs with bumped volatility, rate and time to maturity; for Heston, vega moves the current
+        volatility (and the long-run variance with it when long_run_variance is not given).
+        Returns a tuple (call_greeks, put_greeks) of dictionaries of arrays with the shape of
+        strike_prices. Vega and rho are per unit change, and theta is per calendar day.
+        """
+        shape = np.shape(strike_prices)
+        base = self._prices(strike_prices)
+        time_bump = min(TIME_BUMP, 0.5 * self.T)
+        bumped = {}
+        for name, value, bump in (('sigma', self.sigma, VOLATILITY_BUMP), ('r', self.r, RATE_BUMP),
+                                  ('T', self.T, time_bump)):
+            up = self._prices(strike_prices, **{name: value + bump})
+            down = self._prices(strike_prices, **{name: value - bump})
+            bumped[name] = [self.S * (u[0] - d[0]) / (2 * bump) for u, d in zip(up, down)]
+
+        greeks = []
+        for column in range(2):
+            v, dv, d2v = base[column]
+            greeks.append({
+                'delta': (v - dv).reshape(shape),
+                'gamma': ((d2v - dv) / self.S).reshape(shape),
+                'vega': bumped['sigma'][column].reshape(shape),
+                # Theta is the change per calendar day as maturity gets closer
+                'theta': (-bumped['T'][column] / 365).reshape(shape),
+                'rho': bumped['r'][column].reshape(shape),
+            })
+        return greeks[0], greeks[1]
+
+    def _find_call_option_price(self):
+        """
+        Calculates price for call option from the Fourier transform of its characteristic function.
+        """
+        return self.price_chain(self.K)[0].item()
+
+    def _find_put_option_price(self):
+        """
+        Calculates price for put option through put-call parity with the call.
+        """
+        return self.price_chain(self.K)[1].item()
+
+    def _find_option_prices(self):
+        # Calls and puts come out of the same transform
+        call_option_prices, put_option_prices = self.price_chain(self.K)
+        return call_option_prices.item(), put_option_prices.item()
+
+    def _find_greeks(self, option_type):
+        call_greeks, put_greeks = self.greeks_chain(self.K)
+        greeks = call_greeks if option_type == 'call' else put_greeks
+        return {name: value.item() for name, value in greeks.items()}
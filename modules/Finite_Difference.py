@@ -0,0 +1,447 @@
+# Finite Difference Model for option pricing
+# Solves the Black-Scholes PDE backwards from expiry on a grid of underlying prices with Crank-Nicolson.
+# Prices are homogeneous in the underlying price and the strike, V(S, K) = K * v(S / K), so one solve
+# for a unit strike on a grid of moneyness S / K prices every spot and every strike at once.
+
+import numpy as np
+from .framework import OptionModel
+
+EXERCISE_STYLES = ('european', 'american')
+AMERICAN_METHODS = ('penalty', 'psor')
+# Grid of moneyness reaches this many standard deviations of the log price above the largest point,
+# but at most MAX_GRID_MULTIPLE times it, beyond which the error of the boundary values is accepted
+GRID_WIDTH = 5.0
+MAX_GRID_MULTIPLE = 64.0
+# spot_steps intervals cover grids up to this moneyness, and wider grids get proportionally more intervals,
+# so the grid step next to the strike does not grow with the volatility and the maturity
+SPOT_STEPS_SPAN = 4.0
+PENALTY = 1e8
+PSOR_RELAXATION = 1.2
+TOLERANCE = 1e-9
+MAX_ITERATIONS = 200
+# Cells of an FDPriceGrid span days to maturity and volatilities within these factors, solved at most
+# VOLATILITY_NODES times each
+MATURITY_BAND = 4.0
+VOLATILITY_BAND = 2.0
+VOLATILITY_NODES = 8
+
+class FDModel(OptionModel):
+    # Methods timed by the instrumentation module, by phase
+    INSTRUMENTED_PHASES = {
+        'setup': ('__init__',),
+        'solve': ('_solve',),
+        'greeks': ('greeks_chain', 'greeks_spots'),
+    }
+
+    def __init__(self, underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility, time_steps=200,
+                 spot_steps=400, exercise='european', american_method='penalty', rannacher_steps=2):
+        """
+        Initializes the necessary variables for the Finite Difference Model.
+
+        underlying_price => Current price of the underlying asset
+        strike_price => Strike price of the option
+        time_to_maturity => Time to maturity in days
+        risk_free_rate => Risk-free interest rate (annualized)
+        volatility => Volatility of the underlying asset (annualized)
+        time_steps => Number of Crank-Nicolson time steps
+        spot_steps => Number of intervals of the grid of underlying prices, raised in proportion on grids
+                      reaching beyond SPOT_STEPS_SPAN times the strike
+        exercise => 'european' or 'american'
+        american_method => 'penalty' (penalty iteration with banded solves) or 'psor'
+                           (projected successive over-relaxation) for the early exercise constraint
+        rannacher_steps => Number of leading time steps replaced by two fully implicit half steps each,
+                           which damps the oscillations Crank-Nicolson shows next to the kinked payoff
+        """
+        if exercise not in EXERCISE_STYLES:
+            raise ValueError(f"Unknown exercise style '{exercise}'. Choose from {EXERCISE_STYLES}")
+        if american_method not in AMERICAN_METHODS:
+            raise ValueError(f"Unknown American method '{american_method}'. Choose from {AMERICAN_METHODS}")
+        if not 0 <= rannacher_steps <= time_steps:
+            raise ValueError("rannacher_steps must be between 0 and time_steps")
+
+        # Renaming them to familiar symbols
+        self.S = underlying_price
+        self.K = strike_price
+        self.T = time_to_maturity / 365 # Converting days to years
+        self.r = risk_free_rate
+        self.sigma = volatility
+        self.n = time_steps
+        self.m = spot_steps
+        self.exercise = exercise
+        self.american_method = american_method
+        self.rannacher_steps = rannacher_steps
+
+    def _time_steps(self):
+        # (step size, implicitness) of every step, 1 being fully implicit and 0.5 Crank-Nicolson
+        delT = self.T / self.n
+        return [(0.5 * delT, 1.0)] * (2 * self.rannacher_steps) + [(delT, 0.5)] * (self.n - self.rannacher_steps)
+
+    def _solve(self, x_max, sigma, r, snapshot_times=None):
+        """
+        Solves for calls and puts with a unit strike on a grid of moneyness from 0 to x_max.
+        Returns the grid step, the values at the grid nodes at time 0 and one step later,
+        both as (nodes, 2) arrays of calls and puts, the length of that step in years, and the
+        snapshots.
+
+        The PDE has constant coefficients, so the values after marching back from expiry by tau are
+        the prices of options with tau left. With a sorted array of snapshot_times in years, the
+        snapshots are the values with each of those times left, as a (times, nodes, 2) array,
+        interpolated linearly between time steps; otherwise they are None.
+        """
+        from scipy.linalg import solve_banded
+
+        m = self._spot_steps(x_max)
+        dx = x_max / m
+        x = dx * np.arange(m + 1)
+        i = np.arange(1, m)
+        # The operator 0.5 sigma^2 x^2 V'' + r x V' - r V on the uniform grid, in terms of node indices
+        lower = 0.5 * sigma ** 2 * i ** 2 - 0.5 * r * i
+        main = -(sigma ** 2 * i ** 2 + r)
+        upper = 0.5 * sigma ** 2 * i ** 2 + 0.5 * r * i
+
+        exercise_values = np.stack((np.maximum(x - 1, 0.0), np.maximum(1 - x, 0.0)), axis=1)
+        values = exercise_values.copy()
+        previous, tau = values, 0.0
+        american = self.exercise == 'american'
+        banded = {}
+        if snapshot_times is not None:
+            snapshots = np.empty((len(snapshot_times),) + values.shape)
+            taken = np.searchsorted(snapshot_times, 0.0, side='right')
+            snapshots[:taken] = values
+        for delT, theta in self._time_steps():
+            tau += delT
+            # Far from the strike a call is worth x minus the discounted strike and a put the discounted strike
+            discount = np.exp(-r * tau)
+            low = np.array([0.0, 1.0 if american else discount])
+            high = np.array([x[-1] - discount, 0.0])
+
+            explicit = (1 - theta) * delT
+            rhs = values[1:-1] + explicit * (lower[:, None] * values[:-2] + main[:, None] * values[1:-1]
+                                             + upper[:, None] * values[2:])
+            rhs[0] += theta * delT * lower[0] * low
+            rhs[-1] += theta * delT * upper[-1] * high
+
+            # Matrix of the implicit part in the diagonal ordered form of solve_banded, one per step type
+            if (delT, theta) not in banded:
+                ab = np.zeros((3, m - 1))
+                ab[0, 1:] = -theta * delT * upper[:-1]
+                ab[1] = 1 - theta * delT * main
+                ab[2, :-1] = -theta * delT * lower[1:]
+                banded[(delT, theta)] = ab
+            ab = banded[(delT, theta)]
+
+            if american:
+                interior = self._american_step(ab, rhs, exercise_values[1:-1], solve_banded)
+            else:
+                interior = solve_banded((1, 1), ab, rhs, check_finite=False)
+            previous, values = values, np.vstack((low, interior, high))
+            if snapshot_times is not None:
+                while taken < len(snapshot_times) and snapshot_times[taken] <= tau:
+                    weight = (snapshot_times[taken] - (tau - delT)) / delT
+                    snapshots[taken] = (1 - weight) * previous + weight * values
+                    taken += 1
+        if snapshot_times is None:
+            return dx, values, previous, delT, None
+        # Times lost to round-off in the sum of the steps are the values at maturity
+        snapshots[taken:] = values
+        return dx, values, previous, delT, snapshots
+
+    def _american_step(self, ab, rhs, exercise_values, solve_banded):
+        """
+        Solves one time step of the linear complementarity problem A V >= rhs, V >= exercise_values,
+        with one of the two holding with equality at every node, for calls and puts.
+        """
+        values = solve_banded((1, 1), ab, rhs, check_finite=False)
+        if self.american_method == 'penalty':
+            # Add a large penalty on the diagonal wherever the value falls below exercise and re-solve,
+            # until the set of penalized nodes stops changing
+            for column in range(2):
+                active = values[:, column] < exercise_values[:, column]
+                for _ in range(MAX_ITERATIONS):
+                    if not active.any():
+                        break
+                    penalized = ab.copy()
+                    penalized[1] += PENALTY * active
+                    values[:, column] = solve_banded((1, 1), penalized, rhs[:, column] + PENALTY * active
+                                                     * exercise_values[:, column], check_finite=False)
+                    new_active = values[:, column] < exercise_values[:, column]
+                    if np.array_equal(new_active, active):
+                        break
+                    active = new_active
+            return np.maximum(values, exercise_values)
+
+        # Projected SOR in red-black order, so every half sweep is one vectorized update
+        lower, main, upper = ab[2, :-1], ab[1], ab[0, 1:]
+        values = np.maximum(values, exercise_values)
+        for _ in range(MAX_ITERATIONS):
+            change = 0.0
+            for parity in (0, 1):
+                left = np.zeros_like(values)
+                right = np.zeros_like(values)
+                left[1:] = lower[:, None] * values[:-1]
+                right[:-1] = upper[:, None] * values[1:]
+                gauss_seidel = (rhs[parity::2] - left[parity::2] - right[parity::2]) / main[parity::2, None]
+                updated = np.maximum(values[parity::2] + PSOR_RELAXATION * (gauss_seidel - values[parity::2]),
+                                     exercise_values[parity::2])
+                change = max(change, np.max(np.abs(updated - values[parity::2])))
+                values[parity::2] = updated
+            if change < TOLERANCE:
+                break
+        return values
+
+    @staticmethod
+    def _stencil(dx, nodes, x):
+        """
+        Cubic Lagrange interpolation on a grid of nodes at the points x, over the four nearest nodes.
+        Returns the index of the second of them for every point and their four weights as (points, 1) arrays.
+        """
+        position = x / dx
+        j = np.clip(np.floor(position).astype(int), 1, nodes - 3)
+        t = (position - j)[:, None]
+        return j, (-t * (t - 1) * (t - 2) / 6, (t + 1) * (t - 1) * (t - 2) / 2,
+                   -(t + 1) * t * (t - 2) / 2, (t + 1) * t * (t - 1) / 6)
+
+    @staticmethod
+    def _interpolate(dx, values, x):
+        """
+        Cubic Lagrange interpolation of grid values (nodes, ...) at the points x, over the four nearest nodes.
+        """
+        j, weights = FDModel._stencil(dx, len(values), x)
+        return sum(w * values[j + k] for w, k in zip(weights, (-1, 0, 1, 2)))
+
+    def _grid_end(self, moneyness):
+        # Largest moneyness of the grid, far enough above every point for the boundary values to hold
+        if np.any(moneyness <= 0):
+            raise ValueError("Underlying and strike prices must be positive")
+        return max(np.max(moneyness), 1.0) * min(np.exp(GRID_WIDTH * self.sigma * np.sqrt(self.T)), MAX_GRID_MULTIPLE)
+
+    def _spot_steps(self, x_max):
+        # Number of intervals of a grid of moneyness from 0 to x_max, see SPOT_STEPS_SPAN
+        return max(self.m, int(np.ceil(self.m * x_max / SPOT_STEPS_SPAN)))
+
+    def _unit_values(self, moneyness, greeks=False, sigma=None, r=None, x_max=None):
+        """
+        Solves once for a unit strike on a grid covering every point in the 1D array moneyness and
+        returns (values, delta, gamma, theta) at those points as (points, 2) arrays of calls and puts,
+        with None for the Greeks unless asked for. Gamma and theta still need scaling by the strike.
+        """
+        sigma = self.sigma if sigma is None else sigma
+        r = self.r if r is None else r
+        x_max = self._grid_end(moneyness) if x_max is None else x_max
+        dx, values, previous, delT, _ = self._solve(x_max, sigma, r)
+        grid_values = self._interpolate(dx, values, moneyness)
+        if not greeks:
+            return grid_values, None, None, None
+
+        # Delta and gamma are differences between neighbouring grid nodes, so they come with the solve
+        delta = np.gradient(values, dx, axis=0)
+        gamma = np.zeros_like(values)
+        gamma[1:-1] = (values[2:] - 2 * values[1:-1] + values[:-2]) / dx ** 2
+        # Theta is the difference to the values one time step closer to expiry, per calendar day
+        theta = (self._interpolate(dx, previous, moneyness) - grid_values) / (delT * 365)
+        return grid_values, self._interpolate(dx, delta, moneyness), self._interpolate(dx, gamma, moneyness), theta
+
+    def _prices(self, underlying_prices, strike_prices):
+        S, K = np.broadcast_arrays(np.asarray(underlying_prices, dtype=float), np.asarray(strike_prices, dtype=float))
+        values = self._unit_values((S / K).ravel())[0] * K.reshape(-1, 1)
+        return values[:, 0].reshape(S.shape), values[:, 1].reshape(S.shape)
+
+    def price_chain(self, strike_prices):
+        """
+        Prices calls and puts for every strike in strike_prices from a single solve.
+        Returns a tuple (call_prices, put_prices) of arrays with the shape of strike_prices.
+        """
+        return self._prices(self.S, strike_prices)
+
+    def price_spots(self, underlying_prices):
+        """
+        Prices calls and puts at every underlying price in underlying_prices from a single solve,
+        e.g. for a scenario grid of spot moves.
+        Returns a tuple (call_prices, put_prices) of arrays with the shape of underlying_prices.
+        """
+        return self._prices(underlying_prices, self.K)
+
+    def _greeks(self, S, K):
+        """
+        Greeks at broadcast arrays of underlying and strike prices, as (call_greeks, put_greeks).
+        """
+        S, K = np.broadcast_arrays(np.asarray(S, dtype=float), np.asarray(K, dtype=float))
+        moneyness, strikes = (S / K).ravel(), K.reshape(-1, 1)
+        x_max = self._grid_end(moneyness)
+        _, delta, gamma, theta = self._unit_values(moneyness, greeks=True, x_max=x_max)
+        gamma, theta = gamma / strikes, theta * strikes
+
+        # Central differences of bumped solves for the inputs that change the PDE itself,
+        # on the same grid so the discretization error cancels
+        bumped = {}
+        for name, bump in (('sigma', 1e-3), ('r', 1e-4)):
+            up = self._unit_values(moneyness, x_max=x_max, **{name: getattr(self, name) + bump})[0]
+            down = self._unit_values(moneyness, x_max=x_max, **{name: getattr(self, name) - bump})[0]
+            bumped[name] = (up - down) / (2 * bump) * strikes
+
+        greeks = []
+        for column in range(2):
+            greeks.append({name: value[:, column].reshape(S.shape) for name, value in
+                           (('delta', delta), ('gamma', gamma), ('vega', bumped['sigma']), ('theta', theta),
+                            ('rho', bumped['r']))})
+        return greeks[0], greeks[1]
+
+    def greeks_chain(self, strike_prices):
+        """
+        Calculates Greeks for every strike in strike_prices.
+
+        Delta, gamma and theta come from the grid of the pricing solve. Vega and rho are
+        central differences of solves with bumped volatility and rate.
+        Returns a tuple (call_greeks, put_greeks) of dictionaries of arrays with the shape of
+        strike_prices. Vega and rho are per unit change, and theta is per calendar day.
+        """
+        return self._greeks(self.S, strike_prices)
+
+    def greeks_spots(self, underlying_prices):
+        """
+        Calculates Greeks at every underlying price in underlying_prices, like greeks_chain.
+        """
+        return self._greeks(underlying_prices, self.K)
+
+    def _find_call_option_price(self):
+        """
+        Calculates price for call option by solving the Black-Scholes PDE.
+        """
+        return self.price_chain(self.K)[0].item()
+
+    def _find_put_option_price(self):
+        """
+        Calculates price for put option by solving the Black-Scholes PDE.
+        """
+        return self.price_chain(self.K)[1].item()
+
+    def _find_option_prices(self):
+        # Calls and puts come out of the same solve
+        call_option_prices, put_option_prices = self.price_chain(self.K)
+        return call_option_prices.item(), put_option_prices.item()
+
+    def _find_greeks(self, option_type):
+        call_greeks, put_greeks = self.greeks_chain(self.K)
+        greeks = call_greeks if option_type == 'call' else put_greeks
+        return {name: value.item() for name, value in greeks.items()}
+
+
+class _PriceSheet:
+    """
+    Prices of one cell of an FDPriceGrid, from one solve per volatility node on a shared grid of moneyness.
+    One solve to the longest maturity prices every shorter one, see FDModel._solve. Volatility is solved at
+    every distinct value when there are at most volatility_nodes of them, and otherwise at volatility_nodes
+    Chebyshev points between the lowest and the highest, with barycentric polynomial interpolation in between.
+    """
+    def __init__(self, days, volatilities, risk_free_rate, max_moneyness, volatility_nodes, model_options):
+        self.days, self.volatility_range = days, (volatilities[0], volatilities[-1])
+        if len(volatilities) <= volatility_nodes:
+            self.nodes, self.weights = volatilities, None
+        else:
+            low, high = self.volatility_range
+            j = np.arange(volatility_nodes)
+            self.nodes = 0.5 * (low + high) + 0.5 * (high - low) * np.cos(np.pi * j / (volatility_nodes - 1))
+            # Barycentric weights of the Chebyshev extreme points
+            self.weights = (-1.0) ** j
+            self.weights[[0, -1]] *= 0.5
+
+        longest = days[-1]
+        model_options = {'time_steps': max(200, int(np.ceil(longest))), **model_options}
+        # Every node solves on the grid of the highest volatility, so discretization errors are smooth in volatility
+        x_max = FDModel(1.0, 1.0, longest, risk_free_rate, self.nodes.max(), **model_options)._grid_end(
+            np.array([max_moneyness]))
+        # (times, grid nodes, 2) values of every volatility node
+        self.snapshots = []
+        for sigma in self.nodes:
+            model = FDModel(1.0, 1.0, longest, risk_free_rate, sigma, **model_options)
+            self.dx, _, _, _, snapshots = model._solve(x_max, sigma, risk_free_rate, days / 365)
+            self.snapshots.append(snapshots)
+
+    def _node_prices(self, node, maturity, stencil):
+        # Prices of one volatility node from the snapshots at maturity, which indexes self.days, and the
+        # moneyness stencil, which every node shares
+        j, weights = stencil
+        snapshots = self.snapshots[node]
+        return sum(w * snapshots[maturity, j + k] for w, k in zip(weights, (-1, 0, 1, 2)))
+
+    def prices(self, moneyness, time_to_maturity, volatility):
+        maturity = np.searchsorted(self.days, time_to_maturity)
+        if np.any(self.days[np.minimum(maturity, len(self.days) - 1)] != time_to_maturity):
+            raise ValueError("The grid was not built for some of the days to maturity")
+
+        if self.weights is None:
+            node = np.searchsorted(self.nodes, volatility)
+            if np.any(self.nodes[np.minimum(node, len(self.nodes) - 1)] != volatility):
+                raise ValueError("The grid was not built for some of the volatilities")
+            values = np.empty((len(moneyness), 2))
+            for n in range(len(self.nodes)):
+                rows = np.flatnonzero(node == n)
+                if len(rows):
+                    stencil = FDModel._stencil(self.dx, self.snapshots[n].shape[1], moneyness[rows])
+                    values[rows] = self._node_prices(n, maturity[rows], stencil)
+            return values
+
+        if np.any((volatility < self.volatility_range[0]) | (volatility > self.volatility_range[1])):
+            raise ValueError("The grid was not built for some of the volatilities")
+        stencil = FDModel._stencil(self.dx, self.snapshots[0].shape[1], moneyness)
+        numerator = np.zeros((len(moneyness), 2))
+        denominator = np.zeros(len(moneyness))
+        for n, (node, weight) in enumerate(zip(self.nodes, self.weights)):
+            difference = volatility - node
+            # A point on a node takes the node's value, since its term outweighs all the others
+            term = weight / np.where(difference == 0, 1e-300, difference)
+            numerator += term[:, None] * self._node_prices(n, maturity, stencil)
+            denominator += term
+        return numerator / denominator[:, None]
+
+
+class FDPriceGrid:
+    """
+    Prices with a unit strike over moneyness, days to maturity and volatility from a few FDModel solves,
+    for valuing many options at once, e.g. a portfolio over a grid of scenarios.
+
+    Points are split into cells of days to maturity and volatility within a factor of MATURITY_BAND and
+    VOLATILITY_BAND, which keeps the grid of moneyness and the time steps of each cell close to those an
+    FDModel of any of its points would solve on. A cell takes one solve per volatility node.
+
+    time_to_maturity => Days to maturity of every point that will be priced
+    volatility => Volatility of every point that will be priced, broadcast against time_to_maturity
+    risk_free_rate => Risk-free interest rate (annualized)
+    max_moneyness => Largest underlying price over strike price that will be priced
+    volatility_nodes => Most solves per cell
+    model_options => Extra constructor arguments of FDModel, e.g. exercise or spot_steps. time_steps defaults
+                     to one per day of the longest maturity of a cell and at least 200
+    """
+    def __init__(self, time_to_maturity, volatility, risk_free_rate, max_moneyness, volatility_nodes=VOLATILITY_NODES,
+                 **model_options):
+        days, sigma = (np.ravel(x).astype(float) for x in np.broadcast_arrays(time_to_maturity, volatility))
+        if np.any(days <= 0) or np.any(sigma <= 0):
+            raise ValueError("Days to maturity and volatilities must be positive")
+        keys, cells = np.unique(self._cells(days, sigma), return_inverse=True)
+        self.sheets = {}
+        for cell, key in enumerate(keys):
+            rows = cells == cell
+            self.sheets[key] = _PriceSheet(np.unique(days[rows]), np.unique(sigma[rows]), risk_free_rate,
+                                                  max_moneyness, volatility_nodes, model_options)
+
+    @staticmethod
+    def _cells(days, sigma):
+        # Cell of every point, from its band of days to maturity and its band of volatility
+        maturity_band = np.floor(np.log(days) / np.log(MATURITY_BAND)).astype(int)
+        volatility_band = np.floor(np.log(sigma) / np.log(VOLATILITY_BAND)).astype(int)
+        return maturity_band * 1024 + volatility_band
+
+    def prices(self, moneyness, time_to_maturity, volatility):
+        """
+        Prices calls and puts with a unit strike at equally long 1D arrays of moneyness, days to maturity
+        and volatility, which must be among those the grid was built for.
+        Returns a (points, 2) array of calls and puts.
+        """
+        keys, cells = np.unique(self._cells(time_to_maturity, volatility), return_inverse=True)
+        values = np.empty((len(moneyness), 2))
+        for cell, key in enumerate(keys):
+            if key not in self.sheets:
+                raise ValueError("The grid was not built for some of the days to maturity and volatilities")
+            rows = np.flatnonzero(cells == cell)
+            values[rows] = self.sheets[key].prices(moneyness[rows], time_to_maturity[rows], volatility[rows])
+        return values
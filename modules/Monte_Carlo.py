@@ -2,21 +2,83 @@
 
 import numpy as np
 from .framework import OptionModel
-import matplotlib.pyplot as plt
+from .Black_Scholes_Model import BSModel
+from .mc_engine import run_stream, run_parallel, make_estimate, sample_moments
+from .special import ndtr, ndtri
+
+# Variance reduction techniques that can be combined through MCModel(variance_reduction=...)
+VARIANCE_REDUCTION_MODES = ('antithetic', 'control_variate', 'sobol')
+EXERCISE_STYLES = ('european', 'american')
+# Payoffs that can be priced through MCModel(payoff=...); all but 'vanilla' depend on the path
+PAYOFFS = ('vanilla', 'asian_arithmetic', 'asian_geometric', 'barrier', 'lookback')
+BARRIER_TYPES = ('up-and-out', 'down-and-out', 'up-and-in', 'down-and-in')
+# Order of the Greeks in the rows of greeks_estimate
+GREEK_NAMES = ('delta', 'gamma', 'vega', 'theta', 'rho')
+# Upper bound on the elements of the (paths, strikes) arrays built for one chunk
+MAX_CHUNK_ELEMENTS = 1 << 21
+# Sobol mode splits number_of_simulations into at least this many independently scrambled replicates
+SOBOL_REPLICATES = 16
 
 
 class MCModel(OptionModel):
-    def __init__(self, underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility, number_of_simulations):
+    # Methods timed by the instrumentation module, by phase
+    INSTRUMENTED_PHASES = {
+        'setup': ('__init__',),
+        'simulation': ('_draw_normals', '_simulate_terminal_prices', '_american_payoffs', '_path_statistics'),
+        'exercise_fit': ('_fit_exercise_rule',),
+        'payoff': ('_payoff_moments', '_path_payoffs', '_greeks_chunk'),
+        'greeks': ('greeks_chain',),
+    }
+
+    def __init__(self, underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility, number_of_simulations,
+                 seed=11, chunk_size=65536, target_std_error=None, time_budget=None, confidence_level=0.95,
+                 variance_reduction=None, workers=1, executor='process',
+                 exercise='european', exercise_dates=None, training_paths=8192,
+                 payoff='vanilla', barrier=None, barrier_type='up-and-out', monitoring_dates=None,
+                 barrier_correction=True):
         """
-        Initializes the necessary variables for the Black-Scholes Model.
+        Initializes the necessary variables for the Monte Carlo Model.
 
         underlying_price => Current price of the underlying asset
         strike_price => Strike price of the option
         time_to_maturity => Time to maturity in days
         risk_free_rate => Risk-free interest rate (annualized)
         volatility => Volatility of the underlying asset (annualized)
-        number_of_simulations => Number of simulations to run for Monte Carlo pricing
+        number_of_simulations => Maximum number of simulations to run for Monte Carlo pricing
+        seed => Seed for the random number generator
+        chunk_size => Number of simulations generated at a time, which bounds the memory used
+        target_std_error => Stop early once the standard error of every price is at or below this value
+        time_budget => Stop early once this many seconds have been spent simulating
+        confidence_level => Confidence level of the reported confidence intervals
+        variance_reduction => None, or one or more of 'antithetic', 'control_variate' and 'sobol'
+                              (a string or a list of strings)
+        workers => Number of parallel workers sharing the simulations
+        executor => 'process' or 'thread' pool used when workers > 1
+        exercise => 'european' or 'american' (priced with Longstaff-Schwartz regression)
+        exercise_dates => Number of equally spaced exercise dates for American options,
+                          by default one per day up to 50
+        training_paths => Number of paths used to fit the Longstaff-Schwartz exercise rule
+        payoff => 'vanilla', or a European path-dependent payoff on the strike:
+                  'asian_arithmetic' and 'asian_geometric' pay on the average price over the monitoring dates,
+                  'barrier' pays the vanilla payoff if the barrier was (knock-in) or was not (knock-out) hit,
+                  'lookback' pays on the highest (calls) or lowest (puts) price seen, including today's
+        barrier => Barrier level of 'barrier' payoffs
+        barrier_type => One of 'up-and-out', 'down-and-out', 'up-and-in' and 'down-and-in'
+        monitoring_dates => Number of equally spaced dates the path is observed at, by default one per day
+        barrier_correction => Account for barrier hits between monitoring dates with the Brownian bridge,
+                              which prices a continuously monitored barrier
         """
+        if exercise not in EXERCISE_STYLES:
+            raise ValueError(f"Unknown exercise style '{exercise}'. Choose from {EXERCISE_STYLES}")
+        if payoff not in PAYOFFS:
+            raise ValueError(f"Unknown payoff '{payoff}'. Choose from {PAYOFFS}")
+        if payoff != 'vanilla' and exercise == 'american':
+            raise ValueError("Path-dependent payoffs are only available for European options")
+        if payoff == 'barrier':
+            if barrier is None:
+                raise ValueError("Barrier payoffs need a barrier level")
+            if barrier_type not in BARRIER_TYPES:
+                raise ValueError(f"Unknown barrier type '{barrier_type}'. Choose from {BARRIER_TYPES}")
 
         # Renaming them to familiar symbols 
         self.S0 = underlying_price
@@ -30,13 +92,52 @@ class MCModel(OptionModel):
         self.delT = self.T / self.num_steps
         self.sim_results = None
 
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.target_std_error = target_std_error
+        self.time_budget = time_budget
+        self.confidence_level = confidence_level
+
+        if variance_reduction is None:
+            variance_reduction = ()
+        elif isinstance(variance_reduction, str):
+            variance_reduction = (variance_reduction,)
+        for mode in variance_reduction:
+            if mode not in VARIANCE_REDUCTION_MODES:
+                raise ValueError(f"Unknown variance reduction mode '{mode}'. Choose from {VARIANCE_REDUCTION_MODES}")
+        self.variance_reduction = tuple(variance_reduction)
+        if 'sobol' in self.variance_reduction:
+            # Sobol points are only balanced in powers of two, so every replicate has a power-of-two size,
+            # at most chunk_size and small enough for SOBOL_REPLICATES replicates
+            size = max(min(number_of_simulations / SOBOL_REPLICATES, chunk_size), 2)
+            self.sobol_size = 1 << int(np.log2(size))
+            if number_of_simulations // self.sobol_size < 2:
+                raise ValueError("The 'sobol' mode needs enough simulations for at least 2 replicates of 2 paths")
+        self.workers = workers
+        self.executor = executor
+        self.exercise = exercise
+        self.exercise_dates = exercise_dates if exercise_dates is not None else max(1, min(time_to_maturity, 50))
+        self.training_paths = training_paths
+        self.payoff = payoff
+        self.barrier = barrier
+        self.barrier_type = barrier_type
+        self.monitoring_dates = monitoring_dates if monitoring_dates is not None else max(1, time_to_maturity)
+        self.barrier_correction = barrier_correction
+        self.estimate = None # Streamed estimate for strike_price, filled on first pricing
+
+    def __getstate__(self):
+        # Stored paths are only for plotting, so they are not copied to pool workers
+        state = self.__dict__.copy()
+        state['sim_results'] = None
+        return state
+
     def simulate_prices(self):
         """
-        Simulates price movements of the underlying asset using a geometric Brownian motion model.
+        Simulates full price paths of the underlying asset using a geometric Brownian motion model.
+        This stores a (num_steps, N) matrix and is only needed for plotting; pricing streams instead.
         """
         print("Simulating prices using Monte Carlo method...")
-        np.random.seed(11)
-        self.results = None
+        rng = np.random.default_rng(self.seed)
         # Initializing price movements rows as time index and columns as different random price movements.
         S = np.zeros((self.num_steps, self.N))
         # Starting value is the current spot price
@@ -44,33 +145,504 @@ class MCModel(OptionModel):
 
         for i in range(1, self.num_steps):
             # Random values selected from Gaussian distribution
-            Z = np.random.standard_normal(self.N)
+            Z = rng.standard_normal(self.N)
             # Updating prices for next point in time 
             S[i] = S[i - 1] * np.exp((self.r - 0.5 * self.sigma ** 2) * self.delT + (self.sigma * np.sqrt(self.delT) * Z))
         
         # Save the final simulated prices and their histories
         self.sim_results = S
-        
+
+    def _draw_normals(self, rng, n, dims=1):
+        """
+        Draws n standard normal values (an (n, dims) array if dims > 1), from a freshly
+        scrambled Sobol sequence in 'sobol' mode. Each call uses an independent scrambling,
+        so chunks are independent replicates.
+        """
+        if 'sobol' in self.variance_reduction:
+            from scipy.stats import qmc
+            uniforms = qmc.Sobol(d=dims, scramble=True, seed=rng).random(n)
+            return ndtri(uniforms[:, 0] if dims == 1 else uniforms)
+        return rng.standard_normal(n if dims == 1 else (n, dims))
+
+    def _simulate_terminal_prices(self, Z):
+        """
+        Maps standard normal draws Z to prices of the underlying at maturity.
+        Vanilla payoffs only depend on the terminal price, so no intermediate steps are needed.
+        """
+        return self.S0 * np.exp((self.r - 0.5 * self.sigma ** 2) * self.T + self.sigma * np.sqrt(self.T) * Z)
+
+    def _payoff_moments(self, terminal_prices, K, state):
+        """
+        Returns the (count, mean, M2) of the estimator samples and of the plain discounted payoffs of
+        European calls and puts for every strike in K, each mean and M2 of shape (2, len(K)) with calls
+        in row 0 and puts in row 1. The estimator samples follow the variance reduction modes as in
+        _sample_chunk; with 'antithetic' the second half of terminal_prices mirrors the first.
+
+        Sorting the terminal prices once lets every strike be priced with a binary search and prefix
+        sums of powers of the price instead of building a (strikes x simulations) payoff matrix. Every
+        sum the modes need is one of these: an antithetic pair is S and A / S with A = S0^2 exp(2 (r -
+        sigma^2 / 2) T), both members of a pair have the same pair control, and a pair's call and put
+        pay off together only for S between K and A / K.
+        """
+        modes = self.variance_reduction
+        n = len(terminal_prices)
+        discount = np.exp(-self.r * self.T)
+        A = self.S0 ** 2 * np.exp((2 * self.r - self.sigma ** 2) * self.T)
+
+        S = np.sort(terminal_prices)
+        powers = (-1, 0, 1, 2)
+        prefix = {j: np.concatenate(([0.0], np.cumsum(S ** j))) for j in powers}
+
+        def sums(low, high):
+            # Sums of S^j over the paths with low < S <= high, as (2, len(K)) arrays
+            first = np.searchsorted(S, low, side='right')
+            last = np.maximum(np.searchsorted(S, high, side='right'), first)
+            return {j: prefix[j][last] - prefix[j][first] for j in powers}
+
+        # Calls pay D (S - K) above the strike and puts D (K - S) below it, so both are sign * D * (S - K)
+        sign = np.array([[1.0], [-1.0]])
+        R = sums(np.stack((K, np.zeros_like(K))), np.stack((np.full_like(K, np.inf), K)))
+        payoff_sums = sign * discount * (R[1] - K * R[0])
+        payoff_squares = discount ** 2 * (R[2] - 2 * K * R[1] + K ** 2 * R[0])
+        mean = payoff_sums / n
+        raw_moments = (n, mean, np.maximum(payoff_squares - n * mean ** 2, 0.0))
+        if not modes or modes == ('sobol',):
+            return (1, mean, np.zeros_like(mean)) if modes else raw_moments, raw_moments
+
+        if 'antithetic' in modes:
+            # Pair averages (f(S) + f(A / S)) / 2 with the pair control D (S + A / S) / 2 - S0
+            count = n // 2
+            sample_sums = payoff_sums / 2
+            pair = sums(np.stack((K, np.minimum(K, A / K))), np.stack((np.maximum(K, A / K), K)))
+            cross = discount ** 2 * ((A + K ** 2) * pair[0] - K * pair[1] - K * A * pair[-1]) / 2
+            sample_squares = (payoff_squares + 2 * cross) / 4
+            control = discount * (S + A / S) / 2 - self.S0
+            control_sum, control_square_sum = control.sum() / 2, (control ** 2).sum() / 2
+            products = sign * discount * (discount / 2 * R[2] - (self.S0 + K * discount / 2) * R[1]
+                                          + (discount * A / 2 + K * self.S0) * R[0] - K * discount * A / 2 * R[-1]) / 2
+        else:
+            # Payoffs with the control D S - S0
+            count, sample_sums, sample_squares = n, payoff_sums, payoff_squares
+            control = discount * S - self.S0
+            control_sum, control_square_sum = control.sum(), (control ** 2).sum()
+            products = sign * discount * (discount * R[2] - (self.S0 + discount * K) * R[1] + self.S0 * K * R[0])
+
+        mean = sample_sums / count
+        m2 = sample_squares - count * mean ** 2
+        if 'control_variate' in modes:
+            control_mean = control_sum / count
+            control_m2 = control_square_sum - count * control_mean ** 2
+            covariance = products - count * mean * control_mean
+            if 'beta' not in state:
+                # beta = Cov(payoff, control) / Var(control), estimated once on the first chunk
+                state['beta'] = covariance / control_m2 if control_m2 > 0 else np.zeros_like(covariance)
+            beta = state['beta']
+            mean = mean - beta * control_mean
+            m2 = m2 - 2 * beta * covariance + beta ** 2 * control_m2
+        m2 = np.maximum(m2, 0.0)
+        if 'sobol' in modes:
+            return (1, mean, np.zeros_like(mean)), raw_moments
+        return (count, mean, m2), raw_moments
+
+    def _exercise_times(self):
+        """
+        Returns the exercise dates of an American option in years, the last one being maturity.
+        """
+        return self.T * np.arange(1, self.exercise_dates + 1) / self.exercise_dates
+
+    def _regression_basis(self, S):
+        """
+        Basis functions of the Longstaff-Schwartz regression: 1, x and x^2 with x = S / S0.
+        """
+        x = S / self.S0
+        return np.stack((np.ones_like(x), x, x ** 2), axis=1)
+
+    def _fit_exercise_rule(self, rng, K):
+        """
+        Fits the Longstaff-Schwartz continuation value of American puts for every strike in K.
+
+        The training paths are generated backwards in time with a Brownian bridge, starting from
+        the terminal value, so only the current date of each path is ever held in memory.
+        Returns an array of regression coefficients with shape (exercise dates - 1, strikes, 3).
+        Calls on a non-dividend paying underlying are never exercised early, so they need no rule.
+        """
+        times = self._exercise_times()
+        n = self.training_paths
+        W = np.sqrt(self.T) * rng.standard_normal(n)
+        S = self.S0 * np.exp((self.r - 0.5 * self.sigma ** 2) * self.T + self.sigma * W)
+        cash_flows = np.maximum(K - S[:, None], 0.0) # Value of following the rule, at the current date
+
+        coefficients = np.zeros((len(times) - 1, len(K), 3))
+        for k in range(len(times) - 2, -1, -1):
+            t, t_next = times[k], times[k + 1]
+            # W(t) given W(t_next) is normal with mean W(t_next) * t / t_next
+            W = W * (t / t_next) + np.sqrt(t * (t_next - t) / t_next) * rng.standard_normal(n)
+            S = self.S0 * np.exp((self.r - 0.5 * self.sigma ** 2) * t + self.sigma * W)
+            cash_flows *= np.exp(-self.r * (t_next - t))
+
+            # Regress the discounted cash flows on the basis, only over in-the-money paths (S < K).
+            # The basis only depends on S, so the normal matrices of all strikes come from prefix
+            # sums of the powers of x = S / S0 over the sorted prices.
+            intrinsic = np.maximum(K - S[:, None], 0.0)
+            in_the_money = intrinsic > 0
+            basis = self._regression_basis(S)
+            x_sorted = np.sort(S) / self.S0
+            power_sums = np.concatenate((np.zeros((1, 5)), np.cumsum(x_sorted[:, None] ** np.arange(5), axis=0)))
+            moments = power_sums[np.searchsorted(x_sorted, K / self.S0, side='left')]
+            normal_matrix = moments[:, [[0, 1, 2], [1, 2, 3], [2, 3, 4]]]
+            normal_vector = basis.T @ (cash_flows * in_the_money)
+            # A tiny ridge keeps strikes with (almost) no in-the-money paths solvable
+            normal_matrix += 1e-10 * np.eye(3)
+            coefficients[k] = np.linalg.solve(normal_matrix, normal_vector.T[..., None])[..., 0]
+
+            exercise_now = in_the_money & (intrinsic > basis @ coefficients[k].T)
+            np.copyto(cash_flows, intrinsic, where=exercise_now)
+
+        return coefficients
+
+    def _american_payoffs(self, rng, half, K, coefficients):
+        """
+        Simulates paths forward through the exercise dates, exercising American puts with the
+        fitted rule, and returns (payoffs, control) of shape (paths, 2, strikes).
+        Only the current date of each path is held in memory. The control is the discounted
+        European payoff minus its Black-Scholes price, which has mean zero.
+        """
+        antithetic = 'antithetic' in self.variance_reduction
+        times = self._exercise_times()
+        n = 2 * half if antithetic else half
+        if 'sobol' in self.variance_reduction:
+            sobol_normals = self._draw_normals(rng, half, len(times))
+
+        S = np.full(n, float(self.S0))
+        puts = np.zeros((n, len(K)))
+        alive = np.ones((n, len(K)), dtype=bool)
+        t_prev = 0.0
+        for k, t in enumerate(times):
+            Z = sobol_normals[:, k] if 'sobol' in self.variance_reduction else rng.standard_normal(half)
+            if antithetic:
+                Z = np.concatenate((Z, -Z))
+            S = S * np.exp((self.r - 0.5 * self.sigma ** 2) * (t - t_prev) + self.sigma * np.sqrt(t - t_prev) * Z)
+            t_prev = t
+
+            intrinsic = np.maximum(K - S[:, None], 0.0)
+            if k < len(times) - 1:
+                continuation = self._regression_basis(S) @ coefficients[k].T
+                exercise_now = alive & (intrinsic > 0) & (intrinsic > continuation)
+            else:
+                exercise_now = alive # Whatever is left is exercised at maturity
+            np.copyto(puts, np.exp(-self.r * t) * intrinsic, where=exercise_now)
+            alive &= ~exercise_now
+
+        discount = np.exp(-self.r * self.T)
+        calls = discount * np.maximum(S[:, None] - K, 0.0)
+        european_puts = discount * np.maximum(K - S[:, None], 0.0)
+        bs_calls, bs_puts = BSModel.price_chain(self.S0, K, 365 * self.T, self.r, self.sigma)
+        return np.stack((calls, puts), axis=1), np.stack((calls - bs_calls, european_puts - bs_puts), axis=1)
+
+    def _path_statistics(self, rng, half):
+        """
+        Simulates paths forward through the monitoring dates and returns a dictionary of the per-path
+        statistics the payoff needs, accumulated on the way so only the current date of each path is
+        held in memory: 'terminal' prices, plus running 'arithmetic' and 'geometric' averages,
+        'maximum' and 'minimum' prices, or the 'survival' probability of a barrier that was not hit.
+
+        With barrier_correction, the survival probability of every step is one minus the Brownian bridge
+        probability of crossing the barrier between two monitoring dates on the same side of it,
+        exp(-2 * d_prev * d / (sigma^2 * dt)) with d the distances in log price to the barrier.
+        Without it, a barrier only counts as hit on the monitoring dates.
+        """
+        antithetic = 'antithetic' in self.variance_reduction
+        n = 2 * half if antithetic else half
+        dates = self.monitoring_dates
+        dt = self.T / dates
+        if 'sobol' in self.variance_reduction:
+            sobol_normals = self._draw_normals(rng, half, dates)
+
+        log_S = np.full(n, np.log(self.S0))
+        stats = {}
+        if self.payoff.startswith('asian'):
+            stats['arithmetic'] = np.zeros(n)
+            stats['geometric'] = np.zeros(n)
+        elif self.payoff == 'lookback':
+            stats['maximum'] = np.full(n, float(self.S0))
+            stats['minimum'] = np.full(n, float(self.S0))
+        elif self.payoff == 'barrier':
+            # Distances in log price to the barrier are positive on the side where the option is not knocked
+            side = 1.0 if self.barrier_type.startswith('up') else -1.0
+            log_barrier = np.log(self.barrier)
+            distance = side * (log_barrier - log_S)
+            stats['survival'] = (distance > 0).astype(float)
+
+        for k in range(dates):
+            Z = sobol_normals[:, k] if 'sobol' in self.variance_reduction else rng.standard_normal(half)
+            if antithetic:
+                Z = np.concatenate((Z, -Z))
+            log_S = log_S + (self.r - 0.5 * self.sigma ** 2) * dt + self.sigma * np.sqrt(dt) * Z
+            if 'arithmetic' in stats:
+                stats['arithmetic'] += np.exp(log_S)
+                stats['geometric'] += log_S
+            elif 'maximum' in stats:
+                S = np.exp(log_S)
+                np.maximum(stats['maximum'], S, out=stats['maximum'])
+                np.minimum(stats['minimum'], S, out=stats['minimum'])
+            elif 'survival' in stats:
+                previous, distance = distance, side * (log_barrier - log_S)
+                if self.barrier_correction:
+                    crossed = np.exp(-2 * np.maximum(previous, 0.0) * np.maximum(distance, 0.0) / (self.sigma ** 2 * dt))
+                    stats['survival'] *= np.where(distance > 0, 1 - crossed, 0.0)
+                else:
+                    stats['survival'] *= distance > 0
+
+        stats['terminal'] = np.exp(log_S)
+        if 'arithmetic' in stats:
+            stats['arithmetic'] /= dates
+            stats['geometric'] = np.exp(stats['geometric'] / dates)
+        return stats
+
+    def _path_payoffs(self, stats, K):
+        """
+        Returns (payoffs, control) of shape (paths, 2, strikes) for the path statistics of _path_statistics.
+        The control has mean zero: for arithmetic Asians it is the discounted geometric Asian payoff minus
+        its closed-form price, otherwise the discounted European payoff minus its Black-Scholes price.
+        """
+        discount = np.exp(-self.r * self.T)
+        terminal = stats['terminal'][:, None]
+
+        def calls_and_puts(high, low):
+            # Discounted payoffs of calls on high and puts on low, stacked as (paths, 2, strikes)
+            return discount * np.stack((np.maximum(high[:, None] - K, 0.0), np.maximum(K - low[:, None], 0.0)), axis=1)
+
+        if self.payoff == 'asian_arithmetic':
+            payoffs = calls_and_puts(stats['arithmetic'], stats['arithmetic'])
+        elif self.payoff == 'asian_geometric':
+            payoffs = calls_and_puts(stats['geometric'], stats['geometric'])
+        elif self.payoff == 'lookback':
+            payoffs = calls_and_puts(stats['maximum'], stats['minimum'])
+        else:
+            vanilla = calls_and_puts(stats['terminal'], stats['terminal'])
+            # In-out parity holds path by path: a knock-in pays exactly when the knock-out does not
+            knocked = stats['survival'] if self.barrier_type.endswith('out') else 1 - stats['survival']
+            payoffs = vanilla * knocked[:, None, None]
+
+        if self.payoff == 'asian_arithmetic':
+            geometric = calls_and_puts(stats['geometric'], stats['geometric'])
+            closed_form = geometric_asian_price(self.S0, K, 365 * self.T, self.r, self.sigma, self.monitoring_dates)
+            return payoffs, geometric - np.stack(closed_form)
+        european = discount * np.stack((np.maximum(terminal - K, 0.0), np.maximum(K - terminal, 0.0)), axis=1)
+        return payoffs, european - np.stack(BSModel.price_chain(self.S0, K, 365 * self.T, self.r, self.sigma))
+
+    def _sample_chunk(self, rng, n, K, state):
+        """
+        Simulates about n paths and returns (paths_used, moments, raw_moments) for run_stream.
+
+        Without variance reduction the estimator samples are the plain payoffs. Otherwise:
+        'antithetic' pairs every draw Z with -Z and uses the pair averages as samples,
+        'control_variate' subtracts beta * control, where the control has mean zero in closed form
+        (the discounted terminal price minus S0, for American options and path-dependent payoffs the
+        discounted European payoff minus its Black-Scholes price, and for arithmetic Asians the
+        discounted geometric Asian payoff minus its closed-form price),
+        'sobol' uses scrambled Sobol normals and treats each chunk mean as one sample.
+        """
+        modes = self.variance_reduction
+        if 'sobol' in modes:
+            # Every chunk is one replicate of sobol_size points, or a power-of-two part of one
+            n = self.sobol_size
+        if self.exercise == 'american' or self.payoff != 'vanilla':
+            # Paths are (n, strikes) payoffs, and in 'sobol' mode also the (n, dates) normals of every date
+            dates = 1
+            if 'sobol' in modes:
+                dates = len(self._exercise_times()) if self.exercise == 'american' else self.monitoring_dates
+            n = min(n, max(2, MAX_CHUNK_ELEMENTS // max(len(K), dates)))
+        if 'sobol' in modes:
+            n = 1 << max(int(np.log2(n)), 1)
+        # At least one antithetic pair, or an odd remainder of one path would never be simulated
+        half = max(n // 2, 1) if 'antithetic' in modes else n
+        if 'antithetic' in modes:
+            n = 2 * half
+
+        if self.exercise == 'american':
+            if 'rule' not in state:
+                state['rule'] = self._fit_exercise_rule(rng, K)
+            payoffs, control = self._american_payoffs(rng, half, K, state['rule'])
+            raw_moments = sample_moments(payoffs)
+        elif self.payoff != 'vanilla':
+            payoffs, control = self._path_payoffs(self._path_statistics(rng, half), K)
+            raw_moments = sample_moments(payoffs)
+        else:
+            Z = self._draw_normals(rng, half)
+            if 'antithetic' in modes:
+                Z = np.concatenate((Z, -Z))
+            moments, raw_moments = self._payoff_moments(self._simulate_terminal_prices(Z), K, state)
+            return n, moments, raw_moments
+
+        if 'antithetic' in modes:
+            payoffs = 0.5 * (payoffs[:half] + payoffs[half:])
+            control = 0.5 * (control[:half] + control[half:])
+        if 'control_variate' in modes:
+            if 'beta' not in state:
+                # beta = Cov(payoff, control) / Var(control), estimated once on the first chunk
+                centred = control - control.mean(axis=0)
+                covariance = np.sum(centred * payoffs, axis=0)
+                variance = np.broadcast_to(np.sum(centred ** 2, axis=0), covariance.shape)
+                state['beta'] = np.divide(covariance, variance, out=np.zeros_like(covariance), where=variance > 0)
+            payoffs = payoffs - state['beta'] * control
+        if 'sobol' in modes:
+            return n, (1, payoffs.mean(axis=0), np.zeros(payoffs.shape[1:])), raw_moments
+        return n, sample_moments(payoffs), raw_moments
+
+    def _greeks_chunk(self, rng, n, K):
+        """
+        Simulates about n paths and returns (paths_used, moments, raw_moments) of the per-path Greek
+        estimators, with shape (2, 5, strikes) for calls and puts.
+
+        Delta, vega, rho and theta are pathwise derivatives of the discounted payoff. The payoff
+        has no second derivative, so gamma differentiates the pathwise delta with the likelihood
+        ratio of the normal draw instead. Antithetic and Sobol draws are supported as for prices.
+        """
+        modes = self.variance_reduction
+        n = self.sobol_size if 'sobol' in modes else n
+        n = min(n, max(2, MAX_CHUNK_ELEMENTS // (len(GREEK_NAMES) * len(K))))
+        if 'sobol' in modes:
+            n = 1 << max(int(np.log2(n)), 1)
+        half = max(n // 2, 1) if 'antithetic' in modes else n
+        Z = self._draw_normals(rng, half)
+        if 'antithetic' in modes:
+            Z = np.concatenate((Z, -Z))
+            n = 2 * half
+
+        sqrt_T = np.sqrt(self.T)
+        discount = np.exp(-self.r * self.T)
+        terminal_prices = self._simulate_terminal_prices(Z)[:, None]
+        Z = Z[:, None]
+        in_the_money = terminal_prices > K
+        # Derivatives of the terminal price with respect to volatility and time to maturity
+        dS_dsigma = terminal_prices * (sqrt_T * Z - self.sigma * self.T)
+        dS_dT = terminal_prices * (self.r - 0.5 * self.sigma ** 2 + 0.5 * self.sigma * Z / sqrt_T)
+
+        samples = np.empty((n, 2, len(GREEK_NAMES), len(K)))
+        for row, sign, exercised in ((0, 1, in_the_money), (1, -1, ~in_the_money)):
+            payoff = np.where(exercised, sign * (terminal_prices - K), 0.0)
+            weight = sign * discount * exercised
+            samples[:, row, 0] = weight * terminal_prices / self.S0
+            samples[:, row, 1] = discount * exercised * K * sign * Z / (self.S0 ** 2 * self.sigma * sqrt_T)
+            samples[:, row, 2] = weight * dS_dsigma
+            # Theta is the change per calendar day as maturity gets closer
+            samples[:, row, 3] = -(weight * dS_dT - self.r * discount * payoff) / 365
+            samples[:, row, 4] = weight * K * self.T
+
+        raw_moments = sample_moments(samples)
+        if 'antithetic' in modes:
+            samples = 0.5 * (samples[:half] + samples[half:])
+        if 'sobol' in modes:
+            mean = samples.mean(axis=0)
+            return n, (1, mean, np.zeros_like(mean)), raw_moments
+        return n, sample_moments(samples), raw_moments
+
+    def run_simulation(self, strike_prices, greeks=False):
+        """
+        Streams simulations in chunks of chunk_size and prices calls and puts for every strike.
+        Only running means and variances are kept, so memory does not grow with number_of_simulations.
+        American options first fit their exercise rule on a separate set of training paths.
+        Returns an MCEstimate with prices, standard errors, confidence intervals and the
+        variance reduction factor achieved.
+
+        With greeks=True the estimate holds Greeks instead of prices, see greeks_chain.
+
+        With workers > 1 the simulations are split across a pool. Every worker draws from its own
+        SeedSequence.spawn stream, so results are reproducible for a given seed and worker count.
+
+        In 'sobol' mode the simulations run in whole replicates of sobol_size paths, so up to
+        sobol_size - 1 of number_of_simulations are left out.
+        """
+        K = np.atleast_1d(np.asarray(strike_prices, dtype=float))
+        # Paths are shared out in units that are never split, whole replicates in 'sobol' mode
+        unit = self.sobol_size if 'sobol' in self.variance_reduction else 1
+        units = self.N // unit
+        # A worker without a whole unit of paths would have nothing to simulate
+        workers = min(self.workers, units)
+        if workers <= 1:
+            results = _simulate_worker(self, K, self.seed, unit * units, self.target_std_error, self.time_budget, greeks)
+            return make_estimate(*results, self.confidence_level)
+
+        # Share the paths evenly; the combined standard error shrinks with the square root of the workers
+        seed_sequences = np.random.SeedSequence(self.seed).spawn(workers)
+        worker_paths = [unit * (units // workers + (i < units % workers)) for i in range(workers)]
+        worker_target = None if self.target_std_error is None else self.target_std_error * np.sqrt(workers)
+        worker_args = [(self, K, seed_sequences[i], worker_paths[i], worker_target, self.time_budget, greeks)
+                       for i in range(workers)]
+        results = run_parallel(_simulate_worker, worker_args, self.executor)
+        return make_estimate(*results, self.confidence_level)
+
+    def get_estimate(self, option_type):
+        """
+        Returns the MCEstimate (price, standard error, confidence interval, paths used)
+        for the call or put at this model's strike price.
+        """
+        if self.estimate is None:
+            self.estimate = self.run_simulation(self.K)
+        return self.estimate.for_option(option_type)
+
     def _find_call_option_price(self):
-        if self.sim_results is None:
-            self.simulate_prices()
-        # Get the current value of the mean of the option payoffs at maturity
-        return np.exp(-self.r * self.T) * np.mean(np.maximum(self.sim_results[-1] - self.K, 0))
+        # Discounted mean of the call payoffs at maturity
+        return self.get_estimate('call').price
     
     def _find_put_option_price(self):
-        if self.sim_results is None:
-            self.simulate_prices()
-        # Get the current value of the mean of the option payoffs at maturity
-        return np.exp(-self.r * self.T) * np.mean(np.maximum(self.K - self.sim_results[-1], 0))
+        # Discounted mean of the put payoffs at maturity
+        return self.get_estimate('put').price
+
+    def price_chain(self, strike_prices):
+        """
+        Prices calls and puts for every strike in strike_prices from one shared simulation.
+
+        The paths are simulated once for this model's spot, volatility, rate and expiry,
+        so every strike sees the same random numbers and the resulting smile is consistent.
+        The strike passed to the constructor is only used for plotting.
+        Returns a tuple (call_prices, put_prices) of arrays with the shape of strike_prices.
+        The full MCEstimate with standard errors is kept in self.chain_estimate.
+        """
+        self.chain_estimate = self.run_simulation(strike_prices)
+        shape = np.shape(strike_prices)
+        return self.chain_estimate.price[0].reshape(shape), self.chain_estimate.price[1].reshape(shape)
+
+    def greeks_chain(self, strike_prices):
+        """
+        Estimates Greeks for every strike in strike_prices from one shared simulation of European options.
+
+        The Greeks are averages of per-path derivatives of the payoff, so they come from the same
+        random numbers as the prices (for the same seed) without re-simulating bumped inputs.
+        Returns a tuple (call_greeks, put_greeks) of dictionaries of arrays with the shape of
+        strike_prices. Vega and rho are per unit change, and theta is per calendar day.
+        The full MCEstimate, with shape (2, 5, strikes) in the order of GREEK_NAMES, is kept
+        in self.greeks_estimate.
+        """
+        if self.exercise == 'american':
+            raise ValueError("Greeks are only available for European options in the Monte Carlo Model")
+        if self.payoff != 'vanilla':
+            raise ValueError("Greeks are only available for vanilla payoffs in the Monte Carlo Model")
+        if 'control_variate' in self.variance_reduction:
+            raise ValueError("Greeks do not support the 'control_variate' mode")
+        self.greeks_estimate = self.run_simulation(strike_prices, greeks=True)
+        shape = np.shape(strike_prices)
+        greeks = []
+        for row in range(2):
+            greeks.append({name: self.greeks_estimate.price[row, i].reshape(shape)
+                           for i, name in enumerate(GREEK_NAMES)})
+        return greeks[0], greeks[1]
+
+    def _find_greeks(self, option_type):
+        call_greeks, put_greeks = self.greeks_chain(self.K)
+        greeks = call_greeks if option_type == 'call' else put_greeks
+        return {name: value.item() for name, value in greeks.items()}
 
     def plot_simulation_results(self, num_sim=10):
         """
         Plots the simulated price paths of the underlying asset.
         """
+        import matplotlib.pyplot as plt
         
+        # Full paths are only stored when they are needed for plotting
         if self.sim_results is None:
-            print("Simulation results are not available.")
-            return
+            self.simulate_prices()
         
         plt.figure(figsize=(10, 6))
         plt.plot(self.sim_results[:, 0:num_sim])
@@ -87,9 +659,10 @@ class MCModel(OptionModel):
         """
         Plots the simulated price paths of the underlying asset along with historical data.
         """
+        import matplotlib.pyplot as plt
+
         if self.sim_results is None:
-            print("Simulation results are not available.")
-            return
+            self.simulate_prices()
         
         sim_vals = np.mean(self.sim_results[:, 0:100], axis=1)
 
@@ -106,4 +679,40 @@ class MCModel(OptionModel):
         #plt.show()
 
 
-    
+def geometric_asian_price(underlying_price, strike_price, time_to_maturity, risk_free_rate, volatility, averaging_dates):
+    """
+    Closed-form prices of European Asian options on the geometric average of the prices at
+    averaging_dates equally spaced dates, the last one being maturity (time_to_maturity in days).
+
+    The log of the geometric average is normal with mean log(S0) + (r - sigma^2 / 2) * T * (n + 1) / (2n)
+    and variance sigma^2 * T * (n + 1) * (2n + 1) / (6n^2), so the prices follow as in Black-Scholes.
+    Returns a tuple (call_prices, put_prices) with the broadcast shape of the inputs.
+    """
+    S, K = np.asarray(underlying_price, dtype=float), np.asarray(strike_price, dtype=float)
+    T = np.asarray(time_to_maturity, dtype=float) / 365
+    n = averaging_dates
+    mean = np.log(S) + (risk_free_rate - 0.5 * volatility ** 2) * T * (n + 1) / (2 * n)
+    std = volatility * np.sqrt(T * (n + 1) * (2 * n + 1) / (6 * n ** 2))
+    d2 = (mean - np.log(K)) / std
+    d1 = d2 + std
+    discount = np.exp(-risk_free_rate * T)
+    forward = np.exp(mean + 0.5 * std ** 2)
+    call = discount * (forward * ndtr(d1) - K * ndtr(d2))
+    put = discount * (K * ndtr(-d2) - forward * ndtr(-d1))
+    return call, put
+
+
+def _simulate_worker(model, K, seed, num_paths, target_std_error, time_budget, greeks=False):
+    """
+    Streams num_paths simulations of model with its own random stream, of prices or of Greeks.
+    Defined at module level so it can be sent to a process pool.
+    """
+    rng = np.random.default_rng(seed)
+    state = {} # Control variate coefficients, shared by all chunks of this worker
+
+    def sample_chunk(n):
+        if greeks:
+            return model._greeks_chunk(rng, n, K)
+        return model._sample_chunk(rng, n, K, state)
+
+    return run_stream(sample_chunk, num_paths, model.chunk_size, target_std_error, time_budget)
@@ -1,4 +1,13 @@
 from .Black_Scholes_Model import BSModel
 from .Monte_Carlo import MCModel
 from .Binomial_Tree import BTModel
-from .yfin import Ticker
+from .Finite_Difference import FDModel
+from .FFT_Model import FFTModel
+
+
+def __getattr__(name):
+    # Ticker needs pandas and the data providers, so it is only loaded when it is first used
+    if name == 'Ticker':
+        from .yfin import Ticker
+        return Ticker
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
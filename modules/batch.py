@@ -0,0 +1,237 @@
+# Batch pricing of contract files
+# Streams a CSV or Parquet file of contracts in fixed-size chunks, prices every chunk with the vectorized
+# model paths on a pool of worker processes and writes the results as each chunk finishes, in input order.
+# Only a bounded number of chunks is in memory at any time, so memory does not grow with the file size.
+
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from .Black_Scholes_Model import BSModel
+from .Binomial_Tree import BTModel
+from .Monte_Carlo import MCModel
+from .Finite_Difference import FDModel
+from .FFT_Model import FFTModel
+
+# Input columns, named after the model constructor arguments
+INPUT_COLUMNS = ('underlying_price', 'strike_price', 'time_to_maturity', 'risk_free_rate', 'volatility')
+# Other accepted names of the input columns
+COLUMN_ALIASES = {
+    'spot': 'underlying_price', 'S': 'underlying_price',
+    'strike': 'strike_price', 'K': 'strike_price',
+    'days': 'time_to_maturity', 'T': 'time_to_maturity',
+    'rate': 'risk_free_rate', 'r': 'risk_free_rate',
+    'vol': 'volatility', 'sigma': 'volatility',
+    'type': 'option_type',
+}
+GREEK_NAMES = ('delta', 'gamma', 'vega', 'theta', 'rho')
+MODELS = ('BS', 'BT', 'MC', 'FD', 'FFT')
+
+
+def _file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    if extension in ('.csv', '.txt', '.gz'):
+        return 'csv'
+    raise ValueError(f"Unsupported file type '{extension}'. Use .csv or .parquet")
+
+
+def read_chunks(path, chunk_size):
+    """
+    Yields the contracts in path as DataFrames of at most chunk_size rows.
+    """
+    if _file_format(path) == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        import pandas as pd
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """
+    Appends priced chunks to a CSV or Parquet file, so results are written as they are produced.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.format = _file_format(path)
+        self._writer = None
+        self._first = True
+
+    def write(self, frame):
+        if self.format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _chain_prices(model, S, K, days, r, sigma, greeks, model_options):
+    """
+    Prices the strikes K of one underlying, expiry, rate and volatility with BTModel, MCModel, FDModel or FFTModel.
+    Returns (calls, puts, call_greeks, put_greeks), with None for the Greeks if not asked for.
+    """
+    if model == 'BT':
+        options = {'time_steps': 101, **model_options}
+        pricer = BTModel(S, S, days, r, sigma, options.pop('time_steps'), **options)
+    elif model == 'FD':
+        pricer = FDModel(S, S, days, r, sigma, **model_options)
+    elif model == 'FFT':
+        pricer = FFTModel(S, S, days, r, sigma, **model_options)
+    else:
+        options = {'number_of_simulations': 10000, **model_options}
+        pricer = MCModel(S, S, days, r, sigma, options.pop('number_of_simulations'), **options)
+    # Books often hold the same strike several times, which only needs pricing once
+    strikes, inverse = np.unique(K, return_inverse=True)
+    calls, puts = pricer.price_chain(strikes)
+    if not greeks:
+        return calls[inverse], puts[inverse], None, None
+    call_greeks, put_greeks = pricer.greeks_chain(strikes)
+    return (calls[inverse], puts[inverse], {name: value[inverse] for name, value in call_greeks.items()},
+            {name: value[inverse] for name, value in put_greeks.items()})
+
+
+def price_arrays(S, K, days, r, sigma, model='BS', greeks=False, model_options=None):
+    """
+    Prices the contracts given by equally long arrays of inputs (time_to_maturity in days).
+
+    model => 'BS' prices all contracts in one vectorized pass. 'BT', 'MC', 'FD' and 'FFT' price every group
+             of contracts sharing an underlying price, expiry, rate and volatility from one shared tree,
+             simulation, PDE solve or transform.
+    greeks => Also calculate delta, gamma, vega, theta and rho
+    model_options => Extra constructor arguments of BTModel, MCModel, FDModel or FFTModel, e.g. time_steps,
+                    number_of_simulations or dynamics
+
+    Returns (calls, puts, call_greeks, put_greeks), with empty dictionaries for the Greeks if not asked for.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown model '{model}'. Choose from {', '.join(MODELS)}")
+    S, K, days, r, sigma = (np.asarray(x, dtype=float) for x in (S, K, days, r, sigma))
+    if model == 'BS':
+        calls, puts = BSModel.price_chain(S, K, days, r, sigma)
+        call_greeks, put_greeks = BSModel.greeks_chain(S, K, days, r, sigma) if greeks else ({}, {})
+        return calls, puts, call_greeks, put_greeks
+
+    names = GREEK_NAMES if greeks else ()
+    calls, puts = np.empty(len(K)), np.empty(len(K))
+    call_greeks = {name: np.empty(len(K)) for name in names}
+    put_greeks = {name: np.empty(len(K)) for name in names}
+    # One tree or simulation per underlying, expiry, rate and volatility prices all of its strikes
+    keys, groups, counts = np.unique(np.column_stack((S, days, r, sigma)), axis=0, return_inverse=True,
+                                     return_counts=True)
+    group_rows = np.split(np.argsort(groups.ravel(), kind='stable'), np.cumsum(counts)[:-1])
+    for (group_S, group_days, group_r, group_sigma), rows in zip(keys, group_rows):
+        group_calls, group_puts, group_call_greeks, group_put_greeks = _chain_prices(
+            model, group_S, K[rows], group_days, group_r, group_sigma, greeks, model_options or {})
+        calls[rows], puts[rows] = group_calls, group_puts
+        for name in names:
+            call_greeks[name][rows] = group_call_greeks[name]
+            put_greeks[name][rows] = group_put_greeks[name]
+    return calls, puts, call_greeks, put_greeks
+
+
+def price_frame(frame, model='BS', greeks=False, model_options=None, surface=None):
+    """
+    Prices every contract in a DataFrame with price_arrays and returns it with the results added.
+
+    frame => Contracts with INPUT_COLUMNS (or their COLUMN_ALIASES), time_to_maturity in days, and
+             optionally an option_type column of 'call' or 'put'
+    surface => Optional VolatilitySurface; every contract's volatility is then looked up on it from
+               its strike and expiry, and a volatility column is not needed
+
+    With an option_type column a 'price' column (and one column per Greek) is added; without it,
+    call_ and put_ columns are added for every contract.
+    """
+    frame = frame.rename(columns={k: v for k, v in COLUMN_ALIASES.items() if k in frame.columns and v not in frame.columns})
+    if surface is not None:
+        frame = frame.assign(volatility=surface.volatility(
+            frame['strike_price'].to_numpy(dtype=float), frame['time_to_maturity'].to_numpy(dtype=float),
+            frame['underlying_price'].to_numpy(dtype=float)))
+    missing = [column for column in INPUT_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing input columns: {', '.join(missing)}")
+    if 'option_type' in frame.columns:
+        option_types = frame['option_type'].astype(str).str.strip().str.lower()
+        unknown = sorted(set(option_types) - {'call', 'put'})
+        if unknown:
+            raise ValueError(f"option_type must be 'call' or 'put', got: {', '.join(map(repr, unknown))}")
+    calls, puts, call_greeks, put_greeks = price_arrays(
+        *(frame[column].to_numpy(dtype=float) for column in INPUT_COLUMNS), model, greeks, model_options)
+
+    names = GREEK_NAMES if greeks else ()
+    frame = frame.copy()
+    if 'option_type' in frame.columns:
+        is_call = option_types.to_numpy() == 'call'
+        frame['price'] = np.where(is_call, calls, puts)
+        for name in names:
+            frame[name] = np.where(is_call, call_greeks[name], put_greeks[name])
+    else:
+        frame['call_price'], frame['put_price'] = calls, puts
+        for name in names:
+            frame[f'call_{name}'], frame[f'put_{name}'] = call_greeks[name], put_greeks[name]
+    return frame
+
+
+def price_file(input_path, output_path, model='BS', chunk_size=100_000, workers=1, greeks=False, model_options=None,
+               progress=None, surface=None):
+    """
+    Prices every contract in input_path and writes the results to output_path (CSV or Parquet).
+
+    chunk_size => Number of contracts read, priced and written at a time
+    workers => Number of worker processes; 1 prices in this process
+    progress => Optional function called with (chunks done, rows done) after every chunk is written
+    surface => Optional VolatilitySurface to look up every contract's volatility on, see price_frame
+
+    Chunks are written in input order. At most 2 * workers chunks are in flight, so memory stays
+    constant no matter how large the input is.
+    Returns a dictionary with the number of rows and chunks and the elapsed seconds.
+    """
+    start = time.perf_counter()
+    rows = chunks = 0
+    with ChunkWriter(output_path) as writer:
+        if workers <= 1:
+            for frame in read_chunks(input_path, chunk_size):
+                writer.write(price_frame(frame, model, greeks, model_options, surface))
+                rows, chunks = rows + len(frame), chunks + 1
+                if progress:
+                    progress(chunks, rows)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                for frame in read_chunks(input_path, chunk_size):
+                    pending.append(pool.submit(price_frame, frame, model, greeks, model_options, surface))
+                    # Wait for the oldest chunk before reading more, which bounds memory and keeps the order
+                    while len(pending) >= 2 * workers:
+                        priced = pending.popleft().result()
+                        writer.write(priced)
+                        rows, chunks = rows + len(priced), chunks + 1
+                        if progress:
+                            progress(chunks, rows)
+                while pending:
+                    priced = pending.popleft().result()
+                    writer.write(priced)
+                    rows, chunks = rows + len(priced), chunks + 1
+                    if progress:
+                        progress(chunks, rows)
+
+    return {'rows': rows, 'chunks': chunks, 'seconds': time.perf_counter() - start}
@@ -0,0 +1,153 @@
+# Concurrent bulk fetching and pricing for many tickers
+# Option data is fetched on a bounded thread pool and every ticker is priced as soon as its data arrives.
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from .Black_Scholes_Model import BSModel
+from .Binomial_Tree import BTModel
+from .Monte_Carlo import MCModel
+from . import helper
+from .market_data import get_default_provider
+from .yfin import NoDataError
+
+# Errors that mean the data does not exist or the request is invalid, so retrying cannot help.
+# Other ValueErrors stay transient, e.g. json.JSONDecodeError from a truncated response
+PERMANENT_ERRORS = (NoDataError, KeyError, TypeError)
+
+
+def _with_retry(function, retries, backoff):
+    """
+    Calls function(), retrying up to retries times with exponential backoff and jitter.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return function()
+        except PERMANENT_ERRORS:
+            raise
+        except Exception:
+            if attempt == retries:
+                raise
+            # Full jitter keeps many threads from retrying against the source in lockstep
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
+
+
+class BulkFetcher:
+    """
+    Fetches option data for many tickers concurrently.
+
+    Requests for a ticker and expiry that is already being fetched wait for the running request
+    instead of starting a second one, also across calls from different threads.
+
+    provider => MarketDataProvider to read from (the default provider if None)
+    max_workers => Number of concurrent requests
+    retries => Number of retries of a failed request
+    backoff => Base delay in seconds, doubled after every failed attempt
+    """
+    def __init__(self, provider=None, max_workers=16, retries=3, backoff=0.5):
+        self.provider = provider or get_default_provider()
+        self.retries = retries
+        self.backoff = backoff
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bulk-fetch')
+        self._in_flight = {}
+        # Reentrant, since a future that is already done runs its callback right away in submit
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # Requests still queued are dropped rather than fetched for nobody
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, ticker, time_to_expiry=None):
+        """
+        Starts fetching the option data of ticker and returns a Future of the get_option_data result.
+        """
+        key = (ticker, time_to_expiry)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._pool.submit(_with_retry, lambda: helper.get_option_data(
+                    ticker, time_to_expiry, self.provider, verbose=False), self.retries, self.backoff)
+                self._in_flight[key] = future
+                future.add_done_callback(lambda done: self._release(key, done))
+            return future
+
+    def _release(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def fetch(self, tickers, time_to_expiry=None):
+        """
+        Fetches every ticker and yields (ticker, option_data, error) in the order the data arrives.
+        error is None on success, and option_data is None on failure.
+        """
+        # Duplicate symbols are fetched once
+        futures = {}
+        for ticker in dict.fromkeys(tickers):
+            futures[self.submit(ticker, time_to_expiry)] = ticker
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], (None if error else future.result()), error
+
+
+def price_option_data(option_data, risk_free_rate, models=('BS',), time_steps=101, number_of_simulations=1000):
+    """
+    Prices the chain in option_data (as returned by get_option_data) with every model in models.
+
+    risk_free_rate => Risk-free interest rate (annualized, e.g. 0.05 for 5%)
+    models => Any of 'BS', 'BT' and 'MC'
+    Returns a dictionary mapping each model to a tuple (call_prices, put_prices), aligned with
+    option_data['strike_prices'].
+    """
+    spot_price = option_data['spot_price']
+    days = option_data['time_to_expiry']
+    volatility = option_data['volatility']
+    strike_prices = np.asarray(option_data['strike_prices'], dtype=float)
+
+    prices = {}
+    for model in models:
+        if model == 'BS':
+            prices[model] = BSModel.price_chain(spot_price, strike_prices, days, risk_free_rate, volatility)
+        elif model == 'BT':
+            prices[model] = BTModel(spot_price, spot_price, days, risk_free_rate, volatility, time_steps,
+                                    scheme='lr', exercise='american').price_chain(strike_prices)
+        elif model == 'MC':
+            prices[model] = MCModel(spot_price, spot_price, days, risk_free_rate, volatility, number_of_simulations,
+                                    exercise='american').price_chain(strike_prices)
+        else:
+            raise ValueError(f"Unknown model '{model}'. Choose from 'BS', 'BT' and 'MC'")
+    return prices
+
+
+def price_universe(tickers, risk_free_rate, time_to_expiry=None, models=('BS',), provider=None, max_workers=16,
+                   retries=3, backoff=0.5):
+    """
+    Fetches and prices the option chains of many tickers, e.g. pop_ticks.POPULAR_TICKERS.
+
+    Fetching runs on a thread pool while the calling thread prices each ticker as soon as its data
+    arrives, so network waits and pricing overlap.
+    Yields (ticker, option_data, prices, error) in the order the data arrives, with prices as
+    returned by price_option_data. Tickers that fail after all retries are yielded with their
+    error and None for option_data and prices.
+    """
+    with BulkFetcher(provider, max_workers, retries, backoff) as fetcher:
+        for ticker, option_data, error in fetcher.fetch(tickers, time_to_expiry):
+            if error is not None:
+                yield ticker, None, None, error
+                continue
+            try:
+                prices = price_option_data(option_data, risk_free_rate, models)
+            except Exception as e:
+                yield ticker, option_data, None, e
+                continue
+            yield ticker, option_data, prices, None
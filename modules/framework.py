@@ -1,17 +1,40 @@
 # To make a basic framework for any of the option pricing models
 # Essentially, accept the same inputs and provide a common interface for calculating option prices
 
-from abc import ABC, abstractmethod
+from abc import ABC, ABCMeta, abstractmethod
+from numbers import Real
 
-class OptionModel(ABC):
+
+class _ModelMeta(ABCMeta):
+    def __call__(cls, *args, **kwargs):
+        # Keep the constructor arguments, so a price cache can key on every model-specific parameter,
+        # and the inputs they were stored as, so it can tell when they were changed afterwards
+        model = super().__call__(*args, **kwargs)
+        model._init_arguments = (args, kwargs)
+        model._init_state = model._input_state()
+        return model
+
+
+class OptionModel(ABC, metaclass=_ModelMeta):
     # Basic framework for option pricing models
+
+    # PriceCache consulted by calculate_option_price, or None to always price from scratch
+    price_cache = None
+
+    def _input_state(self):
+        # Public scalar attributes, e.g. S, K, T, r and sigma, which the constructor sets from its arguments
+        return tuple((name, value) for name, value in vars(self).items()
+                     if not name.startswith('_') and isinstance(value, (Real, str)))
+
     def calculate_option_price(self, option_type):
 
         option_type = option_type.lower()
         option_price = -1
 
         # Check the option type and call the appropriate method to calculate the price
-        if (option_type == 'call'):
+        if (self.price_cache is not None and option_type in ('call', 'put')):
+            option_price = self.price_cache.lookup(self, option_type)
+        elif (option_type == 'call'):
             # print("Calculating Call Option Price...")
             option_price = self._find_call_option_price()
         elif (option_type == 'put'):
@@ -21,6 +44,29 @@ class OptionModel(ABC):
             print("Option type must be Call or Put ! Invalid option type provided.")
         return option_price
     
+    def calculate_greeks(self, option_type):
+        """
+        Returns a dictionary with the delta, gamma, vega, theta and rho of the option.
+        Vega and rho are per unit change (1.00 = 100%) of volatility and rate,
+        and theta is the change in price per calendar day.
+        """
+        option_type = option_type.lower()
+        greeks = None
+
+        if (option_type == 'call' or option_type == 'put'):
+            greeks = self._find_greeks(option_type)
+        else:
+            print("Option type must be Call or Put ! Invalid option type provided.")
+        return greeks
+
+    def _find_option_prices(self):
+        # Call and put prices together; models that price both in one pass override this
+        return self._find_call_option_price(), self._find_put_option_price()
+
+    def _find_greeks(self, option_type):
+        # Models that can provide sensitivities override this method
+        raise NotImplementedError(f"{type(self).__name__} does not provide Greeks")
+
     # Defining the abstract methods for finding call and put option prices
     # These methods will be implemented in the derived classes
     @classmethod
@@ -5,8 +5,16 @@
 
 import numpy as np
 import datetime
-import yfinance as yf
-from .yfin import Ticker
+import threading
+from .yfin import Ticker, NoDataError
+from .implied_vol import implied_volatility
+from .market_data import get_default_provider
+from .volatility import VolatilityEngine
+
+# Rolling volatility state of every ticker seen so far, so repeated requests only add the new bars.
+# A month of history holds up to 21 daily returns, which the window covers.
+volatility_engine = VolatilityEngine(window=21)
+_volatility_lock = threading.Lock()
 
 # def get_option_prices(stock, expiry_date = None):
 #     # Fetch option chain data
@@ -31,18 +39,24 @@ from .yfin import Ticker
 #         'expiry_date': expiry_date
 #     }
 
-def get_option_prices(stock, expiry_date = None):
-    # Fetch option chain data
-    option_chain = stock.option_chain(expiry_date)
+def get_option_prices(stock, expiry_date = None, provider = None, verbose = True):
+    # Fetch option chain data, either from a yfinance Ticker object or for a ticker symbol from a provider
+    if isinstance(stock, str):
+        provider = provider or get_default_provider()
+        option_chain = provider.get_option_chain(stock, expiry_date)
+    else:
+        option_chain = stock.option_chain(expiry_date)
 
-    print(option_chain.calls.head())
+    if verbose:
+        print(option_chain.calls.head())
 
     strike_prices_c = option_chain.calls['strike'].unique()
     strike_prices_p = option_chain.puts['strike'].unique()
     strike_prices = list(set(strike_prices_c) | set(strike_prices_p))
     strike_prices.sort()
 
-    print("Strike prices:", strike_prices)
+    if verbose:
+        print("Strike prices:", strike_prices)
 
     call_prices = option_chain.calls[option_chain.calls['strike'].isin(strike_prices)]['lastPrice'].values
     put_prices = option_chain.puts[option_chain.puts['strike'].isin(strike_prices)]['lastPrice'].values
@@ -57,20 +71,23 @@ def get_option_prices(stock, expiry_date = None):
     }
 
 
-def get_option_data(ticker, time_to_expiry=None):
+def get_option_data(ticker, time_to_expiry=None, provider=None, verbose=True):
     """
     Fetches option data for a given ticker symbol.
     
     Parameters:
     ticker (str): The ticker symbol of the stock.
+    time_to_expiry (int): Days to the wanted expiry; the nearest listed expiry is used.
+    provider (MarketDataProvider): Source of the data. Defaults to the cached Yahoo Finance provider.
+    verbose (bool): Whether to print the fetched data.
     
     Returns:
     dict: A dictionary containing option data including strike prices, time to expiry, and option prices.
     """
-    stock = yf.Ticker(ticker)
-    options = stock.options
+    provider = provider or get_default_provider()
+    options = provider.get_expiries(ticker)
     if not options:
-        raise ValueError(f"No options available for ticker {ticker}")
+        raise NoDataError(f"No options available for ticker {ticker}")
     
     # Get the nearest expiry date
     if (time_to_expiry is None):
@@ -90,21 +107,23 @@ def get_option_data(ticker, time_to_expiry=None):
     today = datetime.date.today()
     time_to_expiry = (expiry_date_f - today).days
 
-    print("Time to expiry of nearest option:", time_to_expiry, "days")
+    if verbose:
+        print("Time to expiry of nearest option:", time_to_expiry, "days")
     
     # Fetch the option chain for the nearest expiry date
-    price_lists = get_option_prices(stock, expiry_date)
+    price_lists = get_option_prices(ticker, expiry_date, provider, verbose)
 
-    print("Call prices:", price_lists['calls'])
+    if verbose:
+        print("Call prices:", price_lists['calls'])
 
     # To calculate volatility, we need the historical data
-    historical_data = Ticker.get_past_data(ticker)
+    historical_data = Ticker.get_past_data(ticker, provider=provider)
     spot_price = historical_data['Adj Close'].iloc[-1]
-    adj_close = historical_data['Adj Close']
-    log_returns = np.log(adj_close / adj_close.shift(1))
-    volatility = np.std(log_returns.dropna()) * np.sqrt(252)  # Annualized volatility
+    with _volatility_lock:
+        volatility = volatility_engine.update_from_history(ticker, historical_data)  # Annualized volatility
 
-    print("Volatility:", volatility)
+    if verbose:
+        print("Volatility:", volatility)
 
     price_lists['volatility'] = volatility
     price_lists['time_to_expiry'] = time_to_expiry
@@ -113,5 +132,27 @@ def get_option_data(ticker, time_to_expiry=None):
     return price_lists
 
 
+def get_implied_volatilities(option_data, risk_free_rate):
+    """
+    Computes the implied volatility of every call and put price in option_data.
+
+    Parameters:
+    option_data (dict): The dictionary returned by get_option_data.
+    risk_free_rate (float): The risk-free interest rate (annualized, e.g. 0.05 for 5%).
+
+    Returns:
+    dict: option_data with 'implied_vols_c' and 'implied_vols_p' added, aligned with
+    'strike_prices_c' and 'strike_prices_p'. Prices that violate the no-arbitrage bounds
+    or do not converge get NaN.
+    """
+    for kind, option_type in (('c', 'call'), ('p', 'put')):
+        prices = option_data['calls'] if kind == 'c' else option_data['puts']
+        result = implied_volatility(prices, option_data['spot_price'], option_data[f'strike_prices_{kind}'],
+                                    option_data['time_to_expiry'], risk_free_rate, option_type)
+        option_data[f'implied_vols_{kind}'] = np.where(result.converged, result.volatility, np.nan)
+
+    return option_data
+
+
 #get_option_data('AAPL')  # Example usage
 
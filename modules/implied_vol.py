@@ -0,0 +1,159 @@
+# Vectorized implied volatility solver
+# Inverts the Black-Scholes formula for whole arrays of option prices at once
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .special import ndtr
+
+SQRT_2PI = np.sqrt(2 * np.pi)
+# Bracket for the total volatility sigma * sqrt(T)
+MIN_TOTAL_VOL = 1e-8
+MAX_TOTAL_VOL = 10.0
+
+
+@dataclass
+class ImpliedVolResult:
+    """
+    Result of implied_volatility, with one entry per contract.
+
+    volatility => Annualized implied volatility (NaN where the price violates the no-arbitrage bounds)
+    converged => True where the solver met the tolerance
+    bound_violation => True where the price is below intrinsic value or above the upper bound
+    iterations => Number of iterations used for each contract
+    """
+    volatility: np.ndarray
+    converged: np.ndarray
+    bound_violation: np.ndarray
+    iterations: np.ndarray
+
+
+def _initial_guess(beta, x):
+    """
+    Corrado-Miller rational approximation of the total volatility of an out-of-the-money
+    normalized call price beta, floored by the Brenner-Subrahmanyam at-the-money guess.
+    """
+    # Corrado-Miller in units where sqrt(F * K) = 1, i.e. F = e^(x/2) and K = e^(-x/2)
+    F, K = np.exp(0.5 * x), np.exp(-0.5 * x)
+    half_gap = beta - 0.5 * (F - K)
+    radicand = np.maximum(half_gap ** 2 - (F - K) ** 2 / np.pi, 0.0)
+    corrado_miller = SQRT_2PI / (F + K) * (half_gap + np.sqrt(radicand))
+    guess = np.maximum(corrado_miller, SQRT_2PI * beta)
+    return np.clip(guess, 1e-4, MAX_TOTAL_VOL / 2)
+
+
+def implied_volatility(option_prices, underlying_price, strike_price, time_to_maturity, risk_free_rate,
+                       option_type='call', tol=1e-10, max_iter=100):
+    """
+    Finds the Black-Scholes volatility that reproduces every option price.
+
+    option_prices => Observed option prices
+    underlying_price => Current price of the underlying asset
+    strike_price => Strike prices of the options
+    time_to_maturity => Time to maturity in days
+    risk_free_rate => Risk-free interest rate (annualized)
+    option_type => 'call', 'put', or an array of them, one per contract
+    tol => Tolerance on the total volatility sigma * sqrt(T)
+    max_iter => Maximum number of iterations
+
+    Every input broadcasts against the others. The problem is reduced to an out-of-the-money
+    normalized call, started from a rational initial guess and refined with Halley steps that are
+    kept inside a shrinking bracket; a step that would leave the bracket falls back to bisection,
+    so every contract with a price inside the no-arbitrage bounds converges.
+    Returns an ImpliedVolResult.
+    """
+    price, S, K, T, r = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (
+        option_prices, underlying_price, strike_price, time_to_maturity, risk_free_rate)))
+    if isinstance(option_type, str):
+        is_call = np.full(price.shape, option_type.lower() == 'call')
+    else:
+        option_type = np.asarray(option_type)
+        is_call = option_type if option_type.dtype == bool else np.isin(option_type, ('call', 'Call', 'CALL'))
+        is_call = np.broadcast_to(is_call, price.shape)
+    T = T / 365 # Converting days to years
+
+    # Work with undiscounted prices on the forward, converting puts to calls by put-call parity
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        F = S * np.exp(r * T)
+        undiscounted = price * np.exp(r * T)
+        call = np.where(is_call, undiscounted, undiscounted + F - K)
+        x = np.log(F / K)
+
+        # No-arbitrage bounds: intrinsic value <= call < forward. Time value within rounding error
+        # of zero (e.g. from converting a deep in-the-money put) counts as being at intrinsic value.
+        intrinsic = np.maximum(F - K, 0.0)
+        rounding = 1e-13 * (F + K)
+        bound_violation = ~((call >= intrinsic - rounding) & (call < F) & (T > 0))
+
+        # Out-of-the-money normalized price; an in-the-money call is the same as the out-of-the-money
+        # put, which by symmetry is the out-of-the-money call at -x
+        beta = (call - intrinsic) / np.sqrt(F * K)
+        x = -np.abs(x)
+
+    total_vol = np.full(price.shape, np.nan)
+    converged = np.zeros(price.shape, dtype=bool)
+    iterations = np.zeros(price.shape, dtype=int)
+
+    # A price at intrinsic value has zero volatility
+    at_intrinsic = ~bound_violation & (beta <= 0)
+    total_vol[at_intrinsic] = 0.0
+    converged[at_intrinsic] = True
+
+    active = np.flatnonzero(~bound_violation & ~at_intrinsic)
+    x_a, beta_a = x.ravel()[active], beta.ravel()[active]
+    v = _initial_guess(beta_a, x_a)
+    low = np.full_like(v, MIN_TOTAL_VOL)
+    high = np.full_like(v, MAX_TOTAL_VOL)
+    flat_vol, flat_converged, flat_iterations = total_vol.reshape(-1), converged.reshape(-1), iterations.reshape(-1)
+
+    log_beta_a = np.log(beta_a)
+    # The normalized call price is e^(x/2) N(d1) - e^(-x/2) N(d2), so these factors are computed once
+    exp_half_a, exp_minus_half_a = np.exp(0.5 * x_a), np.exp(-0.5 * x_a)
+    for iteration in range(1, max_iter + 1):
+        d_1 = x_a / v + 0.5 * v
+        d_2 = d_1 - v
+        model = exp_half_a * ndtr(d_1) - exp_minus_half_a * ndtr(d_2)
+        vega = exp_half_a * np.exp(-0.5 * d_1 ** 2) / SQRT_2PI
+        volga = vega * d_1 * d_2 / v
+
+        # The price increases with volatility, so the sign of the error tells which side the root is on
+        above = model > beta_a
+        np.copyto(high, v, where=above)
+        np.copyto(low, v, where=~above)
+
+        # Halley step on the log of the price, which stays well behaved for far out-of-the-money
+        # options whose prices are many orders of magnitude below their vega; bisection is used
+        # whenever the step leaves the bracket
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            f = np.log(model) - log_beta_a
+            f_1 = vega / model
+            f_2 = volga / model - f_1 ** 2
+            newton = f / f_1
+            v_new = v - newton / (1 - 0.5 * newton * f_2 / f_1)
+        outside = ~np.isfinite(v_new) | (v_new <= low) | (v_new >= high)
+        v_new = np.where(outside, 0.5 * (low + high), v_new)
+
+        done = np.abs(v_new - v) <= tol * (1 + v)
+        v = v_new
+
+        finished = active[done]
+        flat_vol[finished] = v[done]
+        flat_converged[finished] = True
+        flat_iterations[finished] = iteration
+
+        # Only keep iterating on the contracts that have not converged
+        keep = ~done
+        active, x_a, beta_a, log_beta_a = active[keep], x_a[keep], beta_a[keep], log_beta_a[keep]
+        exp_half_a, exp_minus_half_a = exp_half_a[keep], exp_minus_half_a[keep]
+        v, low, high = v[keep], low[keep], high[keep]
+        if len(active) == 0:
+            break
+
+    # Contracts that ran out of iterations keep their last estimate but are flagged
+    flat_vol[active] = v
+    flat_iterations[active] = max_iter
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volatility = total_vol / np.sqrt(T)
+    return ImpliedVolResult(volatility, converged, bound_violation, iterations)
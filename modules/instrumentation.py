@@ -0,0 +1,251 @@
+# Opt-in instrumentation of the pricing models and the data fetching
+# enable() wraps the methods listed in each class's INSTRUMENTED_PHASES with timers and disable() puts
+# the original methods back, so nothing is measured, and nothing costs time, unless it is enabled.
+#
+#   stats = instrumentation.enable(track_memory=True)
+#   BTModel(100, 100, 30, 0.05, 0.2, 500).calculate_option_price('Call')
+#   print(stats.report())
+#   instrumentation.disable()
+
+import functools
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class Event:
+    """
+    One timed call of an instrumented method.
+
+    model => Name of the class (or module) the method belongs to
+    phase => Phase the method is part of, e.g. 'setup', 'simulation', 'induction', 'payoff' or 'network';
+             'call' is a whole calculate_option_price call. Phases can nest, and their times are inclusive.
+    seconds => Wall time of the call
+    memory_peak => Traced memory high-water mark in bytes during a 'call' above what was allocated when it
+                   started, if memory tracking is on
+    option_type => 'call' or 'put' for 'call' events
+    """
+    model: str
+    phase: str
+    seconds: float
+    memory_peak: int = None
+    option_type: str = None
+
+
+class StatsSink:
+    """
+    Keeps call counts, total, minimum and maximum times per model and phase in memory,
+    as well as call counts per option type and the memory high-water mark of every model.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.option_calls = {}
+        self.memory_peak = {}
+
+    def record(self, event):
+        with self._lock:
+            stats = self.phases.setdefault((event.model, event.phase), [0, 0.0, float('inf'), 0.0])
+            stats[0] += 1
+            stats[1] += event.seconds
+            stats[2] = min(stats[2], event.seconds)
+            stats[3] = max(stats[3], event.seconds)
+            if event.option_type is not None:
+                key = (event.model, event.option_type)
+                self.option_calls[key] = self.option_calls.get(key, 0) + 1
+            if event.memory_peak is not None:
+                self.memory_peak[event.model] = max(self.memory_peak.get(event.model, 0), event.memory_peak)
+
+    def summary(self):
+        """
+        Returns {model: {phase: {'count', 'total', 'mean', 'min', 'max'}}}, with times in seconds.
+        """
+        with self._lock:
+            summary = {}
+            for (model, phase), (count, total, minimum, maximum) in self.phases.items():
+                summary.setdefault(model, {})[phase] = {
+                    'count': count, 'total': total, 'mean': total / count, 'min': minimum, 'max': maximum}
+            return summary
+
+    def report(self):
+        """
+        Returns the summary as a table, with the memory high-water marks below it.
+        """
+        lines = [f"{'model':<16}{'phase':<14}{'count':>8}{'total ms':>11}{'mean ms':>10}{'max ms':>10}"]
+        for model, phases in self.summary().items():
+            for phase, stats in phases.items():
+                lines.append(f"{model:<16}{phase:<14}{stats['count']:>8}{stats['total'] * 1e3:>11.3f}"
+                             f"{stats['mean'] * 1e3:>10.3f}{stats['max'] * 1e3:>10.3f}")
+        for model, peak in self.memory_peak.items():
+            lines.append(f"{model:<16}memory peak {peak / 1024 ** 2:>10.2f} MiB")
+        return "\n".join(lines)
+
+
+class LogSink:
+    """
+    Writes every event as a JSON object to a logger, for structured log pipelines.
+    """
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def record(self, event):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, json.dumps({'event': 'option_pricing', **asdict(event)}))
+
+
+class PrometheusSink(StatsSink):
+    """
+    StatsSink that can render its statistics in the Prometheus text exposition format.
+    """
+    def render(self, prefix='option_pricing'):
+        summary = self.summary()
+        lines = [f"# HELP {prefix}_phase_seconds Time spent in each phase of each model",
+                 f"# TYPE {prefix}_phase_seconds summary"]
+        for model, phases in summary.items():
+            for phase, stats in phases.items():
+                labels = f'model="{model}",phase="{phase}"'
+                lines.append(f"{prefix}_phase_seconds_sum{{{labels}}} {stats['total']!r}")
+                lines.append(f"{prefix}_phase_seconds_count{{{labels}}} {stats['count']}")
+        lines += [f"# HELP {prefix}_calls_total Option prices calculated",
+                  f"# TYPE {prefix}_calls_total counter"]
+        for (model, option_type), count in sorted(self.option_calls.items()):
+            lines.append(f'{prefix}_calls_total{{model="{model}",option_type="{option_type}"}} {count}')
+        lines += [f"# HELP {prefix}_memory_peak_bytes Traced memory high-water mark of a single call",
+                  f"# TYPE {prefix}_memory_peak_bytes gauge"]
+        for model, peak in sorted(self.memory_peak.items()):
+            lines.append(f'{prefix}_memory_peak_bytes{{model="{model}"}} {peak}')
+        return "\n".join(lines) + "\n"
+
+
+_sinks = ()
+_patches = []
+_track_memory = False
+_started_tracing = False
+
+
+def _emit(event):
+    for sink in _sinks:
+        sink.record(event)
+
+
+def _timed(function, model, phase):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _emit(Event(model, phase, time.perf_counter() - start))
+    return wrapper
+
+
+def _timed_call(function):
+    # calculate_option_price is named after the concrete model, and tracks memory when asked to
+    @functools.wraps(function)
+    def wrapper(self, option_type):
+        tracking = _track_memory
+        if tracking:
+            tracemalloc.reset_peak()
+            # Memory still held from before the call, which its peak is measured above
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return function(self, option_type)
+        finally:
+            seconds = time.perf_counter() - start
+            memory_peak = tracemalloc.get_traced_memory()[1] - baseline if tracking else None
+            _emit(Event(type(self).__name__, 'call', seconds, memory_peak, option_type.lower()))
+    return wrapper
+
+
+def _instrumented_targets():
+    """
+    Returns the (owner, model name, phases) of everything that enable() instruments.
+    """
+    from . import helper
+    from .framework import OptionModel
+    from .Black_Scholes_Model import BSModel
+    from .Binomial_Tree import BTModel
+    from .Monte_Carlo import MCModel
+    from .Finite_Difference import FDModel
+    from .FFT_Model import FFTModel
+    from .market_data import YahooProvider, FakeProvider, CachedProvider
+
+    targets = [(cls, cls.__name__, cls.INSTRUMENTED_PHASES)
+               for cls in (BSModel, BTModel, MCModel, FDModel, FFTModel, YahooProvider, FakeProvider, CachedProvider)]
+    targets.append((helper, 'helper', {'fetch': ('get_option_data',)}))
+    targets.append((OptionModel, None, {'call': ('calculate_option_price',)}))
+    return targets
+
+
+def _patch(owner, name, replacement):
+    _patches.append((owner, name, owner.__dict__[name]))
+    setattr(owner, name, replacement)
+
+
+def enable(*sinks, track_memory=False):
+    """
+    Starts instrumenting the pricing models and data fetching, sending every event to sinks.
+
+    sinks => Objects with a record(event) method, e.g. StatsSink, LogSink or PrometheusSink
+    track_memory => Also record the traced memory high-water mark of every calculate_option_price
+                    call with tracemalloc, which slows down allocations while it is on
+
+    Calls in other processes, e.g. Monte Carlo workers on a process pool, are not seen.
+    Returns the first sink, a new StatsSink if none were given.
+    """
+    global _sinks, _track_memory, _started_tracing
+    disable()
+    _sinks = sinks or (StatsSink(),)
+    _track_memory = track_memory
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracing = True
+
+    for owner, model, phases in _instrumented_targets():
+        for phase, names in phases.items():
+            for name in names:
+                original = owner.__dict__[name]
+                if phase == 'call':
+                    _patch(owner, name, _timed_call(original))
+                elif isinstance(original, staticmethod):
+                    _patch(owner, name, staticmethod(_timed(original.__func__, model, phase)))
+                else:
+                    _patch(owner, name, _timed(original, model, phase))
+    return _sinks[0]
+
+
+def disable():
+    """
+    Stops instrumenting and restores the original methods.
+    """
+    global _sinks, _track_memory, _started_tracing
+    while _patches:
+        owner, name, original = _patches.pop()
+        setattr(owner, name, original)
+    if _started_tracing:
+        tracemalloc.stop()
+    _sinks = ()
+    _track_memory = _started_tracing = False
+
+
+def is_enabled():
+    return bool(_patches)
+
+
+@contextmanager
+def instrumented(*sinks, track_memory=False):
+    """
+    Context manager that enables instrumentation for the duration of a block and yields the first sink.
+    """
+    sink = enable(*sinks, track_memory=track_memory)
+    try:
+        yield sink
+    finally:
+        disable()
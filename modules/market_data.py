@@ -0,0 +1,442 @@
+# Market data providers and a persistent on-disk cache
+# helper and Ticker read option chains and price history through a MarketDataProvider,
+# so the data source can be swapped for a cached or an offline one.
+
+import datetime
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Same shape as the object returned by yfinance's Ticker.option_chain
+OptionChain = namedtuple('OptionChain', ['calls', 'puts'])
+
+HISTORY_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+# Seconds before cached data is fetched again
+DEFAULT_TTLS = {
+    'expiries': 6 * 3600,
+    'chain': 15 * 60,
+    'history': 15 * 60,
+}
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.option_pricing', 'market_data.sqlite3')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Approximate storage used by one cached bar, for size accounting
+BAR_BYTES = 64
+
+
+def _to_date(value):
+    """
+    Converts a date, datetime, Timestamp or ISO string to a datetime.date.
+    """
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10])
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def _to_end_date(value):
+    """
+    Converts an exclusive end of a date range to a datetime.date. A datetime after midnight
+    still includes its own day, as yfinance does.
+    """
+    if isinstance(value, datetime.datetime) and value.time() != datetime.time():
+        return value.date() + datetime.timedelta(days=1)
+    return _to_date(value)
+
+
+class MarketDataProvider(ABC):
+    """
+    Source of option chains and daily price history.
+    """
+    @abstractmethod
+    def get_expiries(self, ticker):
+        """
+        Returns the option expiry dates of ticker as a list of 'YYYY-MM-DD' strings, nearest first.
+        """
+        pass
+
+    @abstractmethod
+    def get_option_chain(self, ticker, expiry_date):
+        """
+        Returns an OptionChain of calls and puts DataFrames with at least 'strike' and 'lastPrice' columns.
+        """
+        pass
+
+    @abstractmethod
+    def get_history(self, ticker, start_date, end_date):
+        """
+        Returns the daily bars of ticker from start_date up to but excluding end_date, as a DataFrame
+        with HISTORY_COLUMNS and a DatetimeIndex named 'Date'.
+        """
+        pass
+
+
+class YahooProvider(MarketDataProvider):
+    """
+    Reads live data from Yahoo Finance through yfinance.
+    """
+    # Methods timed by the instrumentation module, by phase
+    INSTRUMENTED_PHASES = {'network': ('get_expiries', 'get_option_chain', 'get_history')}
+
+    def get_expiries(self, ticker):
+        import yfinance as yf
+        return list(yf.Ticker(ticker).options)
+
+    def get_option_chain(self, ticker, expiry_date):
+        import yfinance as yf
+        option_chain = yf.Ticker(ticker).option_chain(expiry_date)
+        return OptionChain(option_chain.calls, option_chain.puts)
+
+    def get_history(self, ticker, start_date, end_date):
+        import yfinance as yf
+        data = yf.Ticker(ticker).history(start=start_date, end=end_date, auto_adjust=False)
+        if data.empty:
+            return pd.DataFrame(columns=HISTORY_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+        # Bars are keyed by their trading day, without the exchange time zone
+        data.index = pd.DatetimeIndex(data.index.tz_localize(None) if data.index.tz else data.index).normalize()
+        data.index.name = 'Date'
+        return data[HISTORY_COLUMNS]
+
+
+class FakeProvider(MarketDataProvider):
+    """
+    Serves deterministic synthetic data for any ticker without network access, for tests and benchmarks.
+
+    Every ticker gets its own geometric Brownian motion history on business days, weekly Friday
+    expiries and option chains priced with the Black-Scholes Model on a volatility smile.
+
+    seed => Base seed, combined with the ticker symbol
+    volatility => Volatility of the simulated history and the at-the-money options
+    risk_free_rate => Risk-free interest rate used to price the chains
+    num_expiries => Number of weekly expiries listed
+    num_strikes => Number of strikes in every chain
+    latency => Seconds every request sleeps, to imitate a remote source
+    """
+    EPOCH = datetime.date(2000, 1, 3)
+    INSTRUMENTED_PHASES = {'network': ('get_expiries', 'get_option_chain', 'get_history')}
+
+    def __init__(self, seed=0, volatility=0.25, risk_free_rate=0.04, num_expiries=12, num_strikes=41, latency=0.0):
+        self.seed = seed
+        self.volatility = volatility
+        self.risk_free_rate = risk_free_rate
+        self.num_expiries = num_expiries
+        self.num_strikes = num_strikes
+        self.latency = latency
+        self.requests = 0
+        self._histories = {}
+        self._lock = threading.Lock()
+
+    def _ticker_rng(self, ticker, *extra):
+        return np.random.default_rng([self.seed, zlib.crc32(ticker.encode()), *extra])
+
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _full_history(self, ticker):
+        """
+        Simulates every bar from EPOCH to today, so any date range of a ticker is consistent
+        with every other range of the same ticker. Each ticker is simulated once per day.
+        """
+        today = datetime.date.today()
+        key = (ticker, today)
+        if key not in self._histories:
+            self._histories[key] = self._simulate_history(ticker, today)
+        return self._histories[key]
+
+    def _simulate_history(self, ticker, today):
+        rng = self._ticker_rng(ticker)
+        # Business days, built with numpy since pandas generates business day ranges one date at a time
+        days = np.arange(np.datetime64(self.EPOCH), np.datetime64(today) + 1)
+        dates = pd.DatetimeIndex(days[np.is_busday(days)], name='Date')
+        dt = 1 / 252
+        log_returns = (0.05 - 0.5 * self.volatility ** 2) * dt + self.volatility * np.sqrt(dt) * rng.standard_normal(len(dates))
+        close = rng.uniform(20, 500) * np.exp(np.cumsum(log_returns))
+        open_ = close * np.exp(self.volatility * np.sqrt(dt) * 0.3 * rng.standard_normal(len(dates)))
+        spread = np.abs(self.volatility * np.sqrt(dt) * rng.standard_normal(len(dates)))
+        return pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) * (1 + spread),
+            'Low': np.minimum(open_, close) * (1 - spread),
+            'Close': close,
+            'Adj Close': close,
+            'Volume': rng.integers(100_000, 10_000_000, len(dates)).astype(float),
+        }, index=dates)
+
+    def get_expiries(self, ticker):
+        self._request()
+        today = datetime.date.today()
+        first_friday = today + datetime.timedelta(days=(4 - today.weekday()) % 7 or 7)
+        return [(first_friday + datetime.timedelta(weeks=i)).isoformat() for i in range(self.num_expiries)]
+
+    def get_option_chain(self, ticker, expiry_date):
+        from .Black_Scholes_Model import BSModel
+
+        self._request()
+        spot_price = self._full_history(ticker)['Close'].iloc[-1]
+        days = max((_to_date(expiry_date) - datetime.date.today()).days, 1)
+        strike_prices = np.round(spot_price * np.linspace(0.7, 1.3, self.num_strikes), 2)
+        # A simple smile so the chain is not flat in implied volatility
+        smile = self.volatility * (1 + 0.5 * np.log(strike_prices / spot_price) ** 2 * 365 / days)
+        calls, puts = BSModel.price_chain(spot_price, strike_prices, days, self.risk_free_rate, smile)
+
+        rng = self._ticker_rng(ticker, days)
+        frames = []
+        for kind, prices in (('C', calls), ('P', puts)):
+            frames.append(pd.DataFrame({
+                'contractSymbol': [f"{ticker}{expiry_date.replace('-', '')[2:]}{kind}{int(k * 1000):08d}" for k in strike_prices],
+                'strike': strike_prices,
+                'lastPrice': np.round(np.maximum(prices, 0.01), 2),
+                'bid': np.round(np.maximum(prices * 0.98, 0.0), 2),
+                'ask': np.round(prices * 1.02 + 0.01, 2),
+                'volume': rng.integers(0, 5000, len(strike_prices)),
+                'openInterest': rng.integers(0, 50000, len(strike_prices)),
+                'impliedVolatility': smile,
+            }))
+        return OptionChain(*frames)
+
+    def get_history(self, ticker, start_date, end_date):
+        self._request()
+        data = self._full_history(ticker)
+        return data[(data.index >= pd.Timestamp(_to_date(start_date))) & (data.index < pd.Timestamp(_to_end_date(end_date)))]
+
+
+class CachedProvider(MarketDataProvider):
+    """
+    Wraps another provider with a persistent SQLite cache.
+
+    Expiry lists and option chains are stored whole and fetched again once older than their TTL.
+    History is stored bar by bar together with the date ranges already covered, so a request
+    only fetches the bars it is missing. Bars before the day they were fetched are final; the
+    open end of a range is trusted for the 'history' TTL only, so the latest bar gets refreshed.
+    Once the cache grows beyond max_bytes, the least recently used entries are evicted.
+
+    provider => Provider that is read on a cache miss
+    path => SQLite file of the cache, ':memory:' for a cache that only lives as long as this object
+    ttl => Dictionary overriding DEFAULT_TTLS, in seconds
+    max_bytes => Size limit of the cache
+    """
+    INSTRUMENTED_PHASES = {'cache': ('get_expiries', 'get_option_chain', 'get_history')}
+
+    def __init__(self, provider, path=DEFAULT_CACHE_PATH, ttl=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.provider = provider
+        self.path = path
+        self.ttl = {**DEFAULT_TTLS, **(ttl or {})}
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'bars_fetched': 0, 'evictions': 0}
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One connection shared by every thread, serialized by the lock
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, payload BLOB, fetched REAL, accessed REAL, size INTEGER);
+            CREATE TABLE IF NOT EXISTS bars (
+                ticker TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, adj_close REAL,
+                volume REAL, PRIMARY KEY (ticker, date));
+            CREATE TABLE IF NOT EXISTS ranges (
+                ticker TEXT, start TEXT, end TEXT, fetched REAL);
+            CREATE TABLE IF NOT EXISTS histories (
+                ticker TEXT PRIMARY KEY, accessed REAL);
+        """)
+        self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _cached_entry(self, key, kind, fetch):
+        """
+        Returns the cached value of key if it is younger than the TTL of kind, otherwise calls fetch()
+        and stores the result.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT payload, fetched FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] < self.ttl[kind]:
+                self._connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                self._connection.commit()
+                self.stats['hits'] += 1
+                return pickle.loads(row[0])
+
+        # Fetch outside the lock so other threads can keep reading the cache meanwhile
+        value = fetch()
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.stats['misses'] += 1
+            self._connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                                     (key, payload, now, now, len(payload)))
+            self._connection.commit()
+            self._evict()
+        return value
+
+    def get_expiries(self, ticker):
+        return self._cached_entry(f"expiries/{ticker}", 'expiries', lambda: self.provider.get_expiries(ticker))
+
+    def get_option_chain(self, ticker, expiry_date):
+        return self._cached_entry(f"chain/{ticker}/{expiry_date}", 'chain',
+                                  lambda: self.provider.get_option_chain(ticker, expiry_date))
+
+    def _range_rows(self, ticker, now):
+        """
+        Splits the stored ranges of ticker into final parts, which end before the day they were fetched
+        and never expire, and the (start, end, fetched) open ends that are still within the history TTL.
+        """
+        rows = self._connection.execute("SELECT start, end, fetched FROM ranges WHERE ticker = ?", (ticker,)).fetchall()
+        final, fresh = [], []
+        for start, end, fetched in rows:
+            start, end = _to_date(start), _to_date(end)
+            fetch_day = datetime.date.fromtimestamp(fetched)
+            if start < min(end, fetch_day):
+                final.append((start, min(end, fetch_day)))
+            if end > fetch_day and now - fetched < self.ttl['history']:
+                fresh.append((max(start, fetch_day), end, fetched))
+        return _merge_ranges(final), fresh
+
+    def get_history(self, ticker, start_date, end_date):
+        start, end = _to_date(start_date), _to_end_date(end_date)
+        now = time.time()
+        with self._lock:
+            final, fresh = self._range_rows(ticker, now)
+        missing = _subtract_ranges((start, end), _merge_ranges(final + [(s, e) for s, e, _ in fresh]))
+
+        # Fetch outside the lock so other threads can keep reading the cache meanwhile
+        fetched = [self.provider.get_history(ticker, s, e) for s, e in missing]
+        with self._lock:
+            if missing:
+                self.stats['misses'] += 1
+                for data in fetched:
+                    self.stats['bars_fetched'] += len(data)
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(ticker, date.strftime('%Y-%m-%d'), *map(float, values))
+                         for date, values in zip(data.index, data[HISTORY_COLUMNS].to_numpy())])
+
+                # Rewrite the coverage with the final parts merged, so the table stays small
+                today = datetime.date.fromtimestamp(now)
+                final = _merge_ranges(final + [(s, min(e, today)) for s, e in missing if s < min(e, today)])
+                fresh = fresh + [(max(s, today), e, now) for s, e in missing if e > today]
+                self._connection.execute("DELETE FROM ranges WHERE ticker = ?", (ticker,))
+                self._connection.executemany("INSERT INTO ranges VALUES (?, ?, ?, ?)",
+                                             [(ticker, s.isoformat(), e.isoformat(), now) for s, e in final]
+                                             + [(ticker, s.isoformat(), e.isoformat(), f) for s, e, f in fresh])
+            else:
+                self.stats['hits'] += 1
+
+            rows = self._connection.execute(
+                "SELECT date, open, high, low, close, adj_close, volume FROM bars "
+                "WHERE ticker = ? AND date >= ? AND date < ? ORDER BY date",
+                (ticker, start.isoformat(), end.isoformat())).fetchall()
+            self._connection.execute("INSERT OR REPLACE INTO histories VALUES (?, ?)", (ticker, now))
+            self._connection.commit()
+            if missing:
+                self._evict()
+
+        return pd.DataFrame([row[1:] for row in rows], columns=HISTORY_COLUMNS,
+                            index=pd.DatetimeIndex([row[0] for row in rows], name='Date'))
+
+    def _size(self):
+        entries = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        bars = self._connection.execute("SELECT COUNT(*) FROM bars").fetchone()[0]
+        return entries + bars * BAR_BYTES
+
+    def _evict(self):
+        """
+        Deletes the least recently used entries and ticker histories until the cache fits in max_bytes.
+        """
+        size = self._size()
+        while size > self.max_bytes:
+            oldest_entry = self._connection.execute(
+                "SELECT key, accessed, size FROM entries ORDER BY accessed LIMIT 1").fetchone()
+            oldest_history = self._connection.execute(
+                "SELECT ticker, accessed FROM histories ORDER BY accessed LIMIT 1").fetchone()
+            if oldest_entry is None and oldest_history is None:
+                break
+            if oldest_history is None or (oldest_entry is not None and oldest_entry[1] <= oldest_history[1]):
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (oldest_entry[0],))
+                size -= oldest_entry[2]
+            else:
+                ticker = oldest_history[0]
+                bars = self._connection.execute("SELECT COUNT(*) FROM bars WHERE ticker = ?", (ticker,)).fetchone()[0]
+                for table in ('bars', 'ranges', 'histories'):
+                    self._connection.execute(f"DELETE FROM {table} WHERE ticker = ?", (ticker,))
+                size -= bars * BAR_BYTES
+            self.stats['evictions'] += 1
+        self._connection.commit()
+
+    def clear(self):
+        """
+        Deletes everything in the cache.
+        """
+        with self._lock:
+            for table in ('entries', 'bars', 'ranges', 'histories'):
+                self._connection.execute(f"DELETE FROM {table}")
+            self._connection.commit()
+
+
+def _merge_ranges(ranges):
+    """
+    Merges overlapping or touching (start, end) ranges into a sorted list of disjoint ranges.
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract_ranges(wanted, covered):
+    """
+    Returns the parts of the range wanted that are not in the sorted disjoint ranges covered.
+    """
+    start, end = wanted
+    missing = []
+    for covered_start, covered_end in covered:
+        if covered_end <= start or covered_start >= end:
+            continue
+        if covered_start > start:
+            missing.append((start, covered_start))
+        start = max(start, covered_end)
+    if start < end:
+        missing.append((start, end))
+    return missing
+
+
+_default_provider = None
+_default_provider_lock = threading.Lock()
+
+
+def get_default_provider():
+    """
+    Returns the provider used when none is passed, a CachedProvider over Yahoo Finance unless
+    set_default_provider was called.
+    """
+    global _default_provider
+    # Threads of a BulkFetcher or the server can get here at once, and must share one cache
+    with _default_provider_lock:
+        if _default_provider is None:
+            _default_provider = CachedProvider(YahooProvider())
+        return _default_provider
+
+
+def set_default_provider(provider):
+    """
+    Replaces the provider used when none is passed, e.g. with a FakeProvider to work offline.
+    """
+    global _default_provider
+    with _default_provider_lock:
+        _default_provider = provider
@@ -0,0 +1,187 @@
+# Streaming engine for the Monte Carlo Model
+# Paths are generated in fixed-size chunks and only running moments of the payoffs are kept,
+# so memory stays bounded no matter how many simulations are requested.
+
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+# Minimum number of samples before target_std_error may stop a run
+MIN_SAMPLES_FOR_TARGET = 10
+
+
+class RunningStats:
+    """
+    Running count, mean and sum of squared deviations (M2) of a stream of samples.
+
+    The mean and M2 can be arrays, so one object tracks many payoffs (e.g. calls and puts
+    for every strike) at once. Chunks are combined with the pairwise update of Chan et al.,
+    which stays accurate for any number of chunks.
+    """
+    def __init__(self, shape=()):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def update(self, samples):
+        """
+        Adds a chunk of samples, with the sample index on the first axis.
+        """
+        self.merge(*sample_moments(samples))
+
+    def merge(self, count, mean, m2):
+        """
+        Adds the moments (count, mean, M2) of another group of samples.
+        """
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    @property
+    def variance(self):
+        # Unbiased sample variance
+        if self.count < 2:
+            return np.full(np.shape(self.mean), np.inf)
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std_error(self):
+        return np.sqrt(self.variance / max(self.count, 1))
+
+
+def sample_moments(samples):
+    """
+    Returns the (count, mean, M2) of samples along the first axis.
+    """
+    samples = np.asarray(samples, dtype=float)
+    mean = samples.mean(axis=0)
+    return len(samples), mean, np.sum((samples - mean) ** 2, axis=0)
+
+
+@dataclass
+class MCEstimate:
+    """
+    Result of a streamed Monte Carlo run.
+
+    price, std_error, ci_low and ci_high have shape (2, number of strikes): row 0 holds
+    calls and row 1 holds puts. stop_reason is 'max_paths', 'target' or 'time_budget'.
+    variance_reduction_factor is the plain per-path payoff variance divided by the effective
+    per-path variance of the estimator, i.e. how many times fewer paths it needs for the same error.
+    """
+    price: np.ndarray
+    std_error: np.ndarray
+    ci_low: np.ndarray
+    ci_high: np.ndarray
+    confidence_level: float
+    num_paths: int
+    elapsed: float
+    stop_reason: str
+    variance_reduction_factor: np.ndarray
+
+    def for_option(self, option_type):
+        """
+        Returns the estimate for only calls or only puts. A single strike is returned as scalars.
+        """
+        row = 0 if option_type.lower() == 'call' else 1
+        select = (lambda x: x[row].item()) if self.price.shape[1] == 1 else (lambda x: x[row])
+        return MCEstimate(select(self.price), select(self.std_error), select(self.ci_low), select(self.ci_high),
+                          self.confidence_level, self.num_paths, self.elapsed, self.stop_reason,
+                          select(self.variance_reduction_factor))
+
+
+def run_stream(sample_chunk, num_paths, chunk_size, target_std_error=None, time_budget=None):
+    """
+    Runs sample_chunk repeatedly until num_paths paths have been used or a stopping rule fires.
+
+    sample_chunk(n) => Simulates about n paths and returns (paths_used, moments, raw_moments), where
+                       moments is the (count, mean, M2) of the estimator's samples and raw_moments
+                       is the (count, mean, M2) of the plain per-path payoffs
+    num_paths => Maximum number of paths to simulate
+    chunk_size => Number of paths simulated per chunk
+    target_std_error => Stop once every payoff's standard error is at or below this value
+    time_budget => Stop once this many seconds have elapsed
+
+    Returns (stats, raw_stats, paths_used, elapsed, stop_reason).
+    """
+    stats = raw_stats = None
+    paths_used = 0
+    stop_reason = 'max_paths'
+    start = time.perf_counter()
+
+    while paths_used < num_paths:
+        n, moments, raw_moments = sample_chunk(min(chunk_size, num_paths - paths_used))
+        if stats is None:
+            stats = RunningStats(np.shape(moments[1]))
+            raw_stats = RunningStats(np.shape(raw_moments[1]))
+        stats.merge(*moments)
+        raw_stats.merge(*raw_moments)
+        paths_used += n
+
+        # A handful of samples is required before the standard error itself can be trusted
+        if (target_std_error is not None and stats.count >= MIN_SAMPLES_FOR_TARGET
+                and np.all(stats.std_error <= target_std_error)):
+            stop_reason = 'target'
+            break
+        if time_budget is not None and time.perf_counter() - start >= time_budget:
+            stop_reason = 'time_budget'
+            break
+
+    return stats, raw_stats, paths_used, time.perf_counter() - start, stop_reason
+
+
+def run_parallel(worker, worker_args, executor='process'):
+    """
+    Runs worker(*args) for every entry of worker_args on a process or thread pool and merges
+    the run_stream results in submission order, so the merged statistics do not depend on
+    which worker finishes first.
+
+    worker => Module-level function returning the same tuple as run_stream
+    worker_args => One tuple of arguments per worker
+    executor => 'process' or 'thread'
+
+    Returns (stats, raw_stats, paths_used, elapsed, stop_reason) for the combined run.
+    """
+    if executor not in ('process', 'thread'):
+        raise ValueError(f"executor must be 'process' or 'thread', not '{executor}'")
+    # Imported here since the process pool machinery is slow to import and most runs use one worker
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+
+    start = time.perf_counter()
+    with pool_class(max_workers=len(worker_args)) as pool:
+        futures = [pool.submit(worker, *args) for args in worker_args]
+        results = [future.result() for future in futures]
+    # Workers given no paths return no statistics
+    results = [result for result in results if result[0] is not None]
+    if not results:
+        raise ValueError("No worker simulated any paths")
+
+    stats, raw_stats, paths_used, _, stop_reason = results[0]
+    for worker_stats, worker_raw_stats, worker_paths, _, worker_reason in results[1:]:
+        stats.merge(worker_stats.count, worker_stats.mean, worker_stats.m2)
+        raw_stats.merge(worker_raw_stats.count, worker_raw_stats.mean, worker_raw_stats.m2)
+        paths_used += worker_paths
+        # Report an early stop if any worker stopped early
+        if stop_reason == 'max_paths':
+            stop_reason = worker_reason
+
+    return stats, raw_stats, paths_used, time.perf_counter() - start, stop_reason
+
+
+def make_estimate(stats, raw_stats, paths_used, elapsed, stop_reason, confidence_level=0.95):
+    """
+    Builds an MCEstimate with a normal confidence interval from the running statistics.
+    """
+    from statistics import NormalDist
+    z = NormalDist().inv_cdf(0.5 + confidence_level / 2)
+    std_error = stats.std_error
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Plain per-path variance over the estimator's effective per-path variance
+        variance_reduction_factor = raw_stats.variance / (std_error ** 2 * paths_used)
+    return MCEstimate(stats.mean, std_error, stats.mean - z * std_error, stats.mean + z * std_error,
+                      confidence_level, paths_used, elapsed, stop_reason, variance_reduction_factor)
@@ -0,0 +1,259 @@
+# Portfolios of option positions and scenario risk
+# Positions are kept as a struct of arrays, one array per field, so the whole book is revalued with
+# broadcast model calls over (spot shock x volatility shock x days forward x positions) instead of
+# one OptionModel per position and scenario.
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .Black_Scholes_Model import BSModel
+from .Finite_Difference import FDPriceGrid
+
+# Position fields and their array types
+FIELDS = {
+    'underlying': np.int32,   # Index into Portfolio.underlyings
+    'strike_price': float,
+    'time_to_maturity': float,  # Days
+    'is_call': bool,
+    'quantity': float,
+    'volatility': float,
+}
+SCENARIO_MODELS = ('BS', 'FD')
+# Positions revalued at a time, which bounds the memory of the scenario tensors
+POSITION_CHUNK = 2048
+
+
+@dataclass
+class ScenarioResult:
+    """
+    Profit and loss of a portfolio over a grid of scenarios.
+
+    spot_shocks, vol_shocks, days_forward => Axes of the grid
+    base_value => Value of the book today
+    pnl => (spot_shocks, vol_shocks, days_forward) array of the change in value of the book
+    pnl_by_underlying => The same with a last axis of Portfolio.underlyings
+    pnl_by_position => The same with a last axis of positions, if asked for
+    """
+    spot_shocks: np.ndarray
+    vol_shocks: np.ndarray
+    days_forward: np.ndarray
+    base_value: float
+    pnl: np.ndarray
+    pnl_by_underlying: np.ndarray
+    pnl_by_position: np.ndarray = None
+
+    def worst(self):
+        """
+        Returns the worst P&L of the book with the (spot shock, vol shock, days forward) it happens at.
+        """
+        index = np.unravel_index(np.argmin(self.pnl), self.pnl.shape)
+        return self.pnl[index], (self.spot_shocks[index[0]], self.vol_shocks[index[1]], self.days_forward[index[2]])
+
+
+class Portfolio:
+    """
+    Option positions stored as one array per field.
+
+    Every position holds an underlying symbol, strike price, days to expiry, option type, quantity
+    (negative for short positions) and the volatility it is valued at. Arrays grow by doubling,
+    so adding positions one at a time is amortized O(1).
+    """
+    def __init__(self, capacity=1024):
+        self.underlyings = []
+        self._codes = {}
+        self._size = 0
+        self._data = {name: np.zeros(capacity, dtype=dtype) for name, dtype in FIELDS.items()}
+
+    def __len__(self):
+        return self._size
+
+    def __getattr__(self, name):
+        # Fields read as arrays of the current positions
+        if name in FIELDS:
+            return self._data[name][:self._size]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def _underlying_codes(self, underlyings):
+        codes = []
+        for symbol in underlyings:
+            if symbol not in self._codes:
+                self._codes[symbol] = len(self.underlyings)
+                self.underlyings.append(symbol)
+            codes.append(self._codes[symbol])
+        return np.array(codes, dtype=np.int32)
+
+    def add_positions(self, underlying, strike_price, time_to_maturity, option_type, quantity, volatility):
+        """
+        Adds positions from equally long arrays (or scalars, broadcast to the others).
+
+        underlying => Symbols of the underlying assets
+        strike_price => Strike prices
+        time_to_maturity => Days to expiry
+        option_type => 'call' or 'put'
+        quantity => Number of options, negative for short positions
+        volatility => Volatility each position is valued at (annualized), e.g. its implied volatility
+        Returns the indices of the new positions.
+        """
+        underlying, strike_price, time_to_maturity, option_type, quantity, volatility = np.broadcast_arrays(
+            np.asarray(underlying, dtype=object), strike_price, time_to_maturity, np.asarray(option_type, dtype=object),
+            quantity, volatility)
+        is_call = np.array([str(t).lower() == 'call' for t in option_type.ravel()], dtype=bool)
+        if not np.all(is_call | np.array([str(t).lower() == 'put' for t in option_type.ravel()], dtype=bool)):
+            raise ValueError("option_type must be 'call' or 'put'")
+        values = {
+            'underlying': self._underlying_codes(underlying.ravel()),
+            'strike_price': strike_price.ravel(),
+            'time_to_maturity': time_to_maturity.ravel(),
+            'is_call': is_call,
+            'quantity': quantity.ravel(),
+            'volatility': volatility.ravel(),
+        }
+        count = len(values['strike_price'])
+        capacity = len(self._data['quantity'])
+        if self._size + count > capacity:
+            capacity = max(2 * capacity, self._size + count)
+            for name, array in self._data.items():
+                grown = np.zeros(capacity, dtype=array.dtype)
+                grown[:self._size] = array[:self._size]
+                self._data[name] = grown
+        for name, array in self._data.items():
+            array[self._size:self._size + count] = values[name]
+        self._size += count
+        return np.arange(self._size - count, self._size)
+
+    def add(self, underlying, strike_price, time_to_maturity, option_type, quantity, volatility):
+        """
+        Adds one position and returns its index.
+        """
+        return self.add_positions([underlying], strike_price, time_to_maturity, option_type, quantity, volatility)[0]
+
+    def remove(self, indices):
+        """
+        Removes the positions at indices; later positions move down to fill the gaps.
+        """
+        keep = np.ones(self._size, dtype=bool)
+        keep[indices] = False
+        for name, array in self._data.items():
+            kept = array[:self._size][keep]
+            array[:len(kept)] = kept
+        self._size = int(keep.sum())
+
+    @classmethod
+    def from_frame(cls, frame):
+        """
+        Builds a portfolio from a DataFrame with underlying, strike_price, time_to_maturity,
+        option_type, quantity and volatility columns.
+        """
+        portfolio = cls(capacity=max(len(frame), 1))
+        portfolio.add_positions(*(frame[name].to_numpy() for name in (
+            'underlying', 'strike_price', 'time_to_maturity', 'option_type', 'quantity', 'volatility')))
+        return portfolio
+
+    def _spots(self, spot_prices):
+        # Spot price of every position from a {symbol: price} dictionary or an array aligned with underlyings
+        if isinstance(spot_prices, dict):
+            missing = [symbol for symbol in self.underlyings if symbol not in spot_prices]
+            if missing:
+                raise ValueError(f"No spot prices for {', '.join(missing)}")
+            spot_prices = [spot_prices[symbol] for symbol in self.underlyings]
+        return np.asarray(spot_prices, dtype=float)[self.underlying]
+
+    def value(self, spot_prices, risk_free_rate, model='BS', fd_options=None):
+        """
+        Returns the value of every position, quantity times option price, as an array.
+        """
+        if model not in SCENARIO_MODELS:
+            raise ValueError(f"Unknown model '{model}'. Choose from {SCENARIO_MODELS}")
+        spots, none = self._spots(spot_prices), np.zeros(1)
+        grid = self._price_grid(spots, risk_free_rate, none, none, none, fd_options) if model == 'FD' else None
+        return self._revalue(spots, risk_free_rate, none, none, none, slice(0, self._size), grid)[0, 0, 0]
+
+    def scenario_pnl(self, spot_prices, risk_free_rate, spot_shocks, vol_shocks=(0.0,), days_forward=(0,), model='BS',
+                     by_position=False, fd_options=None):
+        """
+        Revalues the book over every combination of spot shock, volatility shock and days forward.
+
+        spot_prices => {symbol: price} or an array aligned with underlyings
+        spot_shocks => Relative moves of every underlying, e.g. np.linspace(-0.2, 0.2, 41)
+        vol_shocks => Absolute moves of every volatility, e.g. (-0.05, 0, 0.05)
+        days_forward => Days that pass; positions that expire on the way are worth their payoff
+        model => 'BS' for European Black-Scholes prices, or 'FD' for American prices from an FDPriceGrid
+                 built once over the whole book and every scenario, which takes a few PDE solves per
+                 band of days to expiry and volatility whatever the number of positions and scenarios
+        by_position => Also return the P&L of every position, which needs memory for the full tensor
+        fd_options => Extra arguments of FDPriceGrid, e.g. volatility_nodes, time_steps or spot_steps
+        Returns a ScenarioResult.
+        """
+        if model not in SCENARIO_MODELS:
+            raise ValueError(f"Unknown model '{model}'. Choose from {SCENARIO_MODELS}")
+        spot_shocks, vol_shocks, days_forward = (np.atleast_1d(np.asarray(x, dtype=float))
+                                                 for x in (spot_shocks, vol_shocks, days_forward))
+        spots = self._spots(spot_prices)
+        shape = (len(spot_shocks), len(vol_shocks), len(days_forward))
+        pnl_by_underlying = np.zeros(shape + (len(self.underlyings),))
+        pnl_by_position = np.zeros(shape + (self._size,)) if by_position else None
+        base_value = 0.0
+        none = np.zeros(1)
+        grid = (self._price_grid(spots, risk_free_rate, spot_shocks, vol_shocks, days_forward, fd_options)
+                if model == 'FD' else None)
+
+        for first in range(0, self._size, POSITION_CHUNK):
+            positions = slice(first, min(first + POSITION_CHUNK, self._size))
+            base = self._revalue(spots, risk_free_rate, none, none, none, positions, grid)[0, 0, 0]
+            pnl = self._revalue(spots, risk_free_rate, spot_shocks, vol_shocks, days_forward, positions, grid) - base
+            base_value += base.sum()
+            # Sum the positions of every underlying with one matrix product
+            one_hot = np.zeros((pnl.shape[-1], len(self.underlyings)))
+            one_hot[np.arange(pnl.shape[-1]), self.underlying[positions]] = 1.0
+            pnl_by_underlying += pnl @ one_hot
+            if by_position:
+                pnl_by_position[..., positions] = pnl
+
+        return ScenarioResult(spot_shocks, vol_shocks, days_forward, base_value, pnl_by_underlying.sum(axis=-1),
+                              pnl_by_underlying, pnl_by_position)
+
+    def _price_grid(self, spots, risk_free_rate, spot_shocks, vol_shocks, days_forward, fd_options):
+        # One FDPriceGrid over every days to expiry, volatility and moneyness of the book in every scenario and
+        # unshocked, so all chunks of positions share its solves. None when every position has expired
+        days = self.time_to_maturity[:, None, None] - np.append(days_forward, 0.0)[None, None, :]
+        sigma = np.maximum(self.volatility[:, None, None] + np.append(vol_shocks, 0.0)[None, :, None], 1e-4)
+        days, sigma = np.broadcast_arrays(days, sigma)
+        live = days > 0
+        if not live.any():
+            return None
+        moneyness = spots / self.strike_price * (1 + max(spot_shocks.max(), 0.0))
+        return FDPriceGrid(days[live], sigma[live], risk_free_rate, moneyness.max(), exercise='american',
+                           **(fd_options or {}))
+
+    def _revalue(self, spots, risk_free_rate, spot_shocks, vol_shocks, days_forward, positions, grid):
+        """
+        Values a slice of positions in every scenario, as a (spot, vol, days, positions) array of quantity times price.
+        Prices are European Black-Scholes without a grid and American from the FDPriceGrid with one.
+        """
+        K = self.strike_price[positions]
+        is_call = self.is_call[positions]
+        S = spots[positions] * (1 + spot_shocks[:, None, None, None])
+        sigma = np.maximum(self.volatility[positions] + vol_shocks[None, :, None, None], 1e-4)
+        days = self.time_to_maturity[positions] - days_forward[None, None, :, None]
+        S, sigma, days = np.broadcast_arrays(S, sigma, days)
+        live = days > 0
+        # Expired positions are worth their payoff
+        prices = np.where(is_call, np.maximum(S - K, 0.0), np.maximum(K - S, 0.0))
+
+        if grid is None and live.all():
+            calls, puts = BSModel.price_chain(S, K, days, risk_free_rate, sigma)
+            prices = np.where(is_call, calls, puts)
+        elif grid is None:
+            calls, puts = BSModel.price_chain(S[live], np.broadcast_to(K, S.shape)[live], days[live], risk_free_rate,
+                                              sigma[live])
+            prices[live] = np.where(np.broadcast_to(is_call, S.shape)[live], calls, puts)
+        elif live.any():
+            # Prices are homogeneous in spot and strike, so the unit strike grid prices every position and
+            # scenario at its moneyness. Interpolating in volatility can leave an American price a hair
+            # below its exercise value, which it is never worth less than
+            unit_K = np.broadcast_to(K, S.shape)[live]
+            unit = grid.prices(S[live] / unit_K, days[live], sigma[live])
+            live_prices = np.where(np.broadcast_to(is_call, S.shape)[live], unit[:, 0], unit[:, 1]) * unit_K
+            prices[live] = np.maximum(live_prices, prices[live])
+        return prices * self.quantity[positions]
@@ -0,0 +1,165 @@
+# Memoizing cache for option prices
+# Prices are keyed on the model class and every constructor argument, with the continuous inputs
+# snapped to a grid so nearly identical requests share an entry. Calls and puts are cached together.
+
+import inspect
+import threading
+from collections import OrderedDict
+from numbers import Real
+
+import numpy as np
+
+# Grid step of each quantized constructor argument, shared by all the models
+DEFAULT_QUANTIZATION = {
+    'underlying_price': 1e-4,
+    'strike_price': 1e-4,
+    'time_to_maturity': 1e-6,
+    'risk_free_rate': 1e-8,
+    'volatility': 1e-8,
+}
+
+
+def _hashable(value):
+    """
+    Converts lists and arrays, e.g. exercise_dates, to hashable values for a cache key.
+    """
+    if isinstance(value, np.ndarray):
+        return ('array', value.shape, value.dtype.str, value.tobytes())
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+class PriceCache:
+    """
+    LRU cache of (call price, put price) pairs in front of OptionModel.calculate_option_price.
+
+    max_entries => Number of entries kept before the least recently used ones are evicted
+    quantization => Dictionary of grid steps for constructor arguments, DEFAULT_QUANTIZATION if None.
+                    Arguments that are not listed (e.g. time_steps, number_of_simulations or seed)
+                    must match exactly. Pass {} to disable quantization.
+
+    A miss prices the model at the snapped inputs, so a cached price does not depend on which
+    request within a grid cell came first. Use install() to have calculate_option_price consult
+    the cache, or price() to skip constructing the model entirely on a hit.
+    """
+    def __init__(self, max_entries=4096, quantization=None):
+        self.max_entries = max_entries
+        self.quantization = DEFAULT_QUANTIZATION if quantization is None else dict(quantization)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._signatures = {}
+        self._lock = threading.Lock()
+
+    def _quantize(self, model_class, args, kwargs):
+        """
+        Returns the cache key of a model, the constructor arguments snapped to the grid, and whether
+        snapping left every argument as it was.
+        """
+        signature = self._signatures.get(model_class)
+        if signature is None:
+            # The constructor without self, since the models' metaclass hides it behind __call__
+            signature = inspect.signature(model_class.__init__)
+            signature = signature.replace(parameters=list(signature.parameters.values())[1:])
+            self._signatures[model_class] = signature
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+
+        key, unchanged = [model_class.__qualname__], True
+        for name, value in bound.arguments.items():
+            step = self.quantization.get(name)
+            if step and isinstance(value, Real) and not isinstance(value, bool):
+                index = round(value / step)
+                bound.arguments[name] = index * step
+                unchanged = unchanged and index * step == value
+                key.append((name, index))
+            else:
+                key.append((name, _hashable(value)))
+        return tuple(key), bound, unchanged
+
+    def _get(self, key):
+        with self._lock:
+            prices = self._entries.get(key)
+            if prices is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return prices
+
+    def _put(self, key, prices):
+        with self._lock:
+            self._entries[key] = prices
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def price(self, model_class, *args, **kwargs):
+        """
+        Returns (call price, put price) for model_class(*args, **kwargs), only constructing the model on a miss.
+        """
+        key, bound, _ = self._quantize(model_class, args, kwargs)
+        prices = self._get(key)
+        if prices is None:
+            prices = model_class(*bound.args, **bound.kwargs)._find_option_prices()
+            self._put(key, prices)
+        return prices
+
+    def lookup(self, model, option_type):
+        """
+        Returns the cached price of model for option_type ('call' or 'put'), pricing both on a miss.
+        A model whose inputs were changed after it was constructed, e.g. model.sigma = 0.3, is priced
+        as it is, since its constructor arguments no longer describe it.
+        """
+        if model._input_state() != model._init_state:
+            prices = model._find_option_prices()
+            return prices[0] if option_type == 'call' else prices[1]
+        args, kwargs = model._init_arguments
+        key, bound, unchanged = self._quantize(type(model), args, kwargs)
+        prices = self._get(key)
+        if prices is None:
+            # The model at hand can be reused when snapping did not change any of its inputs
+            if unchanged:
+                prices = model._find_option_prices()
+            else:
+                prices = type(model)(*bound.args, **bound.kwargs)._find_option_prices()
+            self._put(key, prices)
+        return prices[0] if option_type == 'call' else prices[1]
+
+    def install(self, *model_classes):
+        """
+        Makes calculate_option_price of model_classes (every model if none are given) use this cache.
+        """
+        from .framework import OptionModel
+        for model_class in model_classes or (OptionModel,):
+            model_class.price_cache = self
+        return self
+
+    @staticmethod
+    def uninstall(*model_classes):
+        """
+        Stops model_classes (every model if none are given) from using a cache.
+        """
+        from .framework import OptionModel
+        for model_class in model_classes or (OptionModel,):
+            model_class.price_cache = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """
+        Returns a dictionary with the hits, misses, evictions, current size and hit rate.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self._entries), 'hit_rate': self.hit_rate}
@@ -0,0 +1,386 @@
+# Local HTTP/JSON pricing service
+# Concurrent requests for single options are queued and priced together in micro-batches with the
+# vectorized model paths of batch.price_arrays, then every request gets its own result back.
+# A batch is priced when it holds max_batch_size requests or max_wait seconds after its first request,
+# whichever comes first; requests arriving while a batch is being priced form the next one.
+#
+#   POST /price    {"model": "BS", "underlying_price": 100, "strike_price": 105, "time_to_maturity": 30,
+#                   "risk_free_rate": 0.05, "volatility": 0.2, "option_type": "call", "greeks": false}
+#                  A JSON list of such objects is priced as a list.
+#   GET /metrics   Throughput, latency and batch size metrics in the Prometheus text format
+#   GET /stats     The same metrics as JSON
+#   GET /health
+
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .batch import price_arrays, INPUT_COLUMNS, COLUMN_ALIASES, GREEK_NAMES, MODELS
+
+MAX_BODY_BYTES = 1 << 20
+# Inputs that must be positive; the risk-free rate may be zero or negative
+POSITIVE_INPUTS = ('underlying_price', 'strike_price', 'time_to_maturity', 'volatility')
+# Latencies of this many of the latest requests are kept for the percentiles
+LATENCY_WINDOW = 10000
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+
+class RequestError(ValueError):
+    """
+    Raised for a request that cannot be priced, and answered with status 400.
+    """
+
+
+def parse_request(body):
+    """
+    Validates one pricing request and returns (batch key, inputs, is_call).
+    Requests with the same batch key are priced in one vectorized call.
+    """
+    if not isinstance(body, dict):
+        raise RequestError("A request must be a JSON object")
+    body = {COLUMN_ALIASES.get(k, k): v for k, v in body.items()}
+    model = body.get('model', 'BS')
+    if model not in MODELS:
+        raise RequestError(f"Unknown model '{model}'. Choose from {', '.join(MODELS)}")
+    inputs = []
+    for name in INPUT_COLUMNS:
+        value = body.get(name)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise RequestError(f"'{name}' must be a number")
+        if name in POSITIVE_INPUTS and value <= 0:
+            raise RequestError(f"'{name}' must be positive")
+        inputs.append(float(value))
+    option_type = str(body.get('option_type', 'call')).lower()
+    if option_type not in ('call', 'put'):
+        raise RequestError("'option_type' must be 'call' or 'put'")
+    options = body.get('options', {})
+    if not isinstance(options, dict) or (options and model == 'BS'):
+        raise RequestError("'options' must be an object of BTModel, MCModel, FDModel or FFTModel arguments")
+    greeks = body.get('greeks', False)
+    if not isinstance(greeks, bool):
+        raise RequestError("'greeks' must be true or false")
+    key = (model, greeks, json.dumps(options, sort_keys=True))
+    return key, inputs, option_type == 'call'
+
+
+def _finite(value):
+    # JSON has no NaN or infinity
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+class ServiceMetrics:
+    """
+    Request, error and batch counters with the latencies of the latest requests, shared across threads.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.pricing_seconds = 0.0
+        self.max_batch_size = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record_request(self, seconds, error=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += error
+            self.latencies.append(seconds)
+
+    def record_batch(self, size, seconds):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += size
+            self.pricing_seconds += seconds
+            self.max_batch_size = max(self.max_batch_size, size)
+
+    def snapshot(self):
+        """
+        Returns the metrics as a dictionary, with latency percentiles in milliseconds.
+        """
+        with self._lock:
+            uptime = time.monotonic() - self.started
+            latencies = np.array(self.latencies)
+            percentiles = np.percentile(latencies, (50, 90, 99)) * 1e3 if len(latencies) else (None,) * 3
+            return {
+                'uptime_seconds': uptime,
+                'requests': self.requests,
+                'errors': self.errors,
+                'requests_per_second': self.requests / uptime,
+                'batches': self.batches,
+                'mean_batch_size': self.batched_requests / self.batches if self.batches else None,
+                'max_batch_size': self.max_batch_size,
+                'pricing_seconds': self.pricing_seconds,
+                'latency_ms': dict(zip(('p50', 'p90', 'p99'), map(lambda p: None if p is None else float(p), percentiles))),
+            }
+
+    def render(self, prefix='option_pricing_service'):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        stats = self.snapshot()
+        lines = [f"# TYPE {prefix}_requests_total counter", f"{prefix}_requests_total {stats['requests']}",
+                 f"# TYPE {prefix}_errors_total counter", f"{prefix}_errors_total {stats['errors']}",
+                 f"# TYPE {prefix}_batches_total counter", f"{prefix}_batches_total {stats['batches']}",
+                 f"# TYPE {prefix}_pricing_seconds_total counter", f"{prefix}_pricing_seconds_total {stats['pricing_seconds']!r}",
+                 f"# TYPE {prefix}_requests_per_second gauge", f"{prefix}_requests_per_second {stats['requests_per_second']!r}",
+                 f"# TYPE {prefix}_latency_seconds summary"]
+        for name, quantile in (('p50', '0.5'), ('p90', '0.9'), ('p99', '0.99')):
+            if stats['latency_ms'][name] is not None:
+                lines.append(f'{prefix}_latency_seconds{{quantile="{quantile}"}} {stats["latency_ms"][name] / 1e3!r}')
+        if stats['mean_batch_size'] is not None:
+            lines += [f"# TYPE {prefix}_mean_batch_size gauge", f"{prefix}_mean_batch_size {stats['mean_batch_size']!r}"]
+        return "\n".join(lines) + "\n"
+
+
+class MicroBatcher:
+    """
+    Collects single pricing requests and prices them together.
+
+    max_batch_size => Most requests priced in one batch
+    max_wait => Longest time in seconds a batch waits for more requests after its first one
+    """
+    def __init__(self, max_batch_size=256, max_wait=0.002, metrics=None):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.metrics = metrics or ServiceMetrics()
+        self._queue = None
+        self._task = None
+        # Pricing runs off the event loop on one thread, so the loop keeps accepting requests meanwhile
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pricing')
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._pool.shutdown(wait=True)
+
+    async def price(self, request):
+        """
+        Prices one request (a dictionary as described in parse_request) and returns its result dictionary.
+        Raises RequestError if the request is invalid.
+        """
+        key, inputs, is_call = parse_request(request)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((key, inputs, is_call, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            start = time.perf_counter()
+            results = await loop.run_in_executor(self._pool, self._price_batch, batch)
+            self.metrics.record_batch(len(batch), time.perf_counter() - start)
+            for (_, _, _, future), (result, error) in zip(batch, results):
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    @staticmethod
+    def _price_batch(batch):
+        """
+        Prices a batch with one vectorized call per batch key and returns a (result, error) pair per request.
+        If a vectorized call fails, its requests are priced one by one, so only the failing ones get the error.
+        """
+        groups = {}
+        for i, (key, _, _, _) in enumerate(batch):
+            groups.setdefault(key, []).append(i)
+        results = [None] * len(batch)
+        for key, rows in groups.items():
+            try:
+                MicroBatcher._price_rows(batch, key, rows, results)
+            except Exception as error:
+                if len(rows) == 1:
+                    results[rows[0]] = (None, error)
+                    continue
+                for i in rows:
+                    try:
+                        MicroBatcher._price_rows(batch, key, [i], results)
+                    except Exception as row_error:
+                        results[i] = (None, row_error)
+        # Bad model arguments and inputs a model cannot price are the request's fault
+        return [(None, RequestError(str(error))) if isinstance(error, (ValueError, TypeError))
+                and not isinstance(error, RequestError) else (result, error) for result, error in results]
+
+    @staticmethod
+    def _price_rows(batch, key, rows, results):
+        # Prices the requests at rows of batch, which share key, with one vectorized call into results
+        model, greeks, options = key
+        S, K, days, r, sigma = np.array([batch[i][1] for i in rows]).T
+        calls, puts, call_greeks, put_greeks = price_arrays(S, K, days, r, sigma, model, greeks, json.loads(options))
+        for j, i in enumerate(rows):
+            is_call = batch[i][2]
+            result = {'price': _finite(calls[j] if is_call else puts[j])}
+            if greeks:
+                chosen = call_greeks if is_call else put_greeks
+                result['greeks'] = {name: _finite(chosen[name][j]) for name in GREEK_NAMES}
+            results[i] = (result, None)
+
+
+class PricingServer:
+    """
+    asyncio HTTP/1.1 server with keep-alive that answers pricing requests through a MicroBatcher.
+    """
+    def __init__(self, host='127.0.0.1', port=8000, max_batch_size=256, max_wait=0.002):
+        self.host = host
+        self.port = port
+        self.metrics = ServiceMetrics()
+        self.batcher = MicroBatcher(max_batch_size, max_wait, self.metrics)
+        self._server = None
+
+    async def start(self):
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # With port 0 the system picks a free port
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.close()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'Malformed request line'}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and (version == 'HTTP/1.1' or headers.get('connection', '').lower() == 'keep-alive'))
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {'error': 'Invalid Content-Length'}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': 'Request body too large'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self._dispatch(method, path, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        path = path.split('?', 1)[0]
+        if path == '/price':
+            if method != 'POST':
+                return 405, {'error': 'Use POST'}
+            return await self._price(body)
+        if method != 'GET':
+            return 405, {'error': 'Use GET'}
+        if path == '/metrics':
+            return 200, self.metrics.render()
+        if path == '/stats':
+            return 200, self.metrics.snapshot()
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        return 404, {'error': f"Unknown path '{path}'"}
+
+    async def _price(self, body):
+        start = time.perf_counter()
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self.metrics.record_request(time.perf_counter() - start, error=True)
+            return 400, {'error': 'Body must be JSON'}
+        requests = request if isinstance(request, list) else [request]
+        outcomes = await asyncio.gather(*(self.batcher.price(r) for r in requests), return_exceptions=True)
+        seconds = time.perf_counter() - start
+        status, results = 200, []
+        for outcome in outcomes:
+            error = isinstance(outcome, Exception)
+            self.metrics.record_request(seconds, error)
+            if isinstance(outcome, RequestError):
+                status = 400
+                results.append({'error': str(outcome)})
+            elif error:
+                status = 500
+                results.append({'error': f"{type(outcome).__name__}: {outcome}"})
+            else:
+                results.append(outcome)
+        if not isinstance(request, list):
+            return status, results[0]
+        # A list is answered with per-request results, including the errors, unless the server failed
+        return (500 if status == 500 else 200), results
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload).encode(), 'application/json'
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+def serve(host='127.0.0.1', port=8000, max_batch_size=256, max_wait=0.002):
+    """
+    Runs a PricingServer until it is interrupted.
+    """
+    server = PricingServer(host, port, max_batch_size, max_wait)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,33 @@
+# Special functions used by the pricing models
+# scipy is only imported the first time one of them is called, so the models can be imported with NumPy alone
+
+_scipy_special = None
+
+
+def _special():
+    global _scipy_special
+    if _scipy_special is None:
+        from scipy import special
+        _scipy_special = special
+    return _scipy_special
+
+
+def ndtr(x):
+    """
+    Standard normal cumulative distribution function.
+    """
+    return _special().ndtr(x)
+
+
+def ndtri(p):
+    """
+    Inverse of the standard normal cumulative distribution function.
+    """
+    return _special().ndtri(p)
+
+
+def gammaln(x):
+    """
+    Logarithm of the absolute value of the gamma function.
+    """
+    return _special().gammaln(x)
@@ -0,0 +1,293 @@
+# Implied volatility surface
+# Every expiry is fitted with the raw SVI parameterization of total implied variance in log-moneyness,
+# w(k) = a + b * (rho * (k - m) + sqrt((k - m)^2 + s^2)), and the fits are sampled on a dense grid
+# of log-moneyness, so looking up sigma(K, T) for an option is an O(1) interpolation instead of a fit.
+# Slices are keyed by expiry date, so refitting one expiry on any day only replaces its own slice and grid row.
+
+import datetime
+import json
+
+import numpy as np
+
+from .implied_vol import implied_volatility
+
+SVI_PARAMETERS = ('a', 'b', 'rho', 'm', 's')
+# Log-moneyness covered by the interpolation grid; lookups beyond it use the value at the edge
+MONEYNESS_RANGE = (-1.5, 1.5)
+GRID_SIZE = 601
+# Fewest quotes an expiry needs to be fitted, one more than the number of SVI parameters
+MIN_QUOTES = 6
+
+
+def svi_total_variance(params, k):
+    """
+    Raw SVI total implied variance w = sigma^2 * T at log-moneyness k = log(K / F).
+    """
+    a, b, rho, m, s = params
+    return a + b * (rho * (k - m) + np.sqrt((k - m) ** 2 + s ** 2))
+
+
+def fit_svi(k, total_variance, weights=None):
+    """
+    Fits raw SVI parameters to total implied variances at log-moneyness k by bounded least squares.
+
+    weights => Optional weight of every quote, e.g. its vega or inverse bid-ask spread
+    Returns the parameters as an array in the order of SVI_PARAMETERS.
+    """
+    from scipy.optimize import least_squares
+
+    k, w = np.asarray(k, dtype=float), np.asarray(total_variance, dtype=float)
+    if len(k) < MIN_QUOTES:
+        raise ValueError(f"SVI needs at least {MIN_QUOTES} quotes, got {len(k)}")
+    weights = np.ones_like(w) if weights is None else np.sqrt(np.asarray(weights, dtype=float))
+    w_max = np.max(w)
+
+    def residuals(params):
+        # Relative errors, so the high variance wings do not outweigh the quotes near the money,
+        # and a slice whose minimum variance a + b * s * sqrt(1 - rho^2) is negative is penalized
+        a, b, rho, m, s = params
+        floor = min(a + b * s * np.sqrt(1 - rho ** 2), 0.0)
+        return np.append(weights * (svi_total_variance(params, k) / w - 1), 1e3 * floor / w_max)
+
+    lower = [-w_max, 0.0, -0.999, np.min(k) - 1.0, 1e-4]
+    upper = [w_max, 10.0, 0.999, np.max(k) + 1.0, 5.0]
+    # Least squares only finds the nearest minimum, so start from smiles of several widths centred on
+    # the quote with the lowest variance, with slopes that match the wings, and keep the best fit
+    m0, w_min, spread = k[np.argmin(w)], np.min(w), np.ptp(k)
+    best = None
+    for s0 in (0.05, 0.2, 0.5):
+        s0 *= spread
+        wings = np.abs(k - m0) > s0
+        b0 = np.clip(np.median((w[wings] - w_min) / np.abs(k[wings] - m0)) if wings.any() else 0.1, 1e-3, 5.0)
+        start = np.clip([w_min - b0 * s0, b0, 0.0, m0, s0], lower, upper)
+        fit = least_squares(residuals, start, bounds=(lower, upper))
+        if best is None or fit.cost < best.cost:
+            best = fit
+    return best.x
+
+
+class VolatilitySurface:
+    """
+    Implied volatility surface of one underlying, made of an SVI fit per expiry.
+
+    spot_price => Current price of the underlying asset, used for the forward prices
+    risk_free_rate => Risk-free interest rate (annualized), used for the forward prices
+    valuation_date => Date that days to expiry count from, or None for today's date at every call,
+                      so a surface kept for days ages with the calendar
+
+    Slices are keyed by their expiry date, and every method that takes an expiry accepts a date, an
+    ISO date string or days from the valuation date. The times to expiry of the slices are counted on
+    every lookup, and a slice keeps the implied volatilities it was fitted to as its expiry draws near;
+    slices whose expiry has passed are left out. Between expiries the total variance is interpolated
+    linearly in time at fixed log-moneyness; before the first expiry the first slice's volatility is
+    used and after the last expiry the last slice's.
+    """
+    def __init__(self, spot_price, risk_free_rate, valuation_date=None):
+        self.spot_price = spot_price
+        self.risk_free_rate = risk_free_rate
+        self.valuation_date = valuation_date
+        self.slices = {}
+        # Days to expiry of every slice when it was fitted
+        self.fitted_days = {}
+        self.k_grid = np.linspace(*MONEYNESS_RANGE, GRID_SIZE)
+        self._dk = self.k_grid[1] - self.k_grid[0]
+        # Expiry dates as ordinals, and the implied variance sigma^2 of their slices on k_grid
+        self._expiry_dates = np.zeros(0, dtype=int)
+        self._grid = np.zeros((0, GRID_SIZE))
+
+    def _today(self):
+        return self.valuation_date or datetime.date.today()
+
+    def _expiry_date(self, expiry):
+        # Expiry date of a date, an ISO date string or days from the valuation date
+        if isinstance(expiry, str):
+            return datetime.datetime.strptime(expiry, '%Y-%m-%d').date()
+        if isinstance(expiry, datetime.datetime):
+            return expiry.date()
+        if isinstance(expiry, datetime.date):
+            return expiry
+        return self._today() + datetime.timedelta(days=int(expiry))
+
+    def _set_row(self, expiry, row):
+        # Replaces or inserts the grid row of an expiry date
+        date = expiry.toordinal()
+        position = np.searchsorted(self._expiry_dates, date)
+        if position < len(self._expiry_dates) and self._expiry_dates[position] == date:
+            self._grid[position] = row
+        else:
+            self._expiry_dates = np.insert(self._expiry_dates, position, date)
+            self._grid = np.insert(self._grid, position, row, axis=0)
+
+    def log_moneyness(self, strike_prices, time_to_maturity, underlying_price=None):
+        """
+        Log of strike over forward price, with time_to_maturity in days.
+        """
+        S = self.spot_price if underlying_price is None else np.asarray(underlying_price, dtype=float)
+        T = np.asarray(time_to_maturity, dtype=float) / 365
+        return np.log(np.asarray(strike_prices, dtype=float) / (S * np.exp(self.risk_free_rate * T)))
+
+    def set_expiry(self, expiry_date, strike_prices, implied_vols, weights=None):
+        """
+        Fits the slice of one expiry to implied volatilities at strike_prices, replacing any previous
+        fit of that expiry, and updates only that row of the interpolation grid.
+        Quotes with NaN volatilities are left out. Returns the fitted parameters.
+        """
+        expiry = self._expiry_date(expiry_date)
+        days = (expiry - self._today()).days
+        if days <= 0:
+            raise ValueError(f"Expiry {expiry} has passed")
+        vols = np.asarray(implied_vols, dtype=float)
+        ok = np.isfinite(vols) & (vols > 0)
+        T = days / 365
+        k = self.log_moneyness(np.asarray(strike_prices, dtype=float)[ok], days)
+        params = fit_svi(k, vols[ok] ** 2 * T, None if weights is None else np.asarray(weights)[ok])
+        self.slices[expiry] = params
+        self.fitted_days[expiry] = days
+        self._set_row(expiry, svi_total_variance(params, self.k_grid) / T)
+        return params
+
+    def remove_expiry(self, expiry_date):
+        expiry = self._expiry_date(expiry_date)
+        position = np.searchsorted(self._expiry_dates, expiry.toordinal())
+        del self.slices[expiry]
+        del self.fitted_days[expiry]
+        self._expiry_dates = np.delete(self._expiry_dates, position)
+        self._grid = np.delete(self._grid, position, axis=0)
+
+    def total_variance(self, strike_prices, time_to_maturity, underlying_price=None):
+        """
+        Total implied variance sigma^2 * T from the grid, for broadcast arrays of strikes and days.
+        """
+        expiries = (self._expiry_dates - self._today().toordinal()) / 365
+        live = expiries > 0
+        if not live.any():
+            raise ValueError("The surface has no fitted expiries that have not passed")
+        expiries, grid = expiries[live], self._grid[live]
+        k, T = np.broadcast_arrays(self.log_moneyness(strike_prices, time_to_maturity, underlying_price),
+                                   np.asarray(time_to_maturity, dtype=float) / 365)
+        # The grid is uniform in log-moneyness, so the neighbouring columns follow from k directly
+        position = np.clip((k - self.k_grid[0]) / self._dk, 0, GRID_SIZE - 1)
+        j = np.minimum(position.astype(int), GRID_SIZE - 2)
+        t = position - j
+
+        def row_value(i):
+            # Total variance of slice i at its time to expiry
+            return (grid[i, j] * (1 - t) + grid[i, j + 1] * t) * expiries[i]
+
+        # Linear in time between the neighbouring expiries, constant volatility outside them
+        n = len(expiries)
+        i = np.clip(np.searchsorted(expiries, T) - 1, 0, max(n - 2, 0))
+        w_low = row_value(i)
+        if n == 1:
+            return w_low * T / expiries[0]
+        w_high = row_value(i + 1)
+        T_low, T_high = expiries[i], expiries[i + 1]
+        inside = w_low + (w_high - w_low) * (T - T_low) / (T_high - T_low)
+        return np.where(T < T_low, w_low * T / T_low, np.where(T > T_high, w_high * T / T_high, inside))
+
+    def volatility(self, strike_prices, time_to_maturity, underlying_price=None):
+        """
+        Implied volatility sigma(K, T) for broadcast arrays of strikes and days to expiry, e.g. for
+        batch pricing. With underlying_price the lookup is at the same log-moneyness from that spot.
+        """
+        T = np.asarray(time_to_maturity, dtype=float) / 365
+        return np.sqrt(np.maximum(self.total_variance(strike_prices, time_to_maturity, underlying_price), 0.0) / T)
+
+    def refresh_spot(self, ticker, provider=None):
+        """
+        Sets spot_price to the last close of ticker, for the forward prices of later fits and lookups.
+        Returns the new spot price.
+        """
+        from .market_data import get_default_provider
+        from .yfin import Ticker
+
+        provider = provider or get_default_provider()
+        self.spot_price = Ticker.get_past_data(ticker, provider=provider)['Adj Close'].iloc[-1]
+        return self.spot_price
+
+    def refresh_expiry(self, ticker, expiry_date, provider=None, spot_price=None):
+        """
+        Fetches the option chain of one expiry, computes implied volatilities of the out-of-the-money
+        calls and puts and refits that expiry, replacing its previous slice.
+
+        spot_price => Latest price of the underlying, which replaces spot_price for this and later
+                      fits and lookups
+        Returns the fitted parameters, or None if the expiry has passed or has too few quotes.
+        """
+        from .market_data import get_default_provider
+
+        provider = provider or get_default_provider()
+        if spot_price is not None:
+            self.spot_price = spot_price
+        expiry = self._expiry_date(expiry_date)
+        days = (expiry - self._today()).days
+        if days <= 0:
+            return None
+        chain = provider.get_option_chain(ticker, expiry.isoformat())
+        forward = self.spot_price * np.exp(self.risk_free_rate * days / 365)
+        strikes, prices, types = [], [], []
+        for frame, option_type in ((chain.calls, 'call'), (chain.puts, 'put')):
+            # Out-of-the-money options are the liquid ones, and their prices carry the most time value
+            otm = frame['strike'] >= forward if option_type == 'call' else frame['strike'] < forward
+            quotes = frame[otm]
+            price = quotes['lastPrice'].to_numpy(dtype=float)
+            if 'bid' in quotes and 'ask' in quotes:
+                bid, ask = quotes['bid'].to_numpy(dtype=float), quotes['ask'].to_numpy(dtype=float)
+                price = np.where((bid > 0) & (ask > bid), 0.5 * (bid + ask), price)
+            strikes.append(quotes['strike'].to_numpy(dtype=float))
+            prices.append(price)
+            types += [option_type] * len(quotes)
+        strikes, prices = np.concatenate(strikes), np.concatenate(prices)
+        result = implied_volatility(prices, self.spot_price, strikes, days, self.risk_free_rate, np.array(types))
+        vols = np.where(result.converged, result.volatility, np.nan)
+        if np.count_nonzero(np.isfinite(vols)) < MIN_QUOTES:
+            return None
+        return self.set_expiry(expiry, strikes, vols)
+
+    @classmethod
+    def from_provider(cls, ticker, risk_free_rate, provider=None):
+        """
+        Builds the surface of ticker from every listed expiry, with the spot price from its history.
+        """
+        from .market_data import get_default_provider
+
+        provider = provider or get_default_provider()
+        surface = cls(None, risk_free_rate)
+        surface.refresh_spot(ticker, provider)
+        for expiry_date in provider.get_expiries(ticker):
+            surface.refresh_expiry(ticker, expiry_date, provider)
+        return surface
+
+    def to_dict(self):
+        return {
+            'spot_price': float(self.spot_price),
+            'risk_free_rate': self.risk_free_rate,
+            'valuation_date': self.valuation_date and self.valuation_date.isoformat(),
+            'slices': {expiry.isoformat(): {**dict(zip(SVI_PARAMETERS, map(float, params))),
+                                            'days': self.fitted_days[expiry]}
+                       for expiry, params in self.slices.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        valuation_date = data.get('valuation_date')
+        surface = cls(data['spot_price'], data['risk_free_rate'],
+                      valuation_date and datetime.date.fromisoformat(valuation_date))
+        for expiry, params in data['slices'].items():
+            # Surfaces saved before slices were keyed by expiry date have days to expiry as keys
+            days = params['days'] if 'days' in params else int(expiry)
+            expiry = surface._expiry_date(expiry if 'days' in params else days)
+            params = np.array([params[name] for name in SVI_PARAMETERS])
+            surface.slices[expiry] = params
+            surface.fitted_days[expiry] = days
+            surface._set_row(expiry, svi_total_variance(params, surface.k_grid) / (days / 365))
+        return surface
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,309 @@
+# Realized volatility estimation for many tickers at once
+# VolatilityEngine keeps the rolling state of every ticker in arrays with one row per ticker, so a new
+# bar updates an estimate in O(1) instead of recomputing the whole window, and a day of bars for all
+# tickers is one vectorized update. realized_volatility computes whole histories in one pass.
+# A missing bar (NaN) is skipped by every estimator: the return after it spans the gap from the last close
+# before it, and windows hold the last window bars that are there, so update, cold_start and
+# realized_volatility agree on any history.
+
+import numpy as np
+
+ESTIMATORS = ('rolling', 'ewma', 'parkinson', 'garman_klass')
+TRADING_DAYS = 252
+# Running sums are rebuilt from the window after this many updates, so rounding errors cannot pile up
+REFRESH_INTERVAL = 1000
+PARKINSON_FACTOR = 1 / (4 * np.log(2))
+GARMAN_KLASS_FACTOR = 2 * np.log(2) - 1
+
+
+def bar_variances(estimator, close, previous_close=None, high=None, low=None, open=None):
+    """
+    Returns the per-bar quantity every estimator averages, for arrays of bars of any shape:
+    the log return for 'rolling' and 'ewma', and the single-bar variance estimate from the
+    high, low (and open and close) prices for 'parkinson' and 'garman_klass'.
+    """
+    if estimator in ('rolling', 'ewma'):
+        return np.log(close / previous_close)
+    if high is None or low is None:
+        raise ValueError(f"The '{estimator}' estimator needs high and low prices")
+    log_range = np.log(high / low)
+    if estimator == 'parkinson':
+        return PARKINSON_FACTOR * log_range ** 2
+    if open is None:
+        raise ValueError("The 'garman_klass' estimator needs open prices")
+    return 0.5 * log_range ** 2 - GARMAN_KLASS_FACTOR * np.log(close / open) ** 2
+
+
+def _matrix_bar_variances(estimator, close, high=None, low=None, open=None):
+    # bar_variances of (tickers x days) matrices, with returns from the last close before every day,
+    # carried over missing bars as VolatilityEngine.update does
+    if estimator not in ('rolling', 'ewma'):
+        return bar_variances(estimator, close, None, high, low, open)
+    days = np.where(np.isfinite(close), np.arange(close.shape[1]), -1)
+    last = np.maximum.accumulate(days, axis=1)
+    previous = np.full(close.shape, -1)
+    previous[:, 1:] = last[:, :-1]
+    previous_close = np.where(previous >= 0, np.take_along_axis(close, np.maximum(previous, 0), axis=1), np.nan)
+    return bar_variances(estimator, close, previous_close)
+
+
+def _check_estimator(estimator):
+    if estimator not in ESTIMATORS:
+        raise ValueError(f"Unknown estimator '{estimator}'. Choose from {ESTIMATORS}")
+
+
+def realized_volatility(close, high=None, low=None, open=None, estimator='rolling', window=20, decay=0.94,
+                        min_periods=2):
+    """
+    Computes annualized realized volatility for a whole (tickers x days) matrix of daily bars in one pass.
+
+    close, high, low, open => (tickers x days) price matrices, with NaN for missing bars
+    estimator => 'rolling' (standard deviation of log returns over the window), 'ewma' (exponentially
+                 weighted, RiskMetrics style), 'parkinson' (high-low range) or 'garman_klass'
+                 (open-high-low-close range)
+    window => Number of bars in the rolling window, unused by 'ewma'
+    decay => Weight of the previous variance in the EWMA recursion
+    min_periods => Bars needed before an estimate is given
+
+    Returns a (tickers x days) matrix with the estimate after every day, NaN where there are too few bars.
+    """
+    _check_estimator(estimator)
+    close = np.atleast_2d(np.asarray(close, dtype=float))
+    prices = [None if x is None else np.atleast_2d(np.asarray(x, dtype=float)) for x in (high, low, open)]
+    values = _matrix_bar_variances(estimator, close, *prices)
+    valid = np.isfinite(values)
+    x = np.where(valid, values, 0.0)
+
+    if estimator == 'ewma':
+        variance = np.full(close.shape, np.nan)
+        state = np.full(len(close), np.nan)
+        count = np.cumsum(valid, axis=1)
+        # The recursion runs along the days, and every day is vectorized over the tickers
+        for day in range(close.shape[1]):
+            ok = valid[:, day]
+            first = ok & (count[:, day] == 1)
+            state = np.where(first, x[:, day] ** 2,
+                             np.where(ok, decay * state + (1 - decay) * x[:, day] ** 2, state))
+            variance[:, day] = state
+    else:
+        # The window ending on a day holds the last window valid values up to it, so its sums are the
+        # running sums minus the running sums at the valid value just before the window
+        seen = np.cumsum(valid, axis=1)
+        count = np.minimum(seen, window)
+        rows = np.arange(len(close))[:, None]
+
+        def window_sum(a):
+            total = np.cumsum(a, axis=1)
+            by_count = np.zeros((len(close), close.shape[1] + 1))
+            by_count[np.nonzero(valid)[0], seen[valid]] = total[valid]
+            return total - by_count[rows, seen - count]
+        mean = window_sum(x) / np.maximum(count, 1)
+        if estimator == 'rolling':
+            # Population variance of the returns in the window, like np.std
+            variance = np.maximum(window_sum(x ** 2) / np.maximum(count, 1) - mean ** 2, 0.0)
+        else:
+            variance = mean
+    variance = np.where(count >= min_periods, variance, np.nan)
+    return np.sqrt(variance * TRADING_DAYS)
+
+
+class VolatilityEngine:
+    """
+    Keeps rolling realized volatility estimates for many tickers, updated in O(1) per new bar.
+
+    tickers => Ticker symbols, one row of state each; more can be added with add_tickers
+    estimator => 'rolling', 'ewma', 'parkinson' or 'garman_klass', as in realized_volatility
+    window => Number of bars in the rolling window, unused by 'ewma'
+    decay => Weight of the previous variance in the EWMA recursion
+    min_periods => Bars needed before an estimate is given
+
+    The rolling estimators keep a ring buffer of the last window per-bar values of every ticker with
+    their running sum (and sum of squares), so a new bar adds one value and drops the oldest one.
+    """
+    def __init__(self, tickers=(), estimator='rolling', window=20, decay=0.94, min_periods=2):
+        _check_estimator(estimator)
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.estimator = estimator
+        self.window = window
+        self.decay = decay
+        self.min_periods = min_periods
+        self.index = {}
+        self._buffer = np.zeros((0, window))
+        self._count = np.zeros(0, dtype=int)
+        self._position = np.zeros(0, dtype=int)
+        self._sum = np.zeros(0)
+        self._sum_squares = np.zeros(0)
+        self._variance = np.zeros(0)
+        self._last_close = np.zeros(0)
+        self.last_date = np.zeros(0, dtype='datetime64[D]')
+        self._updates = 0
+        self.add_tickers(tickers)
+
+    @property
+    def tickers(self):
+        return list(self.index)
+
+    def add_tickers(self, tickers):
+        """
+        Adds rows of empty state for the tickers that are not tracked yet.
+        """
+        new = [t for t in dict.fromkeys(tickers) if t not in self.index]
+        if not new:
+            return
+        for ticker in new:
+            self.index[ticker] = len(self.index)
+        extra = len(new)
+        self._buffer = np.vstack((self._buffer, np.zeros((extra, self.window))))
+        self._count = np.concatenate((self._count, np.zeros(extra, dtype=int)))
+        self._position = np.concatenate((self._position, np.zeros(extra, dtype=int)))
+        self._sum = np.concatenate((self._sum, np.zeros(extra)))
+        self._sum_squares = np.concatenate((self._sum_squares, np.zeros(extra)))
+        self._variance = np.concatenate((self._variance, np.full(extra, np.nan)))
+        self._last_close = np.concatenate((self._last_close, np.full(extra, np.nan)))
+        self.last_date = np.concatenate((self.last_date, np.full(extra, np.datetime64('NaT'), dtype='datetime64[D]')))
+
+    def _rows(self, tickers):
+        if tickers is None:
+            return np.arange(len(self.index))
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        self.add_tickers(tickers)
+        return np.array([self.index[t] for t in tickers], dtype=int)
+
+    def update(self, close, high=None, low=None, open=None, tickers=None, date=None):
+        """
+        Adds one bar for every ticker in tickers (all tracked tickers if None) in O(1) per ticker.
+
+        close, high, low, open => Arrays of prices aligned with tickers, or scalars for a single ticker.
+                                  Tickers with a NaN close are left unchanged.
+        date => Date of the bar, kept in last_date
+        """
+        rows = self._rows(tickers)
+        close = np.broadcast_to(np.asarray(close, dtype=float), rows.shape)
+        prices = [None if x is None else np.broadcast_to(np.asarray(x, dtype=float), rows.shape)
+                  for x in (high, low, open)]
+        if self.estimator in ('rolling', 'ewma'):
+            values = bar_variances(self.estimator, close, self._last_close[rows])
+        else:
+            values = bar_variances(self.estimator, close, None, *prices)
+        has_close = np.isfinite(close)
+        self._last_close[rows[has_close]] = close[has_close]
+        if date is not None:
+            self.last_date[rows[has_close]] = np.datetime64(date, 'D')
+
+        ok = np.isfinite(values)
+        rows, values = rows[ok], values[ok]
+        if self.estimator == 'ewma':
+            previous = self._variance[rows]
+            self._variance[rows] = np.where(self._count[rows] == 0, values ** 2,
+                                            self.decay * previous + (1 - self.decay) * values ** 2)
+            self._count[rows] += 1
+            return
+
+        # Replace the oldest value of the ring buffer and adjust the running sums by the difference
+        position = self._position[rows]
+        full = self._count[rows] >= self.window
+        oldest = np.where(full, self._buffer[rows, position], 0.0)
+        self._buffer[rows, position] = values
+        self._sum[rows] += values - oldest
+        self._sum_squares[rows] += values ** 2 - oldest ** 2
+        self._position[rows] = (position + 1) % self.window
+        self._count[rows] = np.minimum(self._count[rows] + 1, self.window)
+
+        self._updates += 1
+        if self._updates >= REFRESH_INTERVAL:
+            self._refresh()
+
+    def _refresh(self):
+        # Rebuild the running sums from the ring buffers, which costs O(window) but only every REFRESH_INTERVAL updates
+        self._sum = self._buffer.sum(axis=1)
+        self._sum_squares = (self._buffer ** 2).sum(axis=1)
+        self._updates = 0
+
+    def cold_start(self, close, high=None, low=None, open=None, tickers=None, dates=None):
+        """
+        Resets the state of tickers from (tickers x days) price matrices in one vectorized pass,
+        as if every bar had been added with update.
+
+        dates => Dates of the columns, the last date with a close is kept in last_date
+        """
+        rows = self._rows(tickers)
+        close = np.atleast_2d(np.asarray(close, dtype=float))
+        prices = [None if x is None else np.atleast_2d(np.asarray(x, dtype=float)) for x in (high, low, open)]
+        if close.shape[0] != len(rows):
+            raise ValueError("close must have one row per ticker")
+        has_close = np.isfinite(close)
+        last = close.shape[1] - 1 - np.argmax(has_close[:, ::-1], axis=1)
+        self._last_close[rows] = np.where(has_close.any(axis=1), close[np.arange(len(rows)), last], np.nan)
+        if dates is not None:
+            dates = np.asarray(dates, dtype='datetime64[D]')
+            self.last_date[rows] = np.where(has_close.any(axis=1), dates[last], np.datetime64('NaT'))
+
+        # Daily returns need the previous close, which is not in the matrix for the first day
+        values = _matrix_bar_variances(self.estimator, close, *prices)
+        if self.estimator == 'ewma':
+            valid = np.isfinite(values)
+            variance = np.full(len(rows), np.nan)
+            count = np.zeros(len(rows), dtype=int)
+            for day in range(close.shape[1]):
+                ok = valid[:, day]
+                square = np.where(ok, values[:, day], 0.0) ** 2
+                variance = np.where(ok & (count == 0), square,
+                                    np.where(ok, self.decay * variance + (1 - self.decay) * square, variance))
+                count += ok
+            self._variance[rows], self._count[rows] = variance, count
+            return
+
+        valid = np.isfinite(values)
+        # Keep the last window valid values of every row, in order, at the start of its ring buffer
+        rank_from_end = np.cumsum(valid[:, ::-1], axis=1)[:, ::-1]
+        keep = valid & (rank_from_end <= self.window)
+        count = keep.sum(axis=1)
+        row_index, day_index = np.nonzero(keep)
+        slots = count[row_index] - rank_from_end[row_index, day_index]
+        buffer = np.zeros((len(rows), self.window))
+        buffer[row_index, slots] = values[row_index, day_index]
+        self._buffer[rows] = buffer
+        self._count[rows] = count
+        self._position[rows] = count % self.window
+        self._sum[rows] = buffer.sum(axis=1)
+        self._sum_squares[rows] = (buffer ** 2).sum(axis=1)
+
+    def update_from_history(self, ticker, history):
+        """
+        Brings the state of ticker up to date with a DataFrame of daily bars (HISTORY_COLUMNS) and
+        returns its volatility. Only bars after the last one seen are added; a ticker seen for the
+        first time, or whose history no longer overlaps the bars seen, is cold-started from history.
+        """
+        close = history['Adj Close'] if self.estimator in ('rolling', 'ewma') else history['Close']
+        dates = history.index.values.astype('datetime64[D]')
+        row = self._rows([ticker])[0]
+        last_date = self.last_date[row]
+        if np.isnat(last_date) or len(dates) == 0 or dates[0] > last_date:
+            self.cold_start(close.to_numpy()[None, :], *(history[c].to_numpy()[None, :] for c in ('High', 'Low', 'Open')),
+                            tickers=[ticker], dates=dates)
+        else:
+            for i in np.flatnonzero(dates > last_date):
+                self.update(close.iloc[i], history['High'].iloc[i], history['Low'].iloc[i], history['Open'].iloc[i],
+                            tickers=[ticker], date=dates[i])
+        return self.volatility(ticker)
+
+    def volatility(self, tickers=None):
+        """
+        Returns the annualized volatility of one ticker as a float, or of a list of tickers
+        (all tracked tickers if None) as an array, with NaN where there are too few bars.
+        """
+        rows = self._rows(tickers)
+        count = self._count[rows]
+        if self.estimator == 'ewma':
+            variance = self._variance[rows]
+        else:
+            mean = self._sum[rows] / np.maximum(count, 1)
+            if self.estimator == 'rolling':
+                # Population variance of the returns in the window, like np.std
+                variance = np.maximum(self._sum_squares[rows] / np.maximum(count, 1) - mean ** 2, 0.0)
+            else:
+                variance = mean
+        annualized = np.where(count >= self.min_periods, np.sqrt(variance * TRADING_DAYS), np.nan)
+        return annualized.item() if isinstance(tickers, str) else annualized
@@ -1,15 +1,16 @@
 import datetime
-import subprocess
-import sys
-import pandas as pd
-import matplotlib.pyplot as plt
-# Install or upgrade yfinance
-subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", "yfinance"])
-import yfinance as yf
+# pandas, matplotlib and the market data providers are imported on first use,
+# so importing this module is cheap and has no side effects
+
+
+class NoDataError(ValueError):
+    # The provider has no history for the ticker, e.g. an unknown symbol, so fetching again cannot help
+    pass
+
 
 class Ticker:
     @staticmethod
-    def get_past_data(ticker, start_date = None, end_date = None):
+    def get_past_data(ticker, start_date = None, end_date = None, provider = None):
         try:
             # Use 1 month of data by default if no dates are provided
             if start_date is None:
@@ -17,24 +18,30 @@ class Ticker:
             if end_date is None:
                 end_date = datetime.datetime.now()
 
-            stock = yf.Ticker(ticker)
-            data = stock.history(start = start_date, end = end_date, auto_adjust = False)
+            # Read through the provider, which serves repeated requests from the on-disk cache
+            from .market_data import get_default_provider
+            provider = provider or get_default_provider()
+            data = provider.get_history(ticker, start_date, end_date)
 
             if data.empty:
-                raise ValueError(f"No data returned for ticker {ticker}")  
-            
+                raise NoDataError(f"No data returned for ticker {ticker}")
+
             return data
+        except NoDataError:
+            raise
         except Exception as e:
             raise Exception(f"Error fetching data for ticker {ticker}: {str(e)}")
         
     @staticmethod 
     def get_columns(data):
+        import pandas as pd
         if not isinstance(data, pd.DataFrame):
             raise ValueError("Input must be a pandas DataFrame")
         return list(data.columns)
     
     @staticmethod
     def get_last_price(data, column_name):
+        import pandas as pd
         if not isinstance(data, pd.DataFrame):
             raise ValueError("Input must be a pandas DataFrame")
         if column_name not in data.columns:
@@ -43,6 +50,8 @@ class Ticker:
 
     @staticmethod
     def plot_data(data, ticker, column_name):
+        import pandas as pd
+        import matplotlib.pyplot as plt
         if not isinstance(data, pd.DataFrame):
             raise ValueError("Input must be a pandas DataFrame")
         if column_name not in data.columns:
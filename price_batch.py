@@ -0,0 +1,61 @@
+# Command-line batch pricing of a contract file, without the GUI
+# The input is a CSV or Parquet file with one contract per row and the columns
+# underlying_price, strike_price, time_to_maturity (days), risk_free_rate, volatility
+# and optionally option_type ('call' or 'put'). The output is written in the same format as its extension.
+#
+#   python price_batch.py book.csv priced.parquet --model BS --greeks --workers 4
+#   python price_batch.py book.parquet priced.csv --model BT --steps 200 --exercise american
+
+import argparse
+import sys
+
+from modules.batch import price_file, MODELS
+from modules.vol_surface import VolatilitySurface
+
+# Model options of every model, as (flag, constructor argument) pairs
+MODEL_FLAGS = {
+    'BS': (),
+    'BT': (('steps', 'time_steps'), ('exercise', 'exercise')),
+    'MC': (('paths', 'number_of_simulations'), ('exercise', 'exercise')),
+    'FD': (('steps', 'time_steps'), ('exercise', 'exercise')),
+    'FFT': (),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Price a CSV or Parquet file of option contracts")
+    parser.add_argument('input', help="CSV or Parquet file of contracts")
+    parser.add_argument('output', help="CSV or Parquet file to write the priced contracts to")
+    parser.add_argument('--model', choices=MODELS, default='BS')
+    parser.add_argument('--greeks', action='store_true', help="Also write delta, gamma, vega, theta and rho")
+    parser.add_argument('--chunk-size', type=int, default=100_000, help="Contracts read and priced at a time")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes")
+    parser.add_argument('--steps', type=int, help="Time steps of the Binomial Tree and Finite Difference Models")
+    parser.add_argument('--paths', type=int, help="Simulations of the Monte Carlo Model")
+    parser.add_argument('--exercise', choices=('european', 'american'), help="Exercise style for BT, MC and FD")
+    parser.add_argument('--surface', help="JSON volatility surface (VolatilitySurface.save) to look up every "
+                                          "contract's volatility on, instead of the volatility column")
+    parser.add_argument('--quiet', action='store_true', help="Do not print progress")
+    args = parser.parse_args()
+
+    for flag in ('chunk_size', 'workers', 'steps', 'paths'):
+        value = getattr(args, flag)
+        if value is not None and value < 1:
+            parser.error(f"--{flag.replace('_', '-')} must be at least 1")
+    flags = dict(MODEL_FLAGS[args.model])
+    for flag in ('steps', 'paths', 'exercise'):
+        if getattr(args, flag) is not None and flag not in flags:
+            parser.error(f"--{flag} does not apply to the {args.model} model")
+    if args.model == 'MC' and args.exercise == 'american' and args.greeks:
+        parser.error("--greeks is only available for European options with the MC model")
+    model_options = {argument: getattr(args, flag) for flag, argument in flags.items()
+                     if getattr(args, flag) is not None}
+
+    progress = None if args.quiet else lambda chunks, rows: print(f"\r{chunks} chunks, {rows} contracts", end='', file=sys.stderr)
+    surface = VolatilitySurface.load(args.surface) if args.surface else None
+    summary = price_file(args.input, args.output, args.model, args.chunk_size, args.workers, args.greeks,
+                         model_options, progress, surface)
+    if not args.quiet:
+        print(f"\nPriced {summary['rows']} contracts in {summary['seconds']:.2f} s", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
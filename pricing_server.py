@@ -0,0 +1,23 @@
+# Local HTTP/JSON pricing service for other tools, see modules/server.py for the endpoints
+#
+#   python pricing_server.py --port 8000
+#   curl -s localhost:8000/price -d '{"underlying_price": 100, "strike_price": 105, "time_to_maturity": 30, "risk_free_rate": 0.05, "volatility": 0.2}'
+
+import argparse
+
+from modules.server import serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve option prices over HTTP with request micro-batching")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=256, help="Most requests priced in one batch")
+    parser.add_argument('--max-wait', type=float, default=2.0,
+                        help="Milliseconds a batch waits for more requests after its first one")
+    args = parser.parse_args()
+    print(f"Serving on http://{args.host}:{args.port}")
+    serve(args.host, args.port, args.max_batch_size, args.max_wait / 1e3)
+
+if __name__ == '__main__':
+    main()